@@ -0,0 +1,142 @@
+"""
+A local stand-in for the plants API that extract.py reads from.
+
+GET /plants/<plant_id> returns a reading in the same shape as the real API for
+plant IDs 1 to plant_count, and a 404 for any other ID. Every response can be
+delayed by a fixed latency (plus up to the same again as random jitter), and a
+share of requests, set by error_rate, fail with a 500.
+
+Run it on its own with e.g.
+    python benchmarks/mock_plants_api.py --plants 500 --latency 0.05 --port 8000
+and point the ETL at it with PLANTS_API_URL=http://localhost:8000/plants/.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SPECIES_COUNT = 500
+BOTANIST_COUNT = 25
+COUNTRY_COUNT = 30
+
+
+def get_plant_reading(plant_id: int, now: datetime) -> dict:
+    """Returns a plausible API response for a plant, stable apart from its sensor values."""
+    botanist = plant_id % BOTANIST_COUNT
+    return {
+        "plant_id": plant_id,
+        "name": f"Plant {plant_id}",
+        "scientific_name": [f"Species {plant_id % SPECIES_COUNT}"],
+        "botanist": {
+            "name": f"Botanist{botanist} Surname{botanist}",
+            "email": f"botanist{botanist}@lnhm.co.uk",
+            "phone": f"0151-{botanist:04d}",
+        },
+        "origin_location": ["53.4", "-2.9", "Liverpool", f"Country {plant_id % COUNTRY_COUNT}",
+                            "Europe/London"],
+        "recording_taken": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "last_watered": (now - timedelta(hours=random.uniform(1, 30))).strftime(
+            "%a, %d %b %Y %H:%M:%S GMT"),
+        "soil_moisture": round(random.uniform(10, 100), 2),
+        "temperature": round(random.uniform(8, 30), 2),
+    }
+
+
+class MockPlantsAPI:
+    """Serves the mock plants API from a background thread."""
+
+    def __init__(self, plant_count: int = 50, latency: float = 0, error_rate: float = 0,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.plant_count = plant_count
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self.get_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        """The URL to use as extract.BASE_URL."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/plants/"
+
+    def get_handler(self) -> type:
+        """Builds a request handler bound to this API's settings."""
+        api = self
+
+        class PlantsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with api.lock:
+                    api.requests += 1
+                if api.latency:
+                    time.sleep(api.latency + random.uniform(0, api.latency))
+
+                parts = self.path.strip("/").split("/")
+                if len(parts) != 2 or parts[0] != "plants" or not parts[1].isdigit():
+                    return self.send_json(404, {"error": "Not found"})
+                plant_id = int(parts[1])
+                if random.random() < api.error_rate:
+                    return self.send_json(500, {"error": "Internal server error"})
+                if not 1 <= plant_id <= api.plant_count:
+                    return self.send_json(404, {"error": "plant not found", "plant_id": plant_id})
+                return self.send_json(200, get_plant_reading(plant_id, datetime.now()))
+
+            def send_json(self, status: int, body: dict) -> None:
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return PlantsHandler
+
+    def start(self) -> str:
+        """Starts serving in the background and returns the base URL."""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        """Stops serving and closes the socket."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def get_arguments() -> argparse.Namespace:
+    """Parse and return command-line arguments."""
+    parser = argparse.ArgumentParser(description="Serve a mock plants API.")
+    parser.add_argument("--plants", type=int, default=50, help="Number of plants to serve.")
+    parser.add_argument("--latency", type=float, default=0,
+                        help="Base response latency in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0,
+                        help="Share of requests that fail with a 500, from 0 to 1.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+    api = MockPlantsAPI(args.plants, args.latency, args.error_rate, args.host, args.port)
+    print(f"Serving {args.plants} plants at {api.base_url}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        api.server.server_close()
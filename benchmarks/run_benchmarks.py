@@ -0,0 +1,255 @@
+"""
+Benchmarks the pipeline at increasing plant counts.
+
+For each size, the database is reset, then the following are timed:
+- run_etl_pipeline, against the mock plants API
+- the dashboard queries
+- main_transfer, archiving to a local directory
+
+The database is a local SQL Server started from docker-compose.yml, since the
+pipeline's SQL is T-SQL. Results are saved as JSON, and a run can be compared
+against a saved baseline to catch regressions.
+
+    docker compose -f benchmarks/docker-compose.yml up -d
+    python benchmarks/run_benchmarks.py --save benchmarks/baselines/baseline.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baselines/baseline.json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "pipeline", "etl_process"))
+sys.path.append(os.path.join(ROOT, "pipeline"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+SIZES = [50, 500, 5000, 50000]
+DEFAULT_TOLERANCE = 0.2
+DATABASE_DEFAULTS = {
+    "DB_HOST": "localhost",
+    "DB_PORT": "1433",
+    "DB_USER": "sa",
+    "DB_PASSWORD": "Benchmark_Passw0rd",
+    "DB_NAME": "plants",
+}
+DASHBOARD_FILE = os.path.join(ROOT, "streamlit", "dashboard_data.py")
+
+
+def configure_environment(work_dir: str) -> None:
+    """Points every state file, log and output of the pipeline into work_dir.
+
+    Must run before the pipeline modules are imported, as they read their
+    settings at import time."""
+    for key, value in DATABASE_DEFAULTS.items():
+        os.environ.setdefault(key, value)
+    state_dir = os.path.join(work_dir, "plants_data")
+    os.environ.update({
+        "KNOWN_PLANTS_FILE": os.path.join(state_dir, "known_plant_ids.json"),
+        "DIMENSION_CACHE_FILE": os.path.join(state_dir, "dimension_cache.json"),
+        "WATERMARK_FILE": os.path.join(state_dir, "watermarks.json"),
+        "ALERT_STATE_FILE": os.path.join(state_dir, "alert_state.json"),
+        "METRICS_FILE": os.path.join(work_dir, "logs", "metrics.jsonl"),
+        "EMAIL_TRANSPORT": "file",
+        "EMAIL_SINK_DIR": os.path.join(work_dir, "outbox"),
+        "ARCHIVE_FORMAT": "parquet",
+        "ARCHIVE_DIR": os.path.join(work_dir, "archive"),
+    })
+    os.makedirs(os.path.join(work_dir, "logs"), exist_ok=True)
+    os.chdir(work_dir)
+
+
+def reset_work_dir(work_dir: str) -> None:
+    """Deletes the state, emails and archive left by the previous size."""
+    for name in ["plants_data", "outbox", "archive"]:
+        shutil.rmtree(os.path.join(work_dir, name), ignore_errors=True)
+
+
+def reset_database() -> None:
+    """Creates the database and alpha schema if needed, then drops every table and reapplies the migrations."""
+    import pymssql
+    from connect_to_database import get_connection, get_pool
+    from create_schemas import reset_schema, run_migrations
+
+    with pymssql.connect(server=os.environ["DB_HOST"], port=int(os.environ["DB_PORT"]),
+                         user=os.environ["DB_USER"], password=os.environ["DB_PASSWORD"],
+                         database="master", autocommit=True) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"IF DB_ID('{os.environ['DB_NAME']}') IS NULL "
+                           f"CREATE DATABASE {os.environ['DB_NAME']}")
+
+    get_pool().close_all()
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("IF SCHEMA_ID('alpha') IS NULL EXEC('CREATE SCHEMA alpha')")
+        conn.commit()
+        reset_schema(conn)
+        run_migrations(conn)
+    finally:
+        conn.close()
+
+
+def get_latest_metrics(job: str) -> dict:
+    """Returns the last metrics record written for the given job."""
+    try:
+        with open(os.environ["METRICS_FILE"], "r") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return None
+    records = [record for record in records if record["job"] == job]
+    return records[-1] if records else None
+
+
+def time_call(func, *args) -> float:
+    """Returns how long a call took in seconds."""
+    start = time.perf_counter()
+    func(*args)
+    return round(time.perf_counter() - start, 4)
+
+
+def load_dashboard():
+    """Imports the dashboard's data layer, or None if Streamlit is not installed."""
+    try:
+        spec = importlib.util.spec_from_file_location("dashboard_data", DASHBOARD_FILE)
+        dashboard = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(dashboard)
+        return dashboard
+    except ImportError as e:
+        print(f"Skipping dashboard queries: {e}")
+        return None
+
+
+def time_dashboard_queries(dashboard) -> dict:
+    """Times each uncached dashboard query against the minute of the latest reading."""
+    from connect_to_database import get_connection
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT MAX(recording_taken) FROM alpha.sensor_data")
+            latest = cursor.fetchone()[0]
+    finally:
+        conn.close()
+    if latest is None:
+        return {}
+    botanist_id = dashboard.query_botanists()["botanist_id"].iloc[0]
+    return {
+        "query_botanists": time_call(dashboard.query_botanists),
+        "query_readings_by_minute": time_call(dashboard.query_readings_by_minute,
+                                              latest, botanist_id),
+        "query_rollups": time_call(dashboard.query_rollups, botanist_id, "hour",
+                                   latest - timedelta(days=1)),
+    }
+
+
+def run_size(size: int, args: argparse.Namespace, work_dir: str, dashboard) -> dict:
+    """Runs and times every benchmark for one plant count."""
+    import extract
+    from etl import run_etl_pipeline
+    from transfer_to_s3 import main_transfer
+    from mock_plants_api import MockPlantsAPI
+
+    reset_work_dir(work_dir)
+    reset_database()
+    result = {}
+    with MockPlantsAPI(size, args.latency, args.error_rate) as api:
+        extract.BASE_URL = api.base_url
+        sys.argv = ["etl.py", "--scan", "discover", "--workers", str(args.workers)]
+        result["etl_seconds"] = time_call(run_etl_pipeline)
+        result["api_requests"] = api.requests
+    result["etl_metrics"] = get_latest_metrics("etl")
+    if dashboard is not None:
+        result["dashboard_seconds"] = time_dashboard_queries(dashboard)
+    result["transfer_seconds"] = time_call(main_transfer)
+    result["transfer_metrics"] = get_latest_metrics("transfer_to_s3")
+    return result
+
+
+def get_timings(result: dict) -> dict:
+    """Flattens a size's results into the timings compared against a baseline."""
+    timings = {"etl_seconds": result["etl_seconds"],
+               "transfer_seconds": result["transfer_seconds"]}
+    for name, seconds in (result.get("etl_metrics") or {}).get("stages", {}).items():
+        timings[f"etl.{name}"] = seconds["wall_seconds"]
+    for name, seconds in result.get("dashboard_seconds", {}).items():
+        timings[f"dashboard.{name}"] = seconds
+    return timings
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Returns a line for every timing more than tolerance slower than the baseline."""
+    regressions = []
+    for size, result in results["sizes"].items():
+        if size not in baseline["sizes"]:
+            continue
+        baseline_timings = get_timings(baseline["sizes"][size])
+        for name, seconds in get_timings(result).items():
+            before = baseline_timings.get(name)
+            if before and seconds > before * (1 + tolerance):
+                regressions.append(f"{size} plants, {name}: {before:.2f}s -> {seconds:.2f}s "
+                                   f"(+{(seconds / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def get_arguments() -> argparse.Namespace:
+    """Parse and return command-line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the plants pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES,
+                        help="Plant counts to benchmark.")
+    parser.add_argument("--latency", type=float, default=0.01,
+                        help="Base latency of the mock plants API, in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0,
+                        help="Share of mock plants API requests that fail with a 500.")
+    parser.add_argument("--workers", type=int, default=10,
+                        help="Extract workers.")
+    parser.add_argument("--save", help="JSON file to save the results to, e.g. as a baseline.")
+    parser.add_argument("--compare", help="Baseline JSON file to compare the results against.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown against the baseline, e.g. 0.2 for 20%%.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_arguments()
+    work_dir = tempfile.mkdtemp(prefix="plants_benchmark_")
+    save_path = os.path.abspath(args.save) if args.save else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    configure_environment(work_dir)
+    dashboard = load_dashboard()
+
+    results = {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "workers": args.workers,
+        "sizes": {},
+    }
+    for size in args.sizes:
+        print(f"Benchmarking {size} plants...")
+        results["sizes"][str(size)] = run_size(size, args, work_dir, dashboard)
+        print(json.dumps(get_timings(results["sizes"][str(size)]), indent=2))
+
+    if save_path:
+        os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+        with open(save_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {save_path}")
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    if compare_path:
+        with open(compare_path, "r") as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
@@ -0,0 +1,130 @@
+"""Checks that the hot queries use their indexes.
+
+Each query's estimated plan is read with SHOWPLAN_XML, which compiles the query
+without running it. Every operator that reads a table is listed. A query fails
+the check if it scans a table that one of its indexes should let it seek. Run it
+after applying the migrations, e.g. from CI against a test database:
+
+    python check_query_plans.py
+
+It exits with status 1 if any query scans."""
+import logging
+import os
+import sys
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+try:
+    from connect_to_database import get_connection
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "etl_process"))
+    from connect_to_database import get_connection
+
+SHOWPLAN_NAMESPACE = {"p": "http://schemas.microsoft.com/sqlserver/2004/07/showplan"}
+SCAN_OPERATORS = {"Table Scan", "Clustered Index Scan", "Index Scan"}
+
+# Each hot query, with representative parameters and the tables it should seek.
+HOT_QUERIES = {
+    "readings_by_minute": (
+        """
+        SELECT sd.recording_taken, sd.last_watered, sd.soil_moisture, sd.temperature, p.plant_id
+        FROM alpha.sensor_data sd
+        INNER JOIN alpha.plant p ON sd.plant_id = p.plant_id
+        WHERE p.botanist_id = %s AND sd.recording_taken >= %s AND sd.recording_taken < %s;
+        """,
+        lambda now: (1, now - timedelta(minutes=1), now),
+        {"sensor_data"},
+    ),
+    "loaded_keys": (
+        "SELECT plant_id, recording_taken FROM alpha.sensor_data WHERE recording_taken >= %s;",
+        lambda now: (now - timedelta(minutes=1),),
+        {"sensor_data"},
+    ),
+    "plant_species_by_scientific_name": (
+        "SELECT scientific_name, scientific_name_id FROM alpha.plant_species "
+        "WHERE scientific_name IN (%s, %s);",
+        lambda now: ("Rosa", "Ficus"),
+        {"plant_species"},
+    ),
+    "country_by_name": (
+        "SELECT country_name, country_id FROM alpha.country WHERE country_name IN (%s, %s);",
+        lambda now: ("India", "Kenya"),
+        {"country"},
+    ),
+    "botanist_by_email": (
+        "SELECT botanist_email, botanist_id FROM alpha.botanist WHERE botanist_email IN (%s, %s);",
+        lambda now: ("a@example.com", "b@example.com"),
+        {"botanist"},
+    ),
+}
+
+
+def configure_logging() -> None:
+    """Configure logging"""
+    logging.basicConfig(
+        filename='query_plans.log',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+
+def get_table_accesses(plan_xml: str) -> list[tuple]:
+    """Returns (operator, table, index) for every operator in a plan that reads a table."""
+    accesses = []
+    for rel_op in ET.fromstring(plan_xml).iter(f"{{{SHOWPLAN_NAMESPACE['p']}}}RelOp"):
+        table_object = rel_op.find("./*/p:Object", SHOWPLAN_NAMESPACE)
+        if table_object is None:
+            continue
+        accesses.append((rel_op.get("PhysicalOp"),
+                         table_object.get("Table", "").strip("[]"),
+                         table_object.get("Index", "").strip("[]") or None))
+    return accesses
+
+
+def get_scans(accesses: list[tuple], tables: set) -> list[tuple]:
+    """Returns the accesses that scan one of the given tables."""
+    return [access for access in accesses if access[0] in SCAN_OPERATORS and access[1] in tables]
+
+
+def fetch_plan(cursor, query: str, params: tuple) -> str:
+    """Returns the estimated plan of a query as XML, without running it."""
+    cursor.execute("SET SHOWPLAN_XML ON;")
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchone()[0]
+    finally:
+        cursor.execute("SET SHOWPLAN_XML OFF;")
+
+
+def check_query_plans(conn, queries: dict = HOT_QUERIES) -> dict:
+    """Prints how each query reads its tables, returning the scans found by query name."""
+    now = datetime.now()
+    failures = {}
+    with conn.cursor() as cursor:
+        for name, (query, get_params, tables) in queries.items():
+            accesses = get_table_accesses(fetch_plan(cursor, query, get_params(now)))
+            print(f"{name}:")
+            for operator, table, index in accesses:
+                print(f"    {operator} on {table}" + (f" using {index}" if index else ""))
+            scans = get_scans(accesses, tables)
+            if scans:
+                failures[name] = scans
+                logging.warning(f"{name} scans {', '.join(scan[1] for scan in scans)}.")
+    return failures
+
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    configure_logging()
+    conn = get_connection()
+    if conn is None:
+        sys.exit("Unable to connect to the database.")
+    try:
+        failures = check_query_plans(conn)
+    finally:
+        conn.close()
+    if failures:
+        sys.exit(f"Queries scanning tables they should seek: {', '.join(failures)}")
+    print("Every hot query seeks its indexes.")
@@ -1,7 +1,41 @@
-"""Executes schema SQL script to set up the database schema"""
+"""Applies the versioned schema migrations in migrations/ to the database.
+
+Migrations are named <version>_<name>.sql and run once each, in version
+order, each in its own transaction. alpha.schema_migrations records the
+version and checksum of every migration applied, so re-running this script
+only applies the new ones. Editing a migration that has already been applied
+is an error; add a new migration instead."""
+import argparse
+import hashlib
 import logging
+import os
+import re
+import sys
 from dotenv import load_dotenv
-from pipeline.etl_process.connect_to_database import get_connection, get_cursor
+
+try:
+    from connect_to_database import get_connection
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "etl_process"))
+    from connect_to_database import get_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+CREATE_MIGRATIONS_TABLE = """
+IF OBJECT_ID('alpha.schema_migrations', 'U') IS NULL
+CREATE TABLE alpha.schema_migrations (
+    version INT NOT NULL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    checksum CHAR(64) NOT NULL,
+    applied_at DATETIME NOT NULL DEFAULT GETDATE()
+);
+"""
+
+# Dropped children first, for --reset.
+SCHEMA_TABLES = ["alpha.plant_watermark", "alpha.dimension_cache", "alpha.known_plant",
+                 "alpha.alert_state", "alpha.sensor_rollup", "alpha.sensor_data", "alpha.plant",
+                 "alpha.plant_species", "alpha.country", "alpha.botanist", "alpha.schema_migrations"]
 
 
 def configure_logging() -> None:
@@ -13,30 +47,119 @@ def configure_logging() -> None:
     )
 
 
-def run_schema_script() -> None:
-    """Runs the schema.sql script to create initial tables"""
-    conn = get_connection()
+def get_checksum(sql: str) -> str:
+    """Returns the SHA-256 of a migration, ignoring line ending differences."""
+    return hashlib.sha256(sql.replace("\r\n", "\n").encode("utf-8")).hexdigest()
+
+
+def get_migrations(directory: str = MIGRATIONS_DIR) -> list[dict]:
+    """Reads every migration in the directory, in version order."""
+    migrations = {}
+    for file_name in os.listdir(directory):
+        match = MIGRATION_FILE_PATTERN.match(file_name)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f"Duplicate migration version {version}: {file_name}")
+        with open(os.path.join(directory, file_name), "r") as file:
+            sql = file.read()
+        migrations[version] = {"version": version, "name": match.group(2),
+                               "sql": sql, "checksum": get_checksum(sql)}
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def fetch_applied_migrations(cursor) -> dict:
+    """Returns the checksum of every applied migration by version, creating the table if needed."""
+    cursor.execute(CREATE_MIGRATIONS_TABLE)
+    cursor.execute("SELECT version, checksum FROM alpha.schema_migrations;")
+    return {version: checksum for version, checksum in cursor.fetchall()}
+
 
-    if conn:
-        cursor = get_cursor(conn)
+def get_pending_migrations(migrations: list[dict], applied: dict) -> list[dict]:
+    """Returns the migrations not applied yet.
 
-        try:
-            with open('schema.sql', 'r') as file:
-                sql_script = file.read()
+    Raises a ValueError if an applied migration has been edited since."""
+    for migration in migrations:
+        checksum = applied.get(migration["version"])
+        if checksum is not None and checksum != migration["checksum"]:
+            raise ValueError(f"Migration {migration['version']}_{migration['name']} has changed "
+                             "since it was applied; add a new migration instead.")
+    return [migration for migration in migrations if migration["version"] not in applied]
 
-            cursor.execute(sql_script)
-            conn.commit()
-            logging.info("Schema executed successfully.")
-        except Exception as e:
-            logging.error(f"Error executing schema.sql: {e}")
-        finally:
-            cursor.close()
-            conn.close()
-            logging.info("Database connection closed.")
+
+def apply_migration(conn, migration: dict) -> None:
+    """Runs a migration and records it in one transaction."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(migration["sql"])
+            cursor.execute(
+                "INSERT INTO alpha.schema_migrations (version, name, checksum) VALUES (%s, %s, %s);",
+                (migration["version"], migration["name"], migration["checksum"]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logging.info(f"Applied migration {migration['version']}_{migration['name']}.")
+
+
+def run_migrations(conn, directory: str = MIGRATIONS_DIR) -> list[int]:
+    """Applies every pending migration in version order, returning their versions."""
+    migrations = get_migrations(directory)
+    with conn.cursor() as cursor:
+        applied = fetch_applied_migrations(cursor)
+    conn.commit()
+    pending = get_pending_migrations(migrations, applied)
+    for migration in pending:
+        apply_migration(conn, migration)
+    logging.info(f"Applied {len(pending)} migrations.")
+    return [migration["version"] for migration in pending]
+
+
+def reset_schema(conn) -> None:
+    """Drops every table, including the applied migrations. For development and benchmarks only."""
+    with conn.cursor() as cursor:
+        for table in SCHEMA_TABLES:
+            cursor.execute(f"IF OBJECT_ID('{table}', 'U') IS NOT NULL DROP TABLE {table};")
+    conn.commit()
+    logging.info("Dropped every table in the schema.")
+
+
+def print_status(conn, directory: str = MIGRATIONS_DIR) -> None:
+    """Prints whether each migration has been applied."""
+    with conn.cursor() as cursor:
+        applied = fetch_applied_migrations(cursor)
+    conn.commit()
+    for migration in get_migrations(directory):
+        state = "applied" if migration["version"] in applied else "pending"
+        print(f"{migration['version']:04d}_{migration['name']}: {state}")
+
+
+def get_arguments() -> argparse.Namespace:
+    """Parse and return command-line arguments."""
+    parser = argparse.ArgumentParser(description="Apply the schema migrations.")
+    parser.add_argument("--status", action="store_true",
+                        help="List the applied and pending migrations without applying any.")
+    parser.add_argument("--reset", action="store_true",
+                        help="Drop every table, deleting all data, before applying the migrations.")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
     load_dotenv()
 
     configure_logging()
-    run_schema_script()
+    args = get_arguments()
+    conn = get_connection()
+    if conn is None:
+        sys.exit("Unable to connect to the database.")
+    try:
+        if args.status:
+            print_status(conn)
+        else:
+            if args.reset:
+                reset_schema(conn)
+            print(f"Applied migrations: {run_migrations(conn) or 'none pending'}")
+    finally:
+        conn.close()
+        logging.info("Database connection closed.")
@@ -0,0 +1,179 @@
+"""Sends alert emails concurrently without going over the SES sending quota.
+
+A bounded pool of workers sends the emails through a transport, and every send
+first takes a token from a token bucket refilled at the SES maximum send rate.
+Throttled sends are retried with jittered exponential backoff.
+
+Transports only need a send(sender, recipient, subject, body) method:
+- SESTransport sends through AWS SES.
+- SMTPTransport sends through an SMTP server, e.g. a local debugging server.
+- FileTransport writes each email to a file, for testing offline.
+EMAIL_TRANSPORT picks one of ses, smtp or file."""
+import logging
+import os
+import smtplib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from botocore.client import BaseClient
+from botocore.exceptions import ClientError
+from metrics import get_run
+from retry_backoff import get_backoff_delay
+
+SES_MAX_SEND_RATE = float(os.getenv("SES_MAX_SEND_RATE", "14"))
+DISPATCH_WORKERS = int(os.getenv("ALERT_DISPATCH_WORKERS", "4"))
+DISPATCH_MAX_RETRIES = 3
+THROTTLE_ERROR_CODES = {"Throttling", "ThrottlingException", "TooManyRequestsException"}
+SMTP_THROTTLE_CODES = {421, 450, 451, 452, 454}
+
+
+class ThrottledError(Exception):
+    """Raised by a transport when the mail service asks us to slow down."""
+
+
+class TokenBucket:
+    """Allows up to rate operations per second, with bursts of up to capacity."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blocks until a token is available, then takes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SESTransport:
+    """Sends emails through AWS SES."""
+
+    def __init__(self, ses: BaseClient):
+        self.ses = ses
+
+    def send(self, sender: str, recipient: str, subject: str, body: str) -> None:
+        """Sends one email, raising ThrottledError if SES is throttling us."""
+        try:
+            self.ses.send_email(
+                Source=sender,
+                Destination={'ToAddresses': [recipient]},
+                Message={
+                    'Subject': {'Data': subject},
+                    'Body': {'Text': {'Data': body}}
+                }
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in THROTTLE_ERROR_CODES:
+                raise ThrottledError(str(e)) from e
+            raise
+
+
+class SMTPTransport:
+    """Sends emails through an SMTP server."""
+
+    def __init__(self, host: str = "localhost", port: int = 1025):
+        self.host = host
+        self.port = port
+
+    def send(self, sender: str, recipient: str, subject: str, body: str) -> None:
+        """Sends one email, raising ThrottledError on a temporary SMTP failure."""
+        message = EmailMessage()
+        message['From'] = sender
+        message['To'] = recipient
+        message['Subject'] = subject
+        message.set_content(body)
+        try:
+            with smtplib.SMTP(self.host, self.port) as smtp:
+                smtp.send_message(message)
+        except smtplib.SMTPResponseException as e:
+            if e.smtp_code in SMTP_THROTTLE_CODES:
+                raise ThrottledError(str(e)) from e
+            raise
+
+
+class FileTransport:
+    """Writes each email to a .eml file in a directory instead of sending it.
+
+    latency simulates a slow mail service, in seconds per email."""
+
+    def __init__(self, directory: str, latency: float = 0):
+        self.directory = directory
+        self.latency = latency
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, sender: str, recipient: str, subject: str, body: str) -> None:
+        """Writes one email to its own file."""
+        if self.latency:
+            time.sleep(self.latency)
+        message = EmailMessage()
+        message['From'] = sender
+        message['To'] = recipient
+        message['Subject'] = subject
+        message.set_content(body)
+        with open(os.path.join(self.directory, f"{uuid.uuid4().hex}.eml"), "w") as f:
+            f.write(message.as_string())
+
+
+def get_transport(name: str, ses: BaseClient = None):
+    """Returns the transport named by EMAIL_TRANSPORT."""
+    if name == "smtp":
+        return SMTPTransport(os.getenv("SMTP_HOST", "localhost"), int(os.getenv("SMTP_PORT", "1025")))
+    if name == "file":
+        return FileTransport(os.getenv("EMAIL_SINK_DIR", "./plants_data/outbox"))
+    return SESTransport(ses)
+
+
+class AlertDispatcher:
+    """Sends emails from a bounded worker pool, rate limited by a token bucket."""
+
+    def __init__(self, transport, sender: str, max_workers: int = DISPATCH_WORKERS,
+                 rate: float = SES_MAX_SEND_RATE, max_retries: int = DISPATCH_MAX_RETRIES):
+        self.transport = transport
+        self.sender = sender
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate)
+        self.max_retries = max_retries
+
+    def send(self, recipient: str, subject: str, body: str) -> bool:
+        """Sends one email, retrying while throttled. Returns whether it was sent."""
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            start = time.perf_counter()
+            try:
+                self.transport.send(self.sender, recipient, subject, body)
+                get_run().observe_latency("email_send", time.perf_counter() - start)
+                get_run().count("emails_sent")
+                logging.info(f"Email sent to {recipient}: {subject}")
+                return True
+            except ThrottledError as e:
+                get_run().count("emails_throttled")
+                if attempt == self.max_retries:
+                    logging.error(f"Still throttled sending to {recipient}, giving up: {e}")
+                    return False
+                logging.warning(f"Throttled sending to {recipient}, retrying: {e}")
+                time.sleep(get_backoff_delay(attempt))
+            except Exception as e:
+                logging.error(f"Failed to send email to {recipient}: {e}")
+                return False
+        return False
+
+    def dispatch(self, emails: list[tuple[str, str, str]]) -> list[bool]:
+        """Sends (recipient, subject, body) emails concurrently, returning which were sent."""
+        if not emails:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(emails))) as executor:
+            results = list(executor.map(lambda email: self.send(*email), emails))
+        logging.info(f"Dispatched {sum(results)} of {len(emails)} emails.")
+        return results
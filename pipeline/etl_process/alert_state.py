@@ -0,0 +1,160 @@
+"""Tracks which plant health alerts are open, so botanists are not emailed
+about the same problem every minute.
+
+Each (plant_id, rule) pair has an alert that is opened the first time the rule
+is broken and resolved once a later reading passes it. An open alert is only
+due for another notification after ALERT_COOLDOWN_HOURS. The state is kept
+between runs in the alpha.alert_state table, since each ETL task starts with
+an empty filesystem. ALERT_STATE_STORE=file keeps it in a local JSON state
+file instead, for local runs without that table."""
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+import pandas as pd
+import pymssql
+from connect_to_database import get_connection, get_chunks
+
+ALERT_STATE_STORE = os.getenv("ALERT_STATE_STORE", "database")
+ALERT_STATE_FILE = os.getenv("ALERT_STATE_FILE", "./plants_data/alert_state.json")
+ALERT_COOLDOWN = timedelta(hours=float(os.getenv("ALERT_COOLDOWN_HOURS", "6")))
+
+
+def get_alert_key(plant_id: int, rule: str) -> str:
+    """Returns the state file key of a plant's alert for one rule."""
+    return f"{int(plant_id)}:{rule}"
+
+
+def load_alert_state(state_file: str = ALERT_STATE_FILE) -> dict:
+    """Loads the alert state file, or an empty state if there is no usable file."""
+    try:
+        with open(state_file, "r") as f:
+            state = json.load(f)
+        for alert in state.values():
+            alert["opened_at"] = datetime.fromisoformat(alert["opened_at"])
+            if alert["last_notified"] is not None:
+                alert["last_notified"] = datetime.fromisoformat(alert["last_notified"])
+        return state
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+def save_alert_state(state: dict, state_file: str = ALERT_STATE_FILE) -> None:
+    """Writes the alert state file, dropping alerts that have been resolved."""
+    os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+    with open(state_file, "w") as f:
+        json.dump({key: {**alert,
+                         "opened_at": alert["opened_at"].isoformat(),
+                         "last_notified": alert["last_notified"].isoformat()
+                         if alert["last_notified"] is not None else None}
+                   for key, alert in state.items() if alert["status"] == "open"}, f)
+
+
+def fetch_alert_state(conn: pymssql.Connection) -> dict:
+    """Reads the open alerts from alpha.alert_state."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT plant_id, rule, opened_at, last_notified FROM alpha.alert_state;")
+        return {get_alert_key(plant_id, rule): {"status": "open", "opened_at": opened_at,
+                                                "last_notified": last_notified}
+                for plant_id, rule, opened_at, last_notified in cursor.fetchall()}
+
+
+def store_alert_state(conn: pymssql.Connection, state: dict) -> None:
+    """Upserts the open alerts into alpha.alert_state and deletes the resolved ones."""
+    open_rows, resolved_rows = [], []
+    for key, alert in state.items():
+        plant_id, rule = key.split(":", 1)
+        if alert["status"] == "open":
+            open_rows.append((int(plant_id), rule, alert["opened_at"], alert["last_notified"]))
+        else:
+            resolved_rows.append((int(plant_id), rule))
+
+    with conn.cursor() as cursor:
+        for chunk in get_chunks(open_rows, 4):
+            cursor.execute(
+                f"""
+                MERGE alpha.alert_state AS t
+                USING (VALUES {", ".join(["(%s, %s, %s, %s)"] * len(chunk))})
+                    AS s (plant_id, rule, opened_at, last_notified)
+                ON t.plant_id = s.plant_id AND t.rule = s.rule
+                WHEN MATCHED THEN UPDATE SET
+                    opened_at = s.opened_at, last_notified = s.last_notified
+                WHEN NOT MATCHED THEN
+                    INSERT (plant_id, rule, opened_at, last_notified)
+                    VALUES (s.plant_id, s.rule, s.opened_at, s.last_notified);
+                """,
+                tuple(value for row in chunk for value in row)
+            )
+        for chunk in get_chunks(resolved_rows, 2):
+            cursor.execute(
+                "DELETE FROM alpha.alert_state WHERE "
+                + " OR ".join(["(plant_id = %s AND rule = %s)"] * len(chunk)) + ";",
+                tuple(value for row in chunk for value in row)
+            )
+    conn.commit()
+
+
+def read_alert_state(store: str = ALERT_STATE_STORE, state_file: str = ALERT_STATE_FILE) -> dict:
+    """Loads the alert state from the configured store."""
+    if store == "file":
+        return load_alert_state(state_file)
+    conn = get_connection()
+    if conn is None:
+        raise ConnectionError("Unable to connect to the database to read the alert state.")
+    try:
+        return fetch_alert_state(conn)
+    finally:
+        conn.close()
+
+
+def write_alert_state(state: dict, store: str = ALERT_STATE_STORE,
+                      state_file: str = ALERT_STATE_FILE) -> None:
+    """Saves the alert state to the configured store."""
+    if store == "file":
+        save_alert_state(state, state_file)
+        return
+    conn = get_connection()
+    if conn is None:
+        raise ConnectionError("Unable to connect to the database to save the alert state.")
+    try:
+        store_alert_state(conn, state)
+    finally:
+        conn.close()
+
+
+def update_alert_state(state: dict, violations: pd.DataFrame, evaluated_plant_ids: set,
+                       now: datetime, cooldown: timedelta = ALERT_COOLDOWN) -> tuple[list, list]:
+    """Opens, keeps or resolves alerts from this run's violations.
+
+    Alerts for plants that were evaluated but no longer break their rule are
+    resolved; plants missing from this run are left as they were.
+    Returns the keys of the alerts due a notification and of those just resolved."""
+    broken = {get_alert_key(plant_id, rule)
+              for plant_id, rule in zip(violations["plant_id"], violations["rule"])}
+
+    due = []
+    for key in sorted(broken):
+        alert = state.get(key)
+        if alert is None or alert["status"] != "open":
+            state[key] = {"status": "open", "opened_at": now, "last_notified": None}
+            due.append(key)
+        elif alert["last_notified"] is None or now - alert["last_notified"] >= cooldown:
+            due.append(key)
+
+    evaluated = {int(plant_id) for plant_id in evaluated_plant_ids if pd.notna(plant_id)}
+    resolved = []
+    for key, alert in state.items():
+        if (alert["status"] == "open" and key not in broken
+                and int(key.split(":")[0]) in evaluated):
+            alert["status"] = "resolved"
+            resolved.append(key)
+
+    logging.info(f"{len(broken)} open alerts, {len(due)} due a notification, "
+                 f"{len(resolved)} resolved.")
+    return due, resolved
+
+
+def mark_notified(state: dict, keys: list[str], now: datetime) -> None:
+    """Records that the botanist has been told about these alerts."""
+    for key in keys:
+        state[key]["last_notified"] = now
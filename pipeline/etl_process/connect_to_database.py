@@ -1,12 +1,180 @@
-"""Connects to RDS database using credentials"""
+"""Connects to RDS database using credentials
+
+Connections are handed out from a process-wide pool, so the ETL stages, the
+S3 transfer and the dashboard reuse logged-in connections instead of paying
+the TLS and login handshake on every call. Closing a pooled connection
+returns it to the pool."""
 import pymssql
 from pymssql import Connection, Cursor
+import atexit
 import os
 import logging
+import threading
+import time
 from dotenv import load_dotenv
+from metrics import get_run
 
 
 SCHEMA = os.getenv("SCHEMA_NAME")
+MAX_PARAMETERS = 2000
+MAX_VALUES_ROWS = 1000
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "4"))
+POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))
+POOL_HEALTH_CHECK_AFTER = 30
+POOL_ACQUIRE_TIMEOUT = 30
+
+
+class ConnectionPool:
+    """A bounded pool of database connections with health checks and idle eviction."""
+
+    def __init__(self, connect, max_size: int = POOL_MAX_SIZE,
+                 idle_timeout: float = POOL_IDLE_TIMEOUT,
+                 health_check_after: float = POOL_HEALTH_CHECK_AFTER):
+        self.connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.idle = []
+        self.size = 0
+        self.condition = threading.Condition()
+
+    def evict_idle(self) -> None:
+        """Closes connections that have been idle for longer than the idle timeout."""
+        now = time.monotonic()
+        expired = [conn for conn, last_used in self.idle if now - last_used >= self.idle_timeout]
+        self.idle = [(conn, last_used) for conn, last_used in self.idle
+                     if now - last_used < self.idle_timeout]
+        for conn in expired:
+            self.discard(conn)
+
+    def discard(self, conn: Connection) -> None:
+        """Closes a connection and frees its slot. Must be called holding the condition."""
+        self.size -= 1
+        self.condition.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self, timeout: float = POOL_ACQUIRE_TIMEOUT) -> Connection:
+        """Returns a healthy idle connection, or opens one if the pool is not full."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                self.evict_idle()
+                while self.idle:
+                    conn, last_used = self.idle.pop()
+                    if time.monotonic() - last_used < self.health_check_after or is_healthy(conn):
+                        return conn
+                    logging.info("Discarded unhealthy pooled connection.")
+                    self.discard(conn)
+                if self.size < self.max_size:
+                    self.size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a pooled database connection.")
+                self.condition.wait(remaining)
+
+        try:
+            return self.connect()
+        except Exception:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+
+    def release(self, conn: Connection) -> None:
+        """Returns a connection to the pool, discarding it if it can no longer be used."""
+        with self.condition:
+            try:
+                conn.rollback()
+            except Exception:
+                self.discard(conn)
+                return
+            self.idle.append((conn, time.monotonic()))
+            self.evict_idle()
+            self.condition.notify()
+
+    def close_all(self) -> None:
+        """Closes every idle connection."""
+        with self.condition:
+            for conn, _ in self.idle:
+                self.discard(conn)
+            self.idle = []
+
+
+class CountingCursor:
+    """Wraps a cursor so that every statement counts as a database round trip."""
+
+    def __init__(self, cursor: Cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._cursor.close()
+
+    def execute(self, *args, **kwargs):
+        get_run().count("db_round_trips")
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, operation, params_seq, *args, **kwargs):
+        params_seq = list(params_seq)
+        get_run().count("db_round_trips", len(params_seq))
+        return self._cursor.executemany(operation, params_seq, *args, **kwargs)
+
+
+class PooledConnection:
+    """Wraps a pooled connection so that close() hands it back to the pool.
+
+    Statements, commits and bulk copies are counted as database round trips."""
+
+    def __init__(self, pool: ConnectionPool, conn: Connection):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs) -> CountingCursor:
+        return CountingCursor(self._conn.cursor(*args, **kwargs))
+
+    def commit(self) -> None:
+        get_run().count("db_round_trips")
+        self._conn.commit()
+
+    def bulk_copy(self, *args, **kwargs):
+        get_run().count("db_round_trips")
+        return self._conn.bulk_copy(*args, **kwargs)
+
+    @property
+    def supports_bulk_copy(self) -> bool:
+        """Whether the wrapped driver connection can bulk copy."""
+        return hasattr(self._conn, "bulk_copy")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """Returns the connection to the pool."""
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
 
 
 def configure_logging() -> None:
@@ -18,18 +186,46 @@ def configure_logging() -> None:
     )
 
 
+def open_connection() -> Connection:
+    """Opens a new, unpooled connection to the RDS database"""
+    conn = pymssql.connect(
+        server=os.getenv("DB_HOST"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME"),
+        port=int(os.getenv("DB_PORT"))
+    )
+    logging.info("Connected to the database successfully.")
+    return conn
+
+
+def is_healthy(conn: Connection) -> bool:
+    """Checks a connection is still usable with a trivial query"""
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1;")
+        cursor.fetchone()
+        cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+def get_pool() -> ConnectionPool:
+    """Returns the process-wide connection pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(open_connection)
+            atexit.register(_pool.close_all)
+        return _pool
+
+
 def get_connection() -> Connection:
     """Connects to RDS database using credentials"""
+    pool = get_pool()
     try:
-        conn = pymssql.connect(
-            server=os.getenv("DB_HOST"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME"),
-            port=int(os.getenv("DB_PORT"))
-        )
-        logging.info("Connected to the database successfully.")
-        return conn
+        return PooledConnection(pool, pool.acquire())
     except Exception as e:
         logging.error(f"Error connecting to the database: {e}")
         return None
@@ -40,6 +236,12 @@ def get_cursor(conn: Connection) -> Cursor:
     return conn.cursor(as_dict=True)
 
 
+def get_chunks(rows: list, columns_per_row: int, max_rows: int = MAX_VALUES_ROWS) -> list[list]:
+    """Splits rows into chunks that fit SQL Server's parameter and VALUES limits."""
+    chunk_size = max(1, min(max_rows, MAX_VALUES_ROWS, MAX_PARAMETERS // columns_per_row))
+    return [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+
+
 if __name__ == "__main__":
 
     load_dotenv()
@@ -0,0 +1,112 @@
+"""Caches the natural key to surrogate ID mappings of the dimension tables.
+
+The cache is warmed with one query per table and kept between runs as a
+snapshot, so steady-state runs only go to the database for keys they have not
+seen before. Each ETL run is a fresh task with an empty filesystem, so the
+snapshot is kept in alpha.dimension_cache by default, written in the same
+transaction as the dimension rows it maps. DIMENSION_CACHE_STORE=file keeps it
+in DIMENSION_CACHE_FILE instead, which only lasts between local runs."""
+import json
+import logging
+import os
+import pymssql
+
+DIMENSION_CACHE_STORE = os.getenv("DIMENSION_CACHE_STORE", "database")
+DIMENSION_CACHE_FILE = os.getenv("DIMENSION_CACHE_FILE", "./plants_data/dimension_cache.json")
+
+DIMENSION_TABLES = {
+    "plant_species": ("alpha.plant_species", "scientific_name", "scientific_name_id"),
+    "country": ("alpha.country", "country_name", "country_id"),
+    "botanist": ("alpha.botanist", "botanist_email", "botanist_id"),
+    "plant": ("alpha.plant", "plant_id", "plant_id"),
+}
+
+
+def warm_dimension_cache(cursor: pymssql.Cursor) -> dict:
+    """Reads every natural key and surrogate ID, one query per dimension table."""
+    cache = {}
+    for name, (table, key_column, id_column) in DIMENSION_TABLES.items():
+        cursor.execute(f"SELECT {key_column}, {id_column} FROM {table}")
+        cache[name] = {key: key_id for key, key_id in cursor.fetchall()}
+    logging.info("Warmed dimension cache from the database.")
+    return cache
+
+
+def parse_dimension_snapshot(snapshot: dict) -> dict:
+    """Rebuilds the cache from a JSON snapshot, whose keys are all strings."""
+    cache = {name: dict(snapshot[name]) for name in DIMENSION_TABLES}
+    cache["plant"] = {int(key): int(key_id) for key, key_id in cache["plant"].items()}
+    return cache
+
+
+def load_dimension_cache(cache_file: str = DIMENSION_CACHE_FILE) -> dict:
+    """Loads the cache snapshot, or None if there is no usable snapshot."""
+    try:
+        with open(cache_file, "r") as f:
+            return parse_dimension_snapshot(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_dimension_cache(cache: dict, cache_file: str = DIMENSION_CACHE_FILE) -> None:
+    """Writes the cache snapshot for the next run."""
+    os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+    with open(cache_file, "w") as f:
+        json.dump(cache, f)
+
+
+def fetch_dimension_cache(cursor: pymssql.Cursor) -> dict:
+    """Reads the cache snapshot from alpha.dimension_cache, or None if there is no usable snapshot."""
+    cursor.execute("SELECT dimension, snapshot FROM alpha.dimension_cache;")
+    try:
+        return parse_dimension_snapshot(
+            {dimension: json.loads(snapshot) for dimension, snapshot in cursor.fetchall()})
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def store_dimension_cache(cursor: pymssql.Cursor, cache: dict) -> None:
+    """Upserts the cache snapshot into alpha.dimension_cache. The caller commits."""
+    cursor.execute(
+        f"""
+        MERGE alpha.dimension_cache AS t
+        USING (VALUES {", ".join(["(%s, %s)"] * len(DIMENSION_TABLES))}) AS s (dimension, snapshot)
+        ON t.dimension = s.dimension
+        WHEN MATCHED THEN UPDATE SET snapshot = s.snapshot, saved_at = GETDATE()
+        WHEN NOT MATCHED THEN
+            INSERT (dimension, snapshot, saved_at) VALUES (s.dimension, s.snapshot, GETDATE());
+        """,
+        tuple(value for name in DIMENSION_TABLES for value in (name, json.dumps(cache[name])))
+    )
+
+
+def invalidate_dimension_cache(cache_file: str = DIMENSION_CACHE_FILE,
+                               store: str = DIMENSION_CACHE_STORE) -> None:
+    """Deletes the cache snapshot so the next run warms it from the database.
+
+    The database snapshot is written in the load's transaction, so rolling the
+    load back already discards it."""
+    if store == "file" and os.path.exists(cache_file):
+        os.remove(cache_file)
+        logging.info("Invalidated dimension cache.")
+
+
+def get_dimension_cache(cursor: pymssql.Cursor, cache_file: str = DIMENSION_CACHE_FILE,
+                        store: str = DIMENSION_CACHE_STORE) -> dict:
+    """Returns the cached dimension keys, warming the cache if there is no snapshot."""
+    if store == "file":
+        cache = load_dimension_cache(cache_file)
+    else:
+        cache = fetch_dimension_cache(cursor)
+    if cache is None:
+        cache = warm_dimension_cache(cursor)
+    return cache
+
+
+def write_dimension_cache(cursor: pymssql.Cursor, cache: dict, cache_file: str = DIMENSION_CACHE_FILE,
+                          store: str = DIMENSION_CACHE_STORE) -> None:
+    """Saves the cache snapshot to the configured store."""
+    if store == "file":
+        save_dimension_cache(cache, cache_file)
+    else:
+        store_dimension_cache(cursor, cache)
@@ -1,8 +1,11 @@
 """
 email_sender.py checks the plants_data_cleaned.csv file for any values outside
-of the specified range of 'healthy plant' (this can be changed within this script)
+of the specified range of 'healthy plant' (this can be changed within this script,
+or with per-species and per-plant rules in HEALTH_RULES_FILE, see health_rules.py)
 and emails the botanist who has been assigned to the plant if the plant is classified
-as 'unhealthy'.
+as 'unhealthy'. Each botanist gets at most one digest email per run, and a plant is only
+emailed about again once its alert cooldown has passed (see alert_state.py). Emails
+are sent concurrently within the SES send rate (see alert_dispatch.py).
 Logging is also utilised to ensure a clear story can be told throughout the running of
 the script.
 """
@@ -11,7 +14,14 @@ import csv
 from dotenv import load_dotenv
 import os
 import logging
+import pandas as pd
+from datetime import datetime
 from botocore.client import BaseClient
+from connect_to_database import get_connection
+from health_rules import get_default_rules, load_rules, evaluate_health_rules, fetch_previous_readings
+from alert_dispatch import AlertDispatcher, get_transport
+from metrics import get_run
+from alert_state import read_alert_state, write_alert_state, update_alert_state, mark_notified
 
 def get_config() -> dict[str]:
     """Fetches configuration settings for the application."""
@@ -19,10 +29,34 @@ def get_config() -> dict[str]:
         'aws_region': os.getenv('AWS_REGION'),
         'ses_sender_email': os.getenv('SES_SENDER_EMAIL'),
         'csv_file_path': os.getenv('FILE_PATH'),
+        'health_rules_file': os.getenv('HEALTH_RULES_FILE'),
+        'email_transport': os.getenv('EMAIL_TRANSPORT', 'ses'),
         'soil_moisture_threshold': 50,
         'temperature_threshold': 15,
     }
 
+def get_rules(config: dict) -> list[dict]:
+    """Returns the health rules from HEALTH_RULES_FILE, or the default thresholds."""
+    if config.get('health_rules_file'):
+        return load_rules(config['health_rules_file'])
+    return get_default_rules(config)
+
+def get_previous_readings(rules: list[dict]) -> pd.DataFrame:
+    """Fetches each plant's previous reading if any rate of change rule needs it."""
+    if not any(rule['type'] == 'rate' for rule in rules):
+        return None
+    conn = get_connection()
+    if conn is None:
+        logging.error("Could not fetch previous readings; skipping rate of change rules.")
+        return None
+    try:
+        return fetch_previous_readings(conn)
+    except Exception as e:
+        logging.error(f"Failed to fetch previous readings: {e}")
+        return None
+    finally:
+        conn.close()
+
 def get_ses_client(aws_region: str) -> BaseClient:
     """Initializes and returns the SES client."""
     return boto3.client('ses', region_name=aws_region)
@@ -39,58 +73,102 @@ def read_csv(file_path: str) -> list[dict]:
         logging.error(f"Failed to read CSV file {file_path}: {e}")
         raise
 
-def send_email_alert(ses: BaseClient, sender_email: str, plant_data: dict[str, str]) -> None:
-    """Send an alert email to the botanist."""
-    subject = f"Plant Health Alert for {plant_data['plant_name']}"
-    body = (
-        f"Dear {plant_data['botanist_forename']} {plant_data['botanist_surname']},\n\n"
-        f"We have detected an issue with the health of your plant:\n"
+def get_plant_summary(plant_data: dict[str, str]) -> str:
+    """Describes a plant and its current conditions for an alert email."""
+    return (
         f"Plant Name: {plant_data['plant_name']} ({plant_data['scientific_name']})\n"
         f"Plant ID: {plant_data['plant_id']}\n"
         f"Country of Origin: {plant_data['country_name']}\n"
-        f"\nCurrent Conditions:\n"
         f"- Soil Moisture: {plant_data['soil_moisture']}%\n"
         f"- Temperature: {plant_data['temperature']}°C\n"
         f"- Last Watered: {plant_data['last_watered']}\n"
-        f"\nRecommended Action: Please check the plant's environment and address the issue promptly.\n\n"
-        f"Best regards,\n"
-        f"The Plant Health Monitoring Team"
     )
-    try:
-        ses.send_email(
-            Source=sender_email,
-            Destination={'ToAddresses': [plant_data['botanist_email']]},
-            Message={
-                'Subject': {'Data': subject},
-                'Body': {'Text': {'Data': body}}
-            }
-        )
-        logging.info(f"Alert email sent to {plant_data['botanist_email']} for plant {plant_data['plant_name']}")
-    except Exception as e:
-        logging.error(f"Failed to send email to {plant_data['botanist_email']}: {e}")
 
-def check_and_alert_unhealthy_plants(plant_data_list: list[dict], ses: BaseClient, config: dict) -> None:
-    """Checks plant health and sends alerts for unhealthy plants."""
-    for plant_data in plant_data_list:
+def build_digest_email(alerts: list[tuple[dict, list[str]]],
+                       resolved: list[dict]) -> tuple[str, str, str]:
+    """Builds one email to a botanist covering every plant that needs their attention.
+
+    alerts holds each unhealthy plant with the rules it broke, resolved the
+    plants that have recovered since the last email. Returns (recipient, subject, body)."""
+    botanist = (alerts[0][0] if alerts else resolved[0])
+    subject = (f"Plant Health Alert for {len(alerts)} plant(s)" if alerts
+               else f"Plant Health Resolved for {len(resolved)} plant(s)")
+    body = f"Dear {botanist['botanist_forename']} {botanist['botanist_surname']},\n\n"
+    if alerts:
+        body += "We have detected an issue with the health of these plants:\n"
+        for plant_data, broken in alerts:
+            body += f"\n{get_plant_summary(plant_data)}Issues: {', '.join(broken)}\n"
+        body += "\nRecommended Action: Please check the plants' environment and address the issues promptly.\n\n"
+    if resolved:
+        body += "These plants are healthy again:\n"
+        for plant_data in resolved:
+            body += f"- {plant_data['plant_name']} (Plant ID: {plant_data['plant_id']})\n"
+        body += "\n"
+    body += "Best regards,\nThe Plant Health Monitoring Team"
+    return botanist['botanist_email'], subject, body
+
+def get_latest_positions(plant_data_list: list[dict]) -> dict[int, int]:
+    """Maps each plant ID to the position of its latest reading in the batch."""
+    plant_ids = pd.to_numeric(pd.Series([plant.get('plant_id') for plant in plant_data_list],
+                                        dtype=object), errors='coerce')
+    return {int(plant_id): position for position, plant_id in enumerate(plant_ids)
+            if pd.notna(plant_id)}
+
+def check_and_alert_unhealthy_plants(plant_data_list: list[dict], dispatcher: AlertDispatcher,
+                                     config: dict,
+                                     rules: list[dict] = None, previous: pd.DataFrame = None,
+                                     state: dict = None, now: datetime = None) -> pd.DataFrame:
+    """Checks plant health and sends one digest email per botanist.
+
+    Every rule is evaluated over the whole batch at once. Only alerts that are
+    new, or open for longer than the cooldown, are emailed, along with plants
+    that have recovered; the emails are sent concurrently by the dispatcher and
+    state is updated in place. Returns the violations."""
+    rules = get_rules(config) if rules is None else rules
+    state = {} if state is None else state
+    now = datetime.now() if now is None else now
+    readings = pd.DataFrame(plant_data_list)
+    violations = evaluate_health_rules(readings, rules, previous)
+
+    unhealthy = violations.index.unique()
+    logging.info(f"{len(readings) - len(unhealthy)} of {len(readings)} plants are healthy.")
+    positions = get_latest_positions(plant_data_list)
+    due, resolved = update_alert_state(state, violations, set(positions), now)
+    get_run().count("health_violations", len(violations))
+    get_run().count("alerts_due", len(due))
+
+    digests = {}
+    for key in due:
+        plant_id, rule = key.split(':', 1)
+        plant_data = plant_data_list[positions[int(plant_id)]]
+        digest = digests.setdefault(plant_data.get('botanist_email'), {'alerts': {}, 'resolved': []})
+        digest['alerts'].setdefault(int(plant_id), (plant_data, [], []))
+        digest['alerts'][int(plant_id)][1].append(rule)
+        digest['alerts'][int(plant_id)][2].append(key)
+    for plant_id in sorted({int(key.split(':')[0]) for key in resolved}):
+        plant_data = plant_data_list[positions[plant_id]]
+        digests.setdefault(plant_data.get('botanist_email'),
+                           {'alerts': {}, 'resolved': []})['resolved'].append(plant_data)
+
+    emails, notified_keys = [], []
+    for digest in digests.values():
+        alerts = list(digest['alerts'].values())
+        for plant_data, broken, _ in alerts:
+            logging.warning(f"Alert: Plant '{plant_data.get('plant_name')}' requires attention ({', '.join(broken)}).")
         try:
-            soil_moisture = float(plant_data['soil_moisture'])
-            temperature = float(plant_data['temperature'])
-
-            if soil_moisture > config['soil_moisture_threshold'] or temperature < config['temperature_threshold']:
-                logging.warning(f"Alert: Plant '{plant_data['plant_name']}' requires attention.")
-                send_email_alert(
-                    ses, 
-                    config['ses_sender_email'],  
-                    plant_data
-                )
-            else:
-                logging.info(f"Plant '{plant_data['plant_name']}' is healthy.")
+            emails.append(build_digest_email([(plant_data, broken) for plant_data, broken, _ in alerts],
+                                             digest['resolved']))
         except KeyError as e:
             logging.error(f"Missing expected data in plant entry: {e}")
-        except ValueError as e:
-            logging.error(f"Invalid data format in plant entry: {e}")
+            continue
+        notified_keys.append([key for _, _, keys in alerts for key in keys])
+
+    for sent, keys in zip(dispatcher.dispatch(emails), notified_keys):
+        if sent:
+            mark_notified(state, keys, now)
+    return violations
 
-def main_email_alerts() -> None:
+def main_email_alerts(plant_data_list: list[dict] = None) -> None:
     """Main function to monitor plant health and send alerts."""
     try:
         logging.basicConfig(
@@ -102,9 +180,16 @@ def main_email_alerts() -> None:
        
 
         config = get_config()
-        ses = get_ses_client(config['aws_region'])
-        plant_data_list = read_csv(config['csv_file_path'])
-        check_and_alert_unhealthy_plants(plant_data_list, ses, config)
+        ses = get_ses_client(config['aws_region']) if config['email_transport'] == 'ses' else None
+        dispatcher = AlertDispatcher(get_transport(config['email_transport'], ses),
+                                     config['ses_sender_email'])
+        if plant_data_list is None:
+            plant_data_list = read_csv(config['csv_file_path'])
+        rules = get_rules(config)
+        state = read_alert_state()
+        check_and_alert_unhealthy_plants(plant_data_list, dispatcher, config, rules,
+                                         get_previous_readings(rules), state)
+        write_alert_state(state)
 
     except Exception as e:
         logging.error(f"Error occurred in main: {e}")
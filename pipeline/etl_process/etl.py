@@ -1,11 +1,17 @@
 """Complete RTL pipeline"""
 import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 from extract import main_extract
-from transform import main_transform
+from transform import main_transform_records
 from load_sensor_data import main_load
 from email_sender import main_email_alerts
 from invariable_load import main as main_load_inv
+from watermarks import (WATERMARK_STORE, get_watermarks, filter_new_readings, advance_watermarks,
+                        save_watermarks)
+from metrics import start_run, get_run
+
+STAGE_WORKERS = 2
 
 def delete_if_existing_csv(file_path):
     """Deletes any csvs if they exist already."""
@@ -19,20 +25,99 @@ def delete_if_existing_csv(file_path):
         print(f"Error deleting file: {e}")
 
 
+def get_row_count(value):
+    """Returns how many rows a stage's input or output holds, if it holds rows."""
+    return len(value) if hasattr(value, "__len__") and not isinstance(value, str) else None
+
+
+def run_timed_stage(name: str, func, *args, rows_in: int = None):
+    """Runs one stage, recording its wall time and rows in and out in the run metrics.
+
+    Unless rows_in is given, the stage's rows in are those of its first argument."""
+    if rows_in is None and args:
+        rows_in = get_row_count(args[0])
+    with get_run().stage(name, rows_in) as stage:
+        result = func(*args)
+        stage["rows_out"] = get_row_count(result)
+    print(f"Stage '{name}' took {get_run().stages[name]['wall_seconds']:.2f}s.")
+    return result
+
+
+def run_stages(stages: dict, rows_in: dict = None, max_workers: int = STAGE_WORKERS) -> dict:
+    """Runs each stage as soon as the stages it depends on have finished.
+
+    stages maps a stage name to (function, dependencies); the function is
+    called with the results of its dependencies, in order. Independent stages
+    run in parallel. rows_in optionally gives the rows each stage reads.
+    Returns every stage's result."""
+    rows_in = {} if rows_in is None else rows_in
+    results, pending, running = {}, dict(stages), {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name, (func, dependencies) in list(pending.items()):
+                if all(dependency in results for dependency in dependencies):
+                    args = [results[dependency] for dependency in dependencies]
+                    running[executor.submit(run_timed_stage, name, func, *args,
+                                                     rows_in=rows_in.get(name))] = name
+                    del pending[name]
+            if not running:
+                raise ValueError(f"Stages with unmet dependencies: {list(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
+
+
 def run_etl_pipeline():
-    """Downloads, cleans and uploads data to the RDS database"""
+    """Downloads, cleans and uploads data to the RDS database.
+
+    One DataFrame is passed from transform to every load stage. The raw and
+    cleaned CSVs are only written when ETL_DEBUG_CSV is set. Only readings
+    newer than each plant's watermark are transformed and loaded.
+
+    Alerts only depend on the transformed data, so they are evaluated and
+    sent alongside the database loads rather than holding them up. Each
+    run's stage timings and metrics are appended to METRICS_FILE."""
     load_dotenv()
 
     raw_csv = './plants_data/plants_data.csv'
     cleaned_csv = './plants_data/plants_data_cleaned.csv'
+    debug_csv = os.getenv("ETL_DEBUG_CSV", "").lower() in ("1", "true", "yes")
+    metrics = start_run("etl")
+    try:
+        run_pipeline_stages(raw_csv, cleaned_csv, debug_csv)
+    finally:
+        record = metrics.write()
+        print("Stage timings: " + ", ".join(f"{name} {stage['wall_seconds']:.2f}s"
+                                            for name, stage in record["stages"].items()))
+
 
+def run_pipeline_stages(raw_csv: str, cleaned_csv: str, debug_csv: bool) -> None:
+    """Runs every stage of one pipeline run."""
     delete_if_existing_csv(raw_csv)
     delete_if_existing_csv(cleaned_csv)
-    main_extract()
-    main_transform(raw_csv, cleaned_csv)
-    main_load_inv()
-    main_email_alerts()
-    main_load(cleaned_csv)
+
+    plant_data = run_timed_stage("extract", main_extract, debug_csv)
+    watermarks = run_timed_stage("watermarks", get_watermarks)
+    plant_data = run_timed_stage("filter_new_readings", filter_new_readings, plant_data, watermarks)
+    if not plant_data:
+        print("No new readings since the last run.")
+        return
+
+    cleaned_data = run_timed_stage("transform", main_transform_records,
+                                   plant_data, cleaned_csv if debug_csv else None)
+
+    def save_loaded_watermarks(loaded_data):
+        # The database watermarks are advanced by the sensor insert itself.
+        if loaded_data is not None and WATERMARK_STORE == "file":
+            save_watermarks(advance_watermarks(watermarks, loaded_data))
+
+    run_stages({
+        "load_dimensions": (lambda: main_load_inv(cleaned_data), []),
+        "alerts": (lambda: main_email_alerts(cleaned_data.to_dict("records")), []),
+        "load_sensor_data": (lambda _: main_load(data=cleaned_data), ["load_dimensions"]),
+        "save_watermarks": (save_loaded_watermarks, ["load_sensor_data"]),
+    }, rows_in={name: len(cleaned_data) for name in ["load_dimensions", "alerts", "load_sensor_data"]})
 
 
 if __name__ == "__main__":
@@ -4,41 +4,174 @@ import requests
 import csv
 import json
 import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from connect_to_database import get_connection, get_chunks
+from metrics import get_run
+from retry_backoff import get_backoff_delay
 
-BASE_URL = "https://data-eng-plants-api.herokuapp.com/plants/"
+BASE_URL = os.getenv("PLANTS_API_URL", "https://data-eng-plants-api.herokuapp.com/plants/")
+MAX_WORKERS = 10
+REQUEST_TIMEOUT = 10
+MAX_RETRIES = 3
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRY_BUDGET = 25
+BREAKER_THRESHOLD = 10
+BREAKER_COOLDOWN = 15
+MISS_LIMIT = 10
+RESCAN_INTERVAL = timedelta(hours=1)
+KNOWN_PLANTS_STORE = os.getenv("KNOWN_PLANTS_STORE", "database")
+KNOWN_PLANTS_FILE = os.getenv("KNOWN_PLANTS_FILE", "./plants_data/known_plant_ids.json")
 
 
-def fetch_plant_data(plant_id: int) -> dict:
-    """Feetech data for a specific plant by ID from the API specified."""
+def get_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    """Creates a keep-alive session with a connection pool big enough for every worker."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class CircuitOpenError(Exception):
+    """Raised when the plants API is treated as down for the rest of the run."""
+
+
+class CircuitBreaker:
+    """Stops requests to the API after too many consecutive failures.
+
+    Once open, requests are rejected until the cooldown has passed, after which
+    a single trial request is let through to decide whether to close again."""
+
+    def __init__(self, failure_threshold: int = BREAKER_THRESHOLD,
+                 cooldown: float = BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """True while the breaker is rejecting requests."""
+        with self.lock:
+            return self.opened_at is not None
+
+    def allow_request(self) -> bool:
+        """Returns whether a request may be sent right now."""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_in_flight or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        """Closes the breaker and resets the failure count."""
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Counts a failure, opening the breaker once the threshold is reached."""
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class RetryBudget:
+    """Caps the total number of retries spent across one extraction run."""
+
+    def __init__(self, retries: int = RETRY_BUDGET):
+        self.remaining = retries
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        """Spends one retry, returning False once the budget is used up."""
+        with self.lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+def parse_plant_data(plant_data: dict) -> dict:
+    """Flattens the botanist and origin location fields of an API response."""
+    if "name" in plant_data:
+        plant_data["plant_name"] = plant_data.pop("name")
+
+    if "botanist" in plant_data and isinstance(plant_data["botanist"], dict):
+        botanist_data = plant_data.pop("botanist")
+        plant_data["botanist_email"] = botanist_data.get("email", "")
+        full_name = botanist_data.get("name", "").split()
+        plant_data["botanist_forename"] = full_name[0] if len(
+            full_name) > 0 else ""
+        plant_data["botanist_surname"] = full_name[1] if len(
+            full_name) > 1 else ""
+        plant_data["botanist_phone"] = botanist_data.get("phone", "")
+
+    if "origin_location" in plant_data:
+        origin_location = plant_data["origin_location"]
+        if isinstance(origin_location, list) and len(origin_location) >= 4:
+            plant_data["country_name"] = origin_location[3]
+        del plant_data["origin_location"]
+
+    return plant_data
+
+
+def fetch_plant_data(plant_id: int, session: requests.Session = None,
+                     timeout: float = REQUEST_TIMEOUT, breaker: CircuitBreaker = None,
+                     budget: RetryBudget = None, max_retries: int = 0,
+                     failed_ids: set = None) -> dict:
+    """Feetech data for a specific plant by ID from the API specified.
+
+    Timeouts, connection errors and retryable status codes are retried up to
+    max_retries times with jittered backoff, while the budget allows it.
+    Plants that could not be fetched, rather than not found, are added to failed_ids."""
     url = f"{BASE_URL}{plant_id}"
-    response = requests.get(url)
-    if response.status_code == 200:
-        plant_data = response.json()
-
-        if "name" in plant_data:
-            plant_data["plant_name"] = plant_data.pop("name")
-
-        if "botanist" in plant_data and isinstance(plant_data["botanist"], dict):
-            botanist_data = plant_data.pop("botanist")
-            plant_data["botanist_email"] = botanist_data.get("email", "")
-            full_name = botanist_data.get("name", "").split()
-            plant_data["botanist_forename"] = full_name[0] if len(
-                full_name) > 0 else ""
-            plant_data["botanist_surname"] = full_name[1] if len(
-                full_name) > 1 else ""
-            plant_data["botanist_phone"] = botanist_data.get("phone", "")
-
-        if "origin_location" in plant_data:
-            origin_location = plant_data["origin_location"]
-            if isinstance(origin_location, list) and len(origin_location) >= 4:
-                plant_data["country_name"] = origin_location[3]
-            del plant_data["origin_location"]
+    http = session if session is not None else requests
 
-        return plant_data
-    else:
-        print(
-            f"Failed to fetch: Plant ID {plant_id}. - (Status Code: {response.status_code})")
-        return None
+    for attempt in range(max_retries + 1):
+        if breaker is not None and not breaker.allow_request():
+            print(f"Skipped: Plant ID {plant_id}. - (Circuit open)")
+            if failed_ids is not None:
+                failed_ids.add(plant_id)
+            return None
+
+        start = time.perf_counter()
+        try:
+            response = http.get(url, timeout=timeout)
+            reason = f"Status Code: {response.status_code}"
+        except requests.RequestException as e:
+            response = None
+            reason = str(e)
+        get_run().observe_latency("plants_api", time.perf_counter() - start)
+
+        if response is not None and response.status_code not in RETRY_STATUS_CODES:
+            if breaker is not None:
+                breaker.record_success()
+            if response.status_code == 200:
+                return parse_plant_data(response.json())
+            break
+
+        if breaker is not None:
+            breaker.record_failure()
+        if attempt == max_retries or (budget is not None and not budget.take()):
+            if failed_ids is not None:
+                failed_ids.add(plant_id)
+            break
+        time.sleep(get_backoff_delay(attempt))
+
+    print(f"Failed to fetch: Plant ID {plant_id}. - ({reason})")
+    return None
 
 
 def get_all_keys(data: list) -> list:
@@ -48,19 +181,185 @@ def get_all_keys(data: list) -> list:
     return list(all_keys)
 
 
-def fetch_all_plants(start_id: int = 1, end_id: int = 50) -> list:
+def check_circuit(breaker: CircuitBreaker) -> None:
+    """Raises CircuitOpenError if the breaker is still open at the end of a fetch."""
+    if breaker.is_open:
+        raise CircuitOpenError(
+            f"Plants API unavailable: circuit opened after {breaker.failures} consecutive failures.")
+
+
+def fetch_plants_by_id(plant_ids: list, max_workers: int = MAX_WORKERS,
+                       timeout: float = REQUEST_TIMEOUT, max_retries: int = MAX_RETRIES,
+                       retry_budget: int = RETRY_BUDGET) -> list:
+    """Fetch data for the given plant IDs.
+
+    Requests are spread over a bounded thread pool sharing one keep-alive
+    session, and results are returned in plant ID order. Failed requests are
+    retried from a per-run budget, and a circuit breaker raises
+    CircuitOpenError if the API is still down once every plant has been tried."""
+    breaker = CircuitBreaker()
+    budget = RetryBudget(retry_budget)
+
+    with get_session(max_workers) as session, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda plant_id: fetch_plant_data(
+                plant_id, session, timeout, breaker, budget, max_retries),
+            plant_ids)
+        plant_data = [data for data in results if data]
+
+    check_circuit(breaker)
+    return plant_data
+
+
+def fetch_all_plants(start_id: int = 1, end_id: int = 50, max_workers: int = MAX_WORKERS,
+                     timeout: float = REQUEST_TIMEOUT, max_retries: int = MAX_RETRIES,
+                     retry_budget: int = RETRY_BUDGET) -> list:
     """Fetch data for all plants within the given ID range."""
+    print(f"Fetching: Plant IDs {start_id}-{end_id} with {max_workers} workers...")
+    return fetch_plants_by_id(range(start_id, end_id + 1), max_workers, timeout,
+                              max_retries, retry_budget)
+
+
+def discover_plants(start_id: int = 1, miss_limit: int = MISS_LIMIT,
+                    max_workers: int = MAX_WORKERS, timeout: float = REQUEST_TIMEOUT,
+                    max_retries: int = MAX_RETRIES, retry_budget: int = RETRY_BUDGET,
+                    failed_ids: set = None) -> list:
+    """Probe upwards from start_id until miss_limit consecutive IDs return no plant.
+
+    Only IDs the API reports missing count as misses. IDs that could not be
+    fetched are added to failed_ids instead, so a live plant that timed out is
+    not mistaken for a gap."""
+    print(f"Discovering: Plant IDs from {start_id} until {miss_limit} consecutive misses...")
+    breaker = CircuitBreaker()
+    budget = RetryBudget(retry_budget)
+    failed_ids = set() if failed_ids is None else failed_ids
+    batch_size = max(miss_limit, max_workers)
     plant_data = []
+    misses = 0
+    next_id = start_id
 
-    for plant_id in range(start_id, end_id + 1):
-        print(f"Fetching: Plant ID {plant_id}...")
-        data = fetch_plant_data(plant_id)
-        if data:
-            plant_data.append(data)
+    with get_session(max_workers) as session, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while misses < miss_limit and not breaker.is_open:
+            batch = range(next_id, next_id + batch_size)
+            results = executor.map(
+                lambda plant_id: fetch_plant_data(
+                    plant_id, session, timeout, breaker, budget, max_retries, failed_ids),
+                batch)
+            for plant_id, data in zip(batch, results):
+                if data:
+                    plant_data.append(data)
+                    misses = 0
+                elif plant_id not in failed_ids:
+                    misses += 1
+            next_id += batch_size
 
+    check_circuit(breaker)
     return plant_data
 
 
+def load_known_plant_ids(state_file: str = KNOWN_PLANTS_FILE) -> dict:
+    """Loads the cached set of live plant IDs, or None if there is no usable cache."""
+    try:
+        with open(state_file, "r") as f:
+            state = json.load(f)
+        return {
+            "plant_ids": [int(plant_id) for plant_id in state["plant_ids"]],
+            "last_scan": datetime.fromisoformat(state["last_scan"])
+        }
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_known_plant_ids(plant_ids: list, last_scan: datetime,
+                         state_file: str = KNOWN_PLANTS_FILE) -> None:
+    """Caches the set of live plant IDs and when they were last discovered."""
+    with open(state_file, "w") as f:
+        json.dump({"plant_ids": sorted(plant_ids),
+                   "last_scan": last_scan.isoformat()}, f)
+
+
+def fetch_known_plant_ids(conn) -> dict:
+    """Reads the live plant IDs from alpha.known_plant, or None if none are stored."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT plant_id, discovered_at FROM alpha.known_plant;")
+        rows = cursor.fetchall()
+    if not rows:
+        return None
+    return {"plant_ids": sorted(plant_id for plant_id, _ in rows),
+            "last_scan": max(discovered_at for _, discovered_at in rows)}
+
+
+def store_known_plant_ids(conn, plant_ids: list, last_scan: datetime) -> None:
+    """Replaces the live plant IDs in alpha.known_plant in one transaction."""
+    rows = [(int(plant_id), last_scan) for plant_id in sorted(plant_ids)]
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM alpha.known_plant;")
+        for chunk in get_chunks(rows, 2):
+            cursor.execute(
+                "INSERT INTO alpha.known_plant (plant_id, discovered_at) VALUES "
+                + ", ".join(["(%s, %s)"] * len(chunk)) + ";",
+                tuple(value for row in chunk for value in row)
+            )
+    conn.commit()
+
+
+def read_known_plant_ids(store: str = KNOWN_PLANTS_STORE,
+                         state_file: str = KNOWN_PLANTS_FILE) -> dict:
+    """Loads the live plant IDs from the configured store, or None if there are none to use."""
+    if store == "file":
+        return load_known_plant_ids(state_file)
+    conn = get_connection()
+    if conn is None:
+        raise ConnectionError("Unable to connect to the database to read the known plant IDs.")
+    try:
+        return fetch_known_plant_ids(conn)
+    finally:
+        conn.close()
+
+
+def write_known_plant_ids(plant_ids: list, last_scan: datetime, store: str = KNOWN_PLANTS_STORE,
+                          state_file: str = KNOWN_PLANTS_FILE) -> None:
+    """Saves the live plant IDs to the configured store."""
+    if store == "file":
+        save_known_plant_ids(plant_ids, last_scan, state_file)
+        return
+    conn = get_connection()
+    if conn is None:
+        raise ConnectionError("Unable to connect to the database to save the known plant IDs.")
+    try:
+        store_known_plant_ids(conn, plant_ids, last_scan)
+    finally:
+        conn.close()
+
+
+def fetch_known_plants(state_file: str = KNOWN_PLANTS_FILE,
+                       rescan_interval: timedelta = RESCAN_INTERVAL,
+                       miss_limit: int = MISS_LIMIT, max_workers: int = MAX_WORKERS,
+                       timeout: float = REQUEST_TIMEOUT, max_retries: int = MAX_RETRIES,
+                       retry_budget: int = RETRY_BUDGET, store: str = KNOWN_PLANTS_STORE) -> list:
+    """Fetch only the cached live plant IDs, re-discovering them when the cache is stale.
+
+    The IDs are kept in the database by default, since each ETL task starts
+    with an empty filesystem; store="file" keeps them in state_file instead.
+    Plants that could not be fetched during a re-discovery stay in the set."""
+    state = read_known_plant_ids(store, state_file)
+    now = datetime.now()
+
+    if state is None or not state["plant_ids"] or now - state["last_scan"] >= rescan_interval:
+        failed_ids = set()
+        plant_data = discover_plants(1, miss_limit, max_workers, timeout,
+                                     max_retries, retry_budget, failed_ids)
+        write_known_plant_ids({plant["plant_id"] for plant in plant_data if "plant_id" in plant}
+                              | failed_ids, now, store, state_file)
+        return plant_data
+
+    print(f"Fetching: {len(state['plant_ids'])} known Plant IDs with {max_workers} workers...")
+    return fetch_plants_by_id(state["plant_ids"], max_workers, timeout,
+                              max_retries, retry_budget)
+
+
 def export_to_csv(data: list, output_file: str = "./plants_data/plants_data.csv") -> None:
     """Export the plant data to a CSV file."""
     header_order = [
@@ -107,17 +406,50 @@ def get_arguments() -> argparse.Namespace:
         default="csv",
         help="Specify the export format (csv or json). Default is csv.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=MAX_WORKERS,
+        help=f"Number of concurrent API requests. Default is {MAX_WORKERS}.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=REQUEST_TIMEOUT,
+        help=f"Per-request timeout in seconds. Default is {REQUEST_TIMEOUT}.",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=MAX_RETRIES,
+        help=f"Retries per plant on timeouts and server errors. Default is {MAX_RETRIES}.",
+    )
+    parser.add_argument(
+        "--scan",
+        choices=["discover", "range"],
+        default="discover",
+        help="Fetch cached live plant IDs with periodic re-discovery, "
+             "or scan the fixed 1-50 ID range. Default is discover.",
+    )
 
     return parser.parse_args()
 
 
-def main_extract() -> None:
+def main_extract(export: bool = True) -> list:
     """Main function to fetch all plant data and export it based on user argument."""
     os.makedirs("plants_data", exist_ok=True)
 
     args = get_arguments()
 
-    plant_data = fetch_all_plants()
+    if args.scan == "discover":
+        plant_data = fetch_known_plants(max_workers=args.workers, timeout=args.timeout,
+                                        max_retries=args.retries)
+    else:
+        plant_data = fetch_all_plants(max_workers=args.workers, timeout=args.timeout,
+                                      max_retries=args.retries)
+
+    if not export:
+        return plant_data
 
     if args.format == "csv":
         output_file = "./plants_data/plants_data.csv"
@@ -128,6 +460,8 @@ def main_extract() -> None:
         print("Exporting to .json:")
         export_to_json(plant_data, output_file)
 
+    return plant_data
+
 
 if __name__ == "__main__":
     main_extract()
@@ -0,0 +1,185 @@
+"""
+health_rules.py evaluates plant health rules over a whole batch of readings at once.
+Rules are plain dicts, loaded from a JSON file or built from the default thresholds,
+and can be scoped to every plant, one species (scientific_name) or one plant (plant_id).
+A species rule overrides a global rule with the same name, and a plant rule
+overrides both.
+
+Rule types:
+- range: 'column' must lie within 'min' and/or 'max'.
+- rate: 'column' must not change by more than 'max_change' since the previous reading.
+- watering: 'last_watered' must be no more than 'max_hours' before 'recording_taken'.
+"""
+import json
+import logging
+import pandas as pd
+import pymssql
+from transform import parse_datetimes
+
+RULE_PARAMETERS = ['min', 'max', 'max_change', 'max_hours']
+
+VIOLATION_COLUMNS = ['plant_id', 'rule', 'column', 'value', 'limit']
+
+PREVIOUS_READINGS_QUERY = """
+SELECT plant_id, recording_taken, soil_moisture, temperature
+FROM (
+    SELECT plant_id, recording_taken, soil_moisture, temperature,
+           ROW_NUMBER() OVER (PARTITION BY plant_id ORDER BY recording_taken DESC) AS recency
+    FROM alpha.sensor_data
+) latest
+WHERE recency <= 2
+"""
+
+
+def get_default_rules(config: dict) -> list[dict]:
+    """Builds the rules matching the configured soil moisture and temperature thresholds."""
+    return [
+        {'rule': 'soil_moisture', 'type': 'range', 'column': 'soil_moisture',
+         'max': config['soil_moisture_threshold']},
+        {'rule': 'temperature', 'type': 'range', 'column': 'temperature',
+         'min': config['temperature_threshold']},
+    ]
+
+
+def load_rules(rules_file: str) -> list[dict]:
+    """Loads a list of health rules from a JSON file."""
+    with open(rules_file, 'r') as f:
+        rules = json.load(f)
+    logging.info(f"Loaded {len(rules)} health rules from {rules_file}")
+    return rules
+
+
+def prepare_readings(readings: pd.DataFrame) -> pd.DataFrame:
+    """Converts the columns rules look at into numbers and timestamps."""
+    readings = readings.copy()
+    for column in ['plant_id', 'soil_moisture', 'temperature']:
+        if column in readings.columns:
+            readings[column] = pd.to_numeric(readings[column], errors='coerce')
+    for column in ['recording_taken', 'last_watered']:
+        if column in readings.columns:
+            readings[column] = parse_datetimes(readings[column])
+    return readings
+
+
+def get_scope_mask(readings: pd.DataFrame, rule: dict) -> pd.Series:
+    """Returns which readings a rule applies to."""
+    if 'plant_id' in rule:
+        return readings['plant_id'] == rule['plant_id']
+    if 'scientific_name' in rule:
+        return readings['scientific_name'] == rule['scientific_name']
+    return pd.Series(True, index=readings.index)
+
+
+def get_scope_rank(rule: dict) -> int:
+    """Orders rules so that more specific scopes are applied last."""
+    if 'plant_id' in rule:
+        return 2
+    if 'scientific_name' in rule:
+        return 1
+    return 0
+
+
+def resolve_parameters(readings: pd.DataFrame, rules: list[dict]) -> pd.DataFrame:
+    """Resolves each reading's parameters for one rule name, most specific scope winning."""
+    parameters = pd.DataFrame(float('nan'), index=readings.index, columns=RULE_PARAMETERS)
+    for rule in sorted(rules, key=get_scope_rank):
+        mask = get_scope_mask(readings, rule)
+        for parameter in RULE_PARAMETERS:
+            if parameter in rule:
+                parameters.loc[mask, parameter] = rule[parameter]
+    return parameters
+
+
+def get_violations(readings: pd.DataFrame, name: str, column: str,
+                   values: pd.Series, limits: pd.Series, violated: pd.Series) -> pd.DataFrame:
+    """Builds the violation rows for the readings that broke a rule."""
+    violated = violated.fillna(False).astype(bool)
+    return pd.DataFrame({
+        'plant_id': readings.loc[violated, 'plant_id'],
+        'rule': name,
+        'column': column,
+        'value': values[violated],
+        'limit': limits[violated],
+    })
+
+
+def get_previous_values(readings: pd.DataFrame, previous: pd.DataFrame, column: str) -> pd.Series:
+    """Returns each reading's value from the latest earlier reading of the same plant.
+
+    Stored readings at or after a reading's own time are ignored, so the result
+    is the same whether or not this batch has already been loaded."""
+    if 'recording_taken' not in previous.columns or 'recording_taken' not in readings.columns:
+        return readings['plant_id'].map(previous.set_index('plant_id')[column])
+    previous = previous.assign(recording_taken=parse_datetimes(previous['recording_taken']))
+    candidates = (readings[['plant_id', 'recording_taken']].reset_index()
+                  .merge(previous[['plant_id', 'recording_taken', column]], on='plant_id',
+                         suffixes=('', '_previous')))
+    candidates = candidates[candidates['recording_taken_previous'] < candidates['recording_taken']]
+    last_values = (candidates.sort_values('recording_taken_previous')
+                   .groupby('index')[column].last())
+    return last_values.reindex(readings.index)
+
+
+def evaluate_rule(readings: pd.DataFrame, name: str, rule_type: str, column: str,
+                  parameters: pd.DataFrame, previous: pd.DataFrame = None) -> list[pd.DataFrame]:
+    """Evaluates one rule over every reading in a single vectorised pass."""
+    if rule_type == 'range':
+        values = readings[column]
+        return [
+            get_violations(readings, name, column, values, parameters['min'],
+                           values < parameters['min']),
+            get_violations(readings, name, column, values, parameters['max'],
+                           values > parameters['max']),
+        ]
+
+    if rule_type == 'rate':
+        if previous is None or previous.empty:
+            return []
+        last_values = get_previous_values(readings, previous, column)
+        change = (readings[column] - last_values).abs()
+        return [get_violations(readings, name, column, change, parameters['max_change'],
+                               change > parameters['max_change'])]
+
+    if rule_type == 'watering':
+        hours = (readings['recording_taken'] - readings['last_watered']).dt.total_seconds() / 3600
+        return [get_violations(readings, name, 'last_watered', hours, parameters['max_hours'],
+                               hours > parameters['max_hours'])]
+
+    logging.error(f"Unknown rule type '{rule_type}' for rule '{name}'")
+    return []
+
+
+def evaluate_health_rules(readings: pd.DataFrame, rules: list[dict],
+                          previous: pd.DataFrame = None) -> pd.DataFrame:
+    """Evaluates every rule over the readings, returning one row per violation.
+
+    The violations keep the index of the reading that broke the rule."""
+    readings = prepare_readings(readings)
+    rules_by_name = {}
+    for rule in rules:
+        rules_by_name.setdefault(rule['rule'], []).append(rule)
+
+    violations = []
+    for name, named_rules in rules_by_name.items():
+        rule_type = named_rules[0]['type']
+        column = named_rules[0].get('column')
+        required = [column] if rule_type != 'watering' else ['recording_taken', 'last_watered']
+        missing = [field for field in required + ['plant_id'] if field not in readings.columns]
+        if missing:
+            logging.error(f"Missing expected data for rule '{name}': {missing}")
+            continue
+        parameters = resolve_parameters(readings, named_rules)
+        violations.extend(evaluate_rule(readings, name, rule_type, column, parameters, previous))
+
+    violations = [violation for violation in violations if not violation.empty]
+    if not violations:
+        return pd.DataFrame(columns=VIOLATION_COLUMNS)
+    return pd.concat(violations).sort_index(kind='stable')
+
+
+def fetch_previous_readings(conn: pymssql.Connection) -> pd.DataFrame:
+    """Fetches the two latest stored readings for each plant, for rate of change rules."""
+    with conn.cursor() as cursor:
+        cursor.execute(PREVIOUS_READINGS_QUERY)
+        return pd.DataFrame(cursor.fetchall(),
+                            columns=['plant_id', 'recording_taken', 'soil_moisture', 'temperature'])
@@ -1,126 +1,155 @@
-"""Inserts into invariable tables from csv."""
+"""Inserts into invariable tables from csv.
+
+Keys already in the dimension cache are skipped. The rest of each table is
+loaded with a fixed number of round trips: one set-based INSERT ... WHERE NOT
+EXISTS for the new rows, followed by one SELECT reading back their surrogate keys."""
 
 import pandas as pd
 import pymssql
-from connect_to_database import get_connection
+from connect_to_database import get_connection, get_chunks
+from dimension_cache import get_dimension_cache, write_dimension_cache, invalidate_dimension_cache
+from metrics import get_run
 
-def load_plant_species(cursor: pymssql.Cursor, data: pd.DataFrame) -> None:
-    """Loads plant species data into the alpha.plant_species table if not already present."""
-    plant_species = data[['scientific_name', 'plant_name']].drop_duplicates()
-    for _, row in plant_species.iterrows():
+def insert_missing_rows(cursor: pymssql.Cursor, table: str, columns: list[str],
+                        key_column: str, rows: list[tuple]) -> int:
+    """Inserts the rows whose key is not already in the table, returning how many were added."""
+    inserted = 0
+    column_list = ", ".join(columns)
+    row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    for chunk in get_chunks(rows, len(columns)):
         cursor.execute(
-            """
-            SELECT scientific_name_id FROM alpha.plant_species
-            WHERE scientific_name = %s
-            """,
-            (row['scientific_name'],)
-        )
-        if not cursor.fetchone():
-            cursor.execute(
-                """
-                INSERT INTO alpha.plant_species (scientific_name, plant_name)
-                VALUES (%s, %s)
-                """,
-                (row['scientific_name'], row['plant_name'])
+            f"""
+            INSERT INTO {table} ({column_list})
+            SELECT {column_list}
+            FROM (VALUES {", ".join([row_placeholder] * len(chunk))}) AS src ({column_list})
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {table} t WHERE t.{key_column} = src.{key_column}
             )
-            print(f"Inserted plant species: {row['scientific_name']}")
-
-def load_countries(cursor: pymssql.Cursor, data: pd.DataFrame) -> None:
-    """Loads country data into the alpha.country table if not already present."""
-    countries = data[['country_name']].drop_duplicates()
-    for _, row in countries.iterrows():
-        cursor.execute(
-            """
-            SELECT country_id FROM alpha.country
-            WHERE country_name = %s
             """,
-            (row['country_name'],)
+            tuple(value for row in chunk for value in row)
         )
-        if not cursor.fetchone():
-            cursor.execute(
-                """
-                INSERT INTO alpha.country (country_name)
-                VALUES (%s)
-                """,
-                (row['country_name'],)
-            )
-            print(f"Inserted country: {row['country_name']}")
+        inserted += cursor.rowcount
+    return inserted
 
-def load_botanists(cursor: pymssql.Cursor, data: pd.DataFrame) -> None:
-    """Loads botanist data into the alpha.botanist table if not already present."""
-    botanists = data[['botanist_email', 'botanist_forename', 'botanist_surname', 'botanist_phone']].drop_duplicates()
-    for _, row in botanists.iterrows():
+def fetch_surrogate_keys(cursor: pymssql.Cursor, table: str, key_column: str,
+                         id_column: str, keys: list) -> dict:
+    """Returns a mapping of natural key to surrogate ID for the given keys."""
+    key_ids = {}
+    for chunk in get_chunks(keys, 1):
         cursor.execute(
-            """
-            SELECT botanist_id FROM alpha.botanist
-            WHERE botanist_email = %s
+            f"""
+            SELECT {key_column}, {id_column} FROM {table}
+            WHERE {key_column} IN ({", ".join(["%s"] * len(chunk))})
             """,
-            (row['botanist_email'],)
+            tuple(chunk)
         )
-        if not cursor.fetchone():
-            cursor.execute(
-                """
-                INSERT INTO alpha.botanist (botanist_email, botanist_forename, botanist_surname, botanist_phone)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (row['botanist_email'], row['botanist_forename'], row['botanist_surname'], row['botanist_phone'])
-            )
-            print(f"Inserted botanist: {row['botanist_email']}")
+        key_ids.update({key: key_id for key, key_id in cursor.fetchall()})
+    return key_ids
 
-def load_plants(cursor: pymssql.Cursor, data: pd.DataFrame) -> None:
-    """Loads plant data into the alpha.plant table if not already present."""
-    plants = data[['plant_id', 'scientific_name', 'country_name', 'botanist_email']].drop_duplicates()
-    for _, row in plants.iterrows():
-        cursor.execute(
-            """
-            SELECT plant_id FROM alpha.plant
-            WHERE plant_id = %s
-            """,
-            (row['plant_id'],)
-        )
-        if not cursor.fetchone():
-            cursor.execute(
-                """
-                SELECT ps.scientific_name_id, c.country_id, b.botanist_id
-                FROM alpha.plant_species ps, alpha.country c, alpha.botanist b
-                WHERE ps.scientific_name = %s AND c.country_name = %s AND b.botanist_email = %s
-                """,
-                (row['scientific_name'], row['country_name'], row['botanist_email'])
-            )
-            result = cursor.fetchone()
-            if result:
-                scientific_name_id, country_id, botanist_id = result
-                cursor.execute(
-                    """
-                    INSERT INTO alpha.plant (plant_id, scientific_name_id, country_id, botanist_id)
-                    VALUES (%s, %s, %s, %s)
-                    """,
-                    (row['plant_id'], scientific_name_id, country_id, botanist_id)
-                )
-                print(f"Inserted plant: {row['plant_id']}, {scientific_name_id}, {country_id}, {botanist_id}")
-            else:
-                print(f"Plant not inserted: No match for {row['scientific_name']}, {row['country_name']}, {row['botanist_email']}")
-
-def main() -> None:
+def load_dimension(cursor: pymssql.Cursor, rows: pd.DataFrame, table: str, key_column: str,
+                   id_column: str, known_ids: dict = None) -> dict:
+    """Inserts and looks up only the rows whose key is not in known_ids.
+
+    Returns known_ids updated with the surrogate IDs of the new keys."""
+    known_ids = {} if known_ids is None else known_ids
+    missing = rows[~rows[key_column].isin(known_ids.keys())]
+    if missing.empty:
+        return known_ids
+
+    inserted = insert_missing_rows(
+        cursor, table, list(missing.columns), key_column, missing.values.tolist())
+    print(f"Inserted {inserted} rows into {table}.")
+    get_run().count("dimension_rows_inserted", inserted)
+    known_ids.update(fetch_surrogate_keys(
+        cursor, table, key_column, id_column, missing[key_column].tolist()))
+    return known_ids
+
+def load_plant_species(cursor: pymssql.Cursor, data: pd.DataFrame, known_ids: dict = None) -> dict:
+    """Loads plant species data into the alpha.plant_species table if not already present.
+
+    Returns a mapping of scientific name to scientific_name_id."""
+    plant_species = data[['scientific_name', 'plant_name']].drop_duplicates(
+        subset='scientific_name')
+    return load_dimension(cursor, plant_species, 'alpha.plant_species',
+                          'scientific_name', 'scientific_name_id', known_ids)
+
+def load_countries(cursor: pymssql.Cursor, data: pd.DataFrame, known_ids: dict = None) -> dict:
+    """Loads country data into the alpha.country table if not already present.
+
+    Returns a mapping of country name to country_id."""
+    countries = data[['country_name']].drop_duplicates()
+    return load_dimension(cursor, countries, 'alpha.country',
+                          'country_name', 'country_id', known_ids)
+
+def load_botanists(cursor: pymssql.Cursor, data: pd.DataFrame, known_ids: dict = None) -> dict:
+    """Loads botanist data into the alpha.botanist table if not already present.
+
+    Returns a mapping of botanist email to botanist_id."""
+    botanist_columns = ['botanist_email', 'botanist_forename', 'botanist_surname', 'botanist_phone']
+    botanists = data[botanist_columns].drop_duplicates(subset='botanist_email')
+    return load_dimension(cursor, botanists, 'alpha.botanist',
+                          'botanist_email', 'botanist_id', known_ids)
+
+def load_plants(cursor: pymssql.Cursor, data: pd.DataFrame, species_ids: dict,
+                country_ids: dict, botanist_ids: dict, known_ids: dict = None) -> dict:
+    """Loads plant data into the alpha.plant table if not already present.
+
+    Returns known_ids updated with every plant ID now in the table."""
+    known_ids = {} if known_ids is None else known_ids
+    plants = data[['plant_id', 'scientific_name', 'country_name', 'botanist_email']].drop_duplicates(
+        subset='plant_id')
+    plants = plants[~plants['plant_id'].isin(known_ids.keys())]
+    if plants.empty:
+        return known_ids
+
+    plants = plants.assign(
+        scientific_name_id=plants['scientific_name'].map(species_ids),
+        country_id=plants['country_name'].map(country_ids),
+        botanist_id=plants['botanist_email'].map(botanist_ids)
+    )
+
+    unmatched = plants[plants[['scientific_name_id', 'country_id', 'botanist_id']].isna().any(axis=1)]
+    for row in unmatched.itertuples(index=False):
+        print(f"Plant not inserted: No match for {row.scientific_name}, {row.country_name}, {row.botanist_email}")
+
+    plants = plants.drop(unmatched.index)
+    rows = [
+        (int(row.plant_id), int(row.scientific_name_id), int(row.country_id), int(row.botanist_id))
+        for row in plants.itertuples(index=False)
+    ]
+    inserted = insert_missing_rows(
+        cursor, 'alpha.plant', ['plant_id', 'scientific_name_id', 'country_id', 'botanist_id'],
+        'plant_id', rows)
+    print(f"Inserted {inserted} plants.")
+    get_run().count("dimension_rows_inserted", inserted)
+    known_ids.update({row[0]: row[0] for row in rows})
+    return known_ids
+
+def main(data: pd.DataFrame = None) -> None:
     """Main function to load data into the database."""
-    file_path = "./plants_data/plants_data_cleaned.csv"
-    data = pd.read_csv(file_path)
+    if data is None:
+        file_path = "./plants_data/plants_data_cleaned.csv"
+        data = pd.read_csv(file_path)
 
     conn = get_connection()
     cursor = conn.cursor()
 
     try:
-        load_plant_species(cursor, data)
-        load_countries(cursor, data)
-        load_botanists(cursor, data)
-        load_plants(cursor, data)
+        cache = get_dimension_cache(cursor)
+        load_plant_species(cursor, data, cache['plant_species'])
+        load_countries(cursor, data, cache['country'])
+        load_botanists(cursor, data, cache['botanist'])
+        load_plants(cursor, data, cache['plant_species'], cache['country'],
+                    cache['botanist'], cache['plant'])
+        write_dimension_cache(cursor, cache)
         conn.commit()
     except Exception as e:
         print(f"Error occurred: {e}")
         conn.rollback()
+        invalidate_dimension_cache()
     finally:
         cursor.close()
         conn.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -3,31 +3,57 @@ import os
 import pandas as pd
 import pymssql
 import logging
+from datetime import datetime
 from typing import Optional, Set
 from pandas import DataFrame
-from connect_to_database import get_connection
+from connect_to_database import get_connection, get_chunks
+from dimension_cache import DIMENSION_CACHE_STORE, load_dimension_cache
+from metrics import get_run
+from rollups import get_rollup_merge
+from watermarks import get_watermark_merge
+
+SENSOR_DATA_COLUMNS = ["plant_id", "recording_taken", "last_watered", "soil_moisture", "temperature"]
+STAGING_COLUMN_IDS = [1, 2, 3, 4, 5]
+SENSOR_DATA_KEY = ["plant_id", "recording_taken"]
+INSERT_BATCH_SIZE = int(os.getenv("SENSOR_INSERT_BATCH_SIZE", "400"))
+INSERT_METHOD = os.getenv("SENSOR_INSERT_METHOD", "values")
+
+
+def prepare_sensor_data(df: DataFrame) -> DataFrame:
+    """Clean the sensor data timestamps, leaving the given DataFrame untouched."""
+    df = df.assign(
+        recording_taken=pd.to_datetime(df["recording_taken"], errors="coerce"),
+        last_watered=pd.to_datetime(df["last_watered"], errors="coerce")
+    )
+    df = df.dropna(subset=["recording_taken", "last_watered"])
+    return df.assign(
+        recording_taken=df["recording_taken"].dt.tz_localize(None),
+        last_watered=df["last_watered"].dt.tz_localize(None)
+    )
 
 
 def clean_and_prepare_sensor_data(csv_file: str) -> DataFrame:
     """Load and clean the sensor data from a CSV file."""
     logging.info("Starting to clean and prepare sensor data.")
     try:
-        df = pd.read_csv(csv_file)
-        df["recording_taken"] = pd.to_datetime(
-            df["recording_taken"], errors="coerce")
-        df["last_watered"] = pd.to_datetime(df["last_watered"], errors="coerce")
-        df = df.dropna(subset=["recording_taken", "last_watered"])
-        df["recording_taken"] = df["recording_taken"].dt.tz_localize(None)
-        df["last_watered"] = df["last_watered"].dt.tz_localize(None)
-        logging.info("Successfully loaded and cleaned data from {csv_file}.")
+        df = prepare_sensor_data(pd.read_csv(csv_file))
+        logging.info(f"Successfully loaded and cleaned data from {csv_file}.")
         return df
     except Exception as e:
         logging.error(f"Error cleaning and preparing sensor data: {e}")
         raise
 
 
-def fetch_valid_plant_ids(conn: pymssql.Connection) -> Set[int]:
-    """Fetch valid plant IDs from the alpha.plant table."""
+def fetch_valid_plant_ids(conn: pymssql.Connection, plant_ids: Optional[Set[int]] = None) -> Set[int]:
+    """Fetch valid plant IDs from the alpha.plant table.
+
+    A local dimension cache snapshot is used instead when it already holds every ID in
+    plant_ids. Reading the database snapshot would cost as much as this query, so it is not."""
+    cache = load_dimension_cache() if DIMENSION_CACHE_STORE == "file" else None
+    if cache is not None and plant_ids is not None and set(plant_ids) <= cache["plant"].keys():
+        logging.info(f"Using {len(cache['plant'])} valid plant IDs from the dimension cache.")
+        return set(cache["plant"])
+
     logging.info("Fetching valid plant IDs from the database.")
     try:
         with conn.cursor() as cursor:
@@ -53,41 +79,116 @@ def filter_valid_sensor_data(df: DataFrame, valid_plant_ids: Set[int]) -> DataFr
         raise
 
 
-def insert_sensor_data(conn: pymssql.Connection, sensor_data_df: DataFrame) -> None:
-    """Insert the sensor data into the alpha.sensor_data table."""
+def fetch_loaded_keys(conn: pymssql.Connection, since: datetime) -> Set[tuple]:
+    """Fetch the (plant_id, recording_taken) keys already stored since the given time."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT plant_id, recording_taken FROM alpha.sensor_data WHERE recording_taken >= %s;",
+            (since,)
+        )
+        return {(plant_id, pd.Timestamp(recording_taken))
+                for plant_id, recording_taken in cur.fetchall()}
+
+
+def drop_loaded_readings(df: DataFrame, loaded_keys: Set[tuple]) -> DataFrame:
+    """Drop repeated readings in the batch and readings whose key is already stored."""
+    df = df.drop_duplicates(subset=SENSOR_DATA_KEY)
+    already_loaded = pd.MultiIndex.from_frame(df[SENSOR_DATA_KEY]).isin(list(loaded_keys))
+    logging.info(f"Skipping {already_loaded.sum()} readings that are already loaded.")
+    return df[~already_loaded]
+
+
+def get_sensor_rows(sensor_data_df: DataFrame) -> list[tuple]:
+    """Returns the sensor readings as tuples in SENSOR_DATA_COLUMNS order."""
+    return list(sensor_data_df[SENSOR_DATA_COLUMNS].itertuples(index=False, name=None))
+
+
+def get_insert_and_rollup(source: str) -> str:
+    """Returns a batch that inserts readings from source and rolls up the ones stored.
+
+    Readings skipped by the unique index are not in the OUTPUT, so only the
+    rows actually inserted reach the rollups and the plant watermarks. The
+    batch ends by selecting how many rows were inserted."""
+    column_list = ", ".join(SENSOR_DATA_COLUMNS)
+    return f"""
+        DECLARE @inserted TABLE (plant_id INT, recording_taken DATETIME,
+                                 soil_moisture FLOAT, temperature FLOAT);
+        INSERT INTO alpha.sensor_data ({column_list})
+        OUTPUT inserted.plant_id, inserted.recording_taken,
+               inserted.soil_moisture, inserted.temperature INTO @inserted
+        {source};
+        {get_rollup_merge("@inserted")}
+        {get_watermark_merge("@inserted")}
+        SELECT COUNT(*) FROM @inserted;
+        """
+
+
+def insert_sensor_rows_values(conn: pymssql.Connection, rows: list[tuple], batch_size: int) -> int:
+    """Insert rows and their rollups with one multi-row VALUES batch and one commit per chunk."""
+    inserted = 0
+    row_placeholder = "(" + ", ".join(["%s"] * len(SENSOR_DATA_COLUMNS)) + ")"
+    with conn.cursor() as cur:
+        for chunk in get_chunks(rows, len(SENSOR_DATA_COLUMNS), batch_size):
+            cur.execute(
+                get_insert_and_rollup(f"VALUES {', '.join([row_placeholder] * len(chunk))}"),
+                tuple(value for row in chunk for value in row)
+            )
+            inserted += cur.fetchone()[0]
+            conn.commit()
+            logging.info(f"Committed {inserted}/{len(rows)} records into sensor_data.")
+    return inserted
+
+
+def insert_sensor_rows_bulk_copy(conn: pymssql.Connection, rows: list[tuple], batch_size: int) -> int:
+    """Bulk copy each batch_size chunk into a staging table, then insert and roll it up in one commit."""
+    inserted = 0
+    column_list = ", ".join(SENSOR_DATA_COLUMNS)
+    with conn.cursor() as cur:
+        cur.execute("""
+            IF OBJECT_ID('tempdb..#sensor_data_batch') IS NULL
+            CREATE TABLE #sensor_data_batch (plant_id INT, recording_taken DATETIME,
+                last_watered DATETIME, soil_moisture FLOAT, temperature FLOAT);
+            TRUNCATE TABLE #sensor_data_batch;
+            """)
+        for chunk in get_chunks(rows, len(SENSOR_DATA_COLUMNS), batch_size):
+            conn.bulk_copy("#sensor_data_batch", chunk, column_ids=STAGING_COLUMN_IDS)
+            cur.execute(get_insert_and_rollup(f"SELECT {column_list} FROM #sensor_data_batch")
+                        + "TRUNCATE TABLE #sensor_data_batch;")
+            inserted += cur.fetchone()[0]
+            conn.commit()
+            logging.info(f"Bulk copied {inserted}/{len(rows)} records into sensor_data.")
+    return inserted
+
+
+def insert_sensor_data(conn: pymssql.Connection, sensor_data_df: DataFrame,
+                       batch_size: int = INSERT_BATCH_SIZE, method: str = INSERT_METHOD) -> None:
+    """Insert the sensor data into the alpha.sensor_data table.
+
+    Rows are sent in chunks of batch_size, either as multi-row VALUES
+    statements or, when method is bulk_copy and the driver supports it,
+    through bulk copy into a staging table. Each chunk is committed on its
+    own together with its rollups, so a failure only rolls back the chunk in
+    flight and the rollups always match the stored readings."""
     logging.info("Inserting sensor data into the database.")
+    rows = get_sensor_rows(sensor_data_df)
     try:
-        with conn.cursor() as cur:
-            query = '''
-            INSERT INTO alpha.sensor_data (
-                plant_id,
-                recording_taken,
-                soil_moisture,
-                temperature,
-                last_watered
-            ) VALUES (%s, %s, %s, %s, %s);
-            '''
-            data = [
-                (
-                    row.plant_id,
-                    row.recording_taken,
-                    row.soil_moisture,
-                    row.temperature,
-                    row.last_watered
-                )
-                for row in sensor_data_df.itertuples(index=False)
-            ]
-            cur.executemany(query, data)
-            conn.commit()
-            logging.info(f"Inserted {len(data)} records into sensor_data.")
+        if method == "bulk_copy" and getattr(conn, "supports_bulk_copy", hasattr(conn, "bulk_copy")):
+            inserted = insert_sensor_rows_bulk_copy(conn, rows, batch_size)
+        else:
+            inserted = insert_sensor_rows_values(conn, rows, batch_size)
+        logging.info(f"Inserted {inserted} records into sensor_data.")
+        get_run().count("sensor_rows_inserted", inserted)
     except Exception as e:
         logging.error(f"Error inserting data into sensor_data: {e}")
         conn.rollback()
         raise
 
 
-def main_load(csv_file: str) -> None:
-    """Main function to load, clean, validate, and insert sensor data into the database."""
+def main_load(csv_file: str = None, data: DataFrame = None) -> Optional[DataFrame]:
+    """Main function to load, clean, validate, and insert sensor data into the database.
+
+    Sensor data is read from csv_file unless an already cleaned DataFrame is given.
+    Returns the valid readings that are now stored, or None if loading failed."""
     logging.basicConfig(
         filename="sensor_data_processing.log",
         level=logging.INFO,
@@ -97,16 +198,27 @@ def main_load(csv_file: str) -> None:
     conn = get_connection()
     if conn is None:
         logging.error("Database connection could not be established.")
-        return
+        return None
     try:
-        sensor_data_df = clean_and_prepare_sensor_data(csv_file)
-        valid_plant_ids = fetch_valid_plant_ids(conn)
-        sensor_data_df = filter_valid_sensor_data(
+        if data is None:
+            sensor_data_df = clean_and_prepare_sensor_data(csv_file)
+        else:
+            sensor_data_df = prepare_sensor_data(data)
+        valid_plant_ids = fetch_valid_plant_ids(
+            conn, set(sensor_data_df["plant_id"]))
+        valid_data_df = filter_valid_sensor_data(
             sensor_data_df, valid_plant_ids)
+        sensor_data_df = valid_data_df
+        if not sensor_data_df.empty:
+            loaded_keys = fetch_loaded_keys(
+                conn, sensor_data_df["recording_taken"].min())
+            sensor_data_df = drop_loaded_readings(sensor_data_df, loaded_keys)
         insert_sensor_data(conn, sensor_data_df)
         logging.info("Sensor data processing completed successfully.")
+        return valid_data_df
     except Exception as e:
         logging.error(f"An error occurred during processing: {e}")
+        return None
     finally:
         conn.close()
         logging.info("Database connection closed.")
@@ -0,0 +1,137 @@
+"""Collects timing and volume metrics for a run of the ETL or the S3 transfer.
+
+Each run records, per stage, the wall time, rows in and out and the process's
+peak memory so far, along with run-wide counters (such as database round
+trips) and latency histograms (such as plants API requests). At the end of a
+run the whole lot is appended to METRICS_FILE as one JSON line, so runs can be
+compared over time. METRICS_FILE is read when the run is written, not at import."""
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_METRICS_FILE = "./logs/metrics.jsonl"
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+
+def get_peak_memory_mb() -> float:
+    """Returns the peak resident memory of this process so far, in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class LatencyHistogram:
+    """Counts latencies into fixed buckets, keeping the total and maximum."""
+
+    def __init__(self, buckets: list[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Adds one latency to its bucket."""
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_record(self) -> dict:
+        """Returns the histogram as a JSON-ready dict."""
+        count = sum(self.counts)
+        return {
+            "buckets": self.buckets + ["inf"],
+            "counts": self.counts,
+            "count": count,
+            "mean_seconds": round(self.total / count, 4) if count else None,
+            "max_seconds": round(self.max, 4),
+        }
+
+
+class RunMetrics:
+    """The metrics of one run. Safe to update from several threads."""
+
+    def __init__(self, job: str):
+        self.job = job
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.latencies = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int = None):
+        """Times a stage. Set 'rows_out' on the yielded dict to record the rows produced.
+
+        A stage run more than once, e.g. once per batch, adds up its times and rows."""
+        record = {"rows_in": rows_in, "rows_out": None}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            wall_seconds = time.perf_counter() - start
+            with self.lock:
+                total = self.stages.setdefault(name, {"calls": 0, "wall_seconds": 0.0,
+                                                      "rows_in": None, "rows_out": None})
+                total["calls"] += 1
+                total["wall_seconds"] = round(total["wall_seconds"] + wall_seconds, 4)
+                for rows in ["rows_in", "rows_out"]:
+                    if record[rows] is not None:
+                        total[rows] = (total[rows] or 0) + record[rows]
+                total["peak_memory_mb"] = round(get_peak_memory_mb(), 1)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Adds to a run-wide counter."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe_latency(self, name: str, seconds: float) -> None:
+        """Adds a latency to the named histogram."""
+        with self.lock:
+            self.latencies.setdefault(name, LatencyHistogram()).observe(seconds)
+
+    def to_record(self) -> dict:
+        """Returns the run as a JSON-ready dict."""
+        with self.lock:
+            return {
+                "job": self.job,
+                "started_at": self.started_at.isoformat(),
+                "wall_seconds": round(time.perf_counter() - self.start, 4),
+                "peak_memory_mb": round(get_peak_memory_mb(), 1),
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "counters": dict(self.counters),
+                "latencies": {name: histogram.to_record()
+                              for name, histogram in self.latencies.items()},
+            }
+
+    def write(self, metrics_file: str = None) -> dict:
+        """Appends the run as one JSON line to the metrics file, METRICS_FILE by default."""
+        if metrics_file is None:
+            metrics_file = os.getenv("METRICS_FILE", DEFAULT_METRICS_FILE)
+        record = self.to_record()
+        try:
+            os.makedirs(os.path.dirname(metrics_file) or ".", exist_ok=True)
+            with open(metrics_file, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            logging.error(f"Failed to write metrics to {metrics_file}: {e}")
+        return record
+
+
+_run = RunMetrics("default")
+
+
+def start_run(job: str) -> RunMetrics:
+    """Starts recording a new run, replacing the current one."""
+    global _run
+    _run = RunMetrics(job)
+    return _run
+
+
+def get_run() -> RunMetrics:
+    """Returns the run currently being recorded."""
+    return _run
@@ -0,0 +1,10 @@
+"""Jittered exponential backoff shared by the retries in extract.py and alert_dispatch.py."""
+import random
+
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8
+
+
+def get_backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """Returns a full-jitter exponential backoff delay for the given retry attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
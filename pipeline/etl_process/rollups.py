@@ -0,0 +1,105 @@
+"""Keeps per-plant rollups of the sensor readings up to date.
+
+alpha.sensor_rollup holds the reading count and the min, max and sum of
+soil_moisture and temperature for every plant per 5 minute, hourly and daily
+bucket, so charts over hours or days read a few hundred rows instead of
+scanning alpha.sensor_data. load_sensor_data.py merges the rows each insert
+chunk actually stored into the buckets they touch, in the same statement and
+transaction as the insert, so a reading is rolled up exactly when it is stored.
+Rollups outlive the readings purged by transfer_to_s3.py; rebuild_rollups
+recomputes them from the readings still stored if they ever drift."""
+import argparse
+import logging
+import pymssql
+from datetime import datetime
+from connect_to_database import get_connection
+
+ROLLUP_KEY = ["plant_id", "granularity", "bucket_start"]
+ROLLUP_COLUMNS = ROLLUP_KEY + [
+    "reading_count", "soil_moisture_min", "soil_moisture_max", "soil_moisture_sum",
+    "temperature_min", "temperature_max", "temperature_sum"]
+
+BUCKET_EXPRESSIONS = {
+    "5min": "DATEADD(MINUTE, DATEDIFF(MINUTE, 0, recording_taken) / 5 * 5, 0)",
+    "hour": "DATEADD(HOUR, DATEDIFF(HOUR, 0, recording_taken), 0)",
+    "day": "CAST(CAST(recording_taken AS DATE) AS DATETIME)",
+}
+
+AGGREGATES = """COUNT(*),
+                   MIN(soil_moisture), MAX(soil_moisture), SUM(soil_moisture),
+                   MIN(temperature), MAX(temperature), SUM(temperature)"""
+
+# How each aggregate in an existing bucket (t) combines with the new readings (s).
+# MIN, MAX and SUM are NULL over only NULL readings, so a NULL side is ignored.
+MERGE_UPDATES = {"reading_count": "t.reading_count + s.reading_count"}
+for measure in ["soil_moisture", "temperature"]:
+    MERGE_UPDATES.update({
+        f"{measure}_min": f"CASE WHEN t.{measure}_min IS NULL OR s.{measure}_min < t.{measure}_min "
+                          f"THEN s.{measure}_min ELSE t.{measure}_min END",
+        f"{measure}_max": f"CASE WHEN t.{measure}_max IS NULL OR s.{measure}_max > t.{measure}_max "
+                          f"THEN s.{measure}_max ELSE t.{measure}_max END",
+        f"{measure}_sum": f"CASE WHEN t.{measure}_sum IS NULL THEN s.{measure}_sum "
+                          f"WHEN s.{measure}_sum IS NULL THEN t.{measure}_sum "
+                          f"ELSE t.{measure}_sum + s.{measure}_sum END",
+    })
+
+
+def get_rollup_merge(source: str) -> str:
+    """Returns a MERGE adding the readings in source, a table or table variable, to their buckets.
+
+    source needs plant_id, recording_taken, soil_moisture and temperature columns."""
+    buckets = ", ".join(f"('{granularity}', {bucket})"
+                        for granularity, bucket in BUCKET_EXPRESSIONS.items())
+    column_list = ", ".join(ROLLUP_COLUMNS)
+    updates = ",\n            ".join(f"{column} = {expression}"
+                                    for column, expression in MERGE_UPDATES.items())
+    return f"""
+        MERGE alpha.sensor_rollup AS t
+        USING (
+            SELECT plant_id, granularity, bucket_start, {AGGREGATES}
+            FROM {source}
+            CROSS APPLY (VALUES {buckets}) AS b (granularity, bucket_start)
+            GROUP BY plant_id, granularity, bucket_start
+        ) AS s ({column_list})
+        ON t.plant_id = s.plant_id AND t.granularity = s.granularity
+           AND t.bucket_start = s.bucket_start
+        WHEN MATCHED THEN UPDATE SET
+            {updates}
+        WHEN NOT MATCHED THEN
+            INSERT ({column_list}) VALUES ({", ".join(f"s.{column}" for column in ROLLUP_COLUMNS)});
+        """
+
+
+def rebuild_rollups(conn: pymssql.Connection, since: datetime) -> None:
+    """Recomputes every rollup bucket from the start of since's day onwards.
+
+    Readings already purged to the archive are not in alpha.sensor_data, so
+    since should be no earlier than the oldest stored reading."""
+    day_start = datetime(since.year, since.month, since.day)
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM alpha.sensor_rollup WHERE bucket_start >= %s;", (day_start,))
+        for granularity, bucket in BUCKET_EXPRESSIONS.items():
+            cursor.execute(
+                f"""
+                INSERT INTO alpha.sensor_rollup ({", ".join(ROLLUP_COLUMNS)})
+                SELECT plant_id, %s, {bucket}, {AGGREGATES}
+                FROM alpha.sensor_data
+                WHERE recording_taken >= %s
+                GROUP BY plant_id, {bucket};
+                """,
+                (granularity, day_start)
+            )
+    conn.commit()
+    logging.info(f"Rebuilt rollups from {day_start}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the sensor rollups from stored readings.")
+    parser.add_argument("--since", type=datetime.fromisoformat, required=True,
+                        help="Rebuild every bucket from this day onwards, e.g. 2024-01-01.")
+    args = parser.parse_args()
+    conn = get_connection()
+    try:
+        rebuild_rollups(conn, args.since)
+    finally:
+        conn.close()
@@ -3,13 +3,34 @@ transform.py transforms and cleans data from a given CSV file.
 This function reads data from the specified input CSV file, performs
 necessary transformations and cleaning operations, and then writes
 the cleaned data to the specified output CSV file.
+The same cleaning can be run in memory on the records returned by extract.py.
 """
 
 import logging
 import os
 
+import numpy as np
 import pandas as pd
 
+MANDATORY_FIELDS = ['plant_name', 'scientific_name', 'country_name',
+                    'botanist_email', 'botanist_forename', 'botanist_surname', 'botanist_phone']
+TEXT_FIELDS = MANDATORY_FIELDS
+BOTANIST_FIELDS = ['botanist_email', 'botanist_forename', 'botanist_surname', 'botanist_phone']
+DATE_FIELDS = ['last_watered', 'recording_taken']
+SOIL_MOISTURE_LIMITS = (0, 100)
+TEMPERATURE_LIMITS = (-10, 50)
+
+
+def configure_logging() -> None:
+    """Configures logging to the data cleaning log file."""
+    if not os.path.exists("./logs"):
+        os.mkdir("./logs")
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='./logs/data_cleaning.log'
+    )
+
 
 def load_data(input_file: str) -> pd.DataFrame:
     """Loads data from the original CSV file."""
@@ -23,28 +44,57 @@ def load_data(input_file: str) -> pd.DataFrame:
         raise
 
 
+def load_records(plant_data: list[dict]) -> pd.DataFrame:
+    """Loads extracted records, matching the values a CSV round trip would give."""
+    records = [
+        {key: str(value) if isinstance(value, (list, dict)) else value
+         for key, value in plant.items()}
+        for plant in plant_data
+    ]
+    df = pd.DataFrame(records).replace("", np.nan)
+    logging.info(f"Loaded {len(df)} records from memory.")
+    return df
+
+
+def log_filtered_rows(description: str, rows_before: int, rows_after: int) -> None:
+    """Logs how many rows a cleaning rule kept."""
+    logging.info(f"{description}. Rows before: {rows_before}, Rows after: {rows_after}")
+
+
+def has_mandatory_fields(df: pd.DataFrame) -> pd.Series:
+    """Marks the rows with every mandatory field present."""
+    return df[MANDATORY_FIELDS].notna().all(axis=1)
+
+
+def within_numeric_limits(df: pd.DataFrame) -> pd.Series:
+    """Marks the rows whose soil moisture and temperature are within their limits."""
+    return (df['soil_moisture'].between(*SOIL_MOISTURE_LIMITS)
+            & df['temperature'].between(*TEMPERATURE_LIMITS))
+
+
+def parse_datetimes(values: pd.Series) -> pd.Series:
+    """Parses timestamps as naive datetimes, with NaT for any that are invalid."""
+    parsed = pd.to_datetime(values, errors='coerce')
+    if parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_localize(None)
+    return parsed
+
+
 def drop_missing_data(df: pd.DataFrame) -> pd.DataFrame:
     """Drops rows with missing fields."""
-    mandatory_fields = ['plant_name', 'scientific_name', 'country_name',
-                        'botanist_email', 'botanist_forename', 'botanist_surname', 'botanist_phone']
     initial_shape = df.shape
-    df = df.dropna(subset=mandatory_fields)
-    logging.info(
-        f"Dropped rows with missing mandatory fields {mandatory_fields}. "
-        f"Rows before: {initial_shape[0]}, Rows after: {df.shape[0]}"
-    )
+    df = df[has_mandatory_fields(df)]
+    log_filtered_rows(f"Dropped rows with missing mandatory fields {MANDATORY_FIELDS}",
+                      initial_shape[0], df.shape[0])
     return df
 
 
 def set_numeric_limits(df: pd.DataFrame) -> pd.DataFrame:
     """Drops rows that aren't within the specified numeric limits."""
     initial_shape = df.shape
-    df = df[(df['soil_moisture'] >= 0) & (df['soil_moisture'] <= 100)]
-    df = df[(df['temperature'] >= -10) & (df['temperature'] <= 50)]
-    logging.info(
-        f"Filtered with limits on 'soil_moisture' (0-100) and 'temperature' (-10 to 50). "
-        f"Rows before: {initial_shape[0]}, Rows after: {df.shape[0]}"
-    )
+    df = df[within_numeric_limits(df)]
+    log_filtered_rows("Filtered with limits on 'soil_moisture' (0-100) and 'temperature' (-10 to 50)",
+                      initial_shape[0], df.shape[0])
     return df
 
 
@@ -64,21 +114,13 @@ def convert_dates(df: pd.DataFrame) -> pd.DataFrame:
     """Convert datetime columns and drop rows with invalid values."""
     initial_shape = df.shape
 
-    df['last_watered'] = pd.to_datetime(df['last_watered'], errors='coerce')
-    if df['last_watered'].dt.tz is not None:
-        df['last_watered'] = df['last_watered'].dt.tz_localize(None)
-
+    df['last_watered'] = parse_datetimes(df['last_watered'])
     if 'recording_taken' in df.columns:
-        df['recording_taken'] = pd.to_datetime(
-            df['recording_taken'], errors='coerce')
-        if df['recording_taken'].dt.tz is not None:
-            df['recording_taken'] = df['recording_taken'].dt.tz_localize(None)
-
-    df = df.dropna(subset=['last_watered', 'recording_taken'])
-    logging.info(
-        f"Converted datetime columns and dropped invalid rows. "
-        f"Rows before: {initial_shape[0]}, Rows after: {df.shape[0]}"
-    )
+        df['recording_taken'] = parse_datetimes(df['recording_taken'])
+
+    df = df.dropna(subset=DATE_FIELDS)
+    log_filtered_rows("Converted datetime columns and dropped invalid rows",
+                      initial_shape[0], df.shape[0])
     return df
 
 
@@ -86,18 +128,13 @@ def filter_invalid_location(df: pd.DataFrame) -> pd.DataFrame:
     """Drop rows that have an empty country_name column."""
     initial_shape = df.shape
     df = df[df['country_name'].notnull()]
-    logging.info(
-        f"Filtered rows with an empty 'country_name'. "
-        f"Rows before: {initial_shape[0]}, Rows after: {df.shape[0]}"
-    )
+    log_filtered_rows("Filtered rows with an empty 'country_name'", initial_shape[0], df.shape[0])
     return df
 
 
 def validate_botanist_details(df: pd.DataFrame) -> pd.DataFrame:
     """Validate and clean botanist details."""
-    botanist_fields = ['botanist_email', 'botanist_forename',
-                       'botanist_surname', 'botanist_phone']
-    for field in botanist_fields:
+    for field in BOTANIST_FIELDS:
         if field in df.columns:
             initial_non_empty = df[field].notnull().sum()
             df[field] = df[field].str.strip()
@@ -118,27 +155,52 @@ def save_data(df: pd.DataFrame, output_file: str) -> None:
         raise
 
 
+def transform_data(df: pd.DataFrame) -> pd.DataFrame:
+    """Runs every cleaning step over the raw plant data in a single pass.
+
+    Gives the same rows and values as applying drop_missing_data, set_numeric_limits,
+    clean_text_fields, convert_dates, filter_invalid_location and validate_botanist_details
+    in turn, logging the same row counts. Each rule narrows one validity mask instead of
+    copying the frame and dates are parsed only for the rows still valid. The kept rows
+    are selected at the end and built into a new frame, with their parsed dates and
+    stripped text fields, by a single assign."""
+    rows_before = len(df)
+    valid = has_mandatory_fields(df).to_numpy(copy=True)
+    rows_with_fields = int(valid.sum())
+    log_filtered_rows(f"Dropped rows with missing mandatory fields {MANDATORY_FIELDS}",
+                      rows_before, rows_with_fields)
+
+    valid &= within_numeric_limits(df).to_numpy()
+    rows_within_limits = int(valid.sum())
+    log_filtered_rows("Filtered with limits on 'soil_moisture' (0-100) and 'temperature' (-10 to 50)",
+                      rows_with_fields, rows_within_limits)
+
+    candidates = np.flatnonzero(valid)
+    dates = {field: parse_datetimes(df[field].iloc[candidates]).to_numpy() for field in DATE_FIELDS}
+    dated = np.logical_and.reduce([~pd.isna(values) for values in dates.values()])
+    valid[candidates] = dated
+    rows_dated = int(valid.sum())
+    log_filtered_rows("Converted datetime columns and dropped invalid rows",
+                      rows_within_limits, rows_dated)
+
+    valid &= df['country_name'].notna().to_numpy()
+    log_filtered_rows("Filtered rows with an empty 'country_name'", rows_dated, int(valid.sum()))
+
+    kept = df.iloc[np.flatnonzero(valid)]
+    columns = {field: values[valid[candidates]] for field, values in dates.items()}
+    columns.update({field: kept[field].str.strip() for field in TEXT_FIELDS if field in kept.columns})
+    cleaned = kept.assign(**columns)
+    logging.info(f"Cleaned whitespace in columns {TEXT_FIELDS}.")
+    return cleaned
+
+
 def main_transform(input_file: str, output_file: str) -> None:
     """Main function to carry out the transformation process."""
-    if not os.path.exists("./logs"):
-        os.mkdir("./logs")
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        filename='./logs/data_cleaning.log'
-    )
+    configure_logging()
     logging.info("Data cleaning process started.")
     try:
         df = load_data(input_file)
-        df = drop_missing_data(df)
-        df = set_numeric_limits(df)
-        df = clean_text_fields(df, text_fields=[
-            'plant_name', 'scientific_name', 'country_name',
-            'botanist_email', 'botanist_forename', 'botanist_surname', 'botanist_phone'
-        ])
-        df = convert_dates(df)
-        df = filter_invalid_location(df)
-        df = validate_botanist_details(df)
+        df = transform_data(df)
         save_data(df, output_file)
         logging.info("Data cleaning process completed successfully.")
     except Exception as e:
@@ -146,6 +208,21 @@ def main_transform(input_file: str, output_file: str) -> None:
         raise
 
 
+def main_transform_records(plant_data: list[dict], output_file: str = None) -> pd.DataFrame:
+    """Cleans extracted records in memory, optionally saving a debug CSV."""
+    configure_logging()
+    logging.info("Data cleaning process started.")
+    try:
+        df = transform_data(load_records(plant_data))
+        if output_file:
+            save_data(df, output_file)
+        logging.info("Data cleaning process completed successfully.")
+        return df
+    except Exception as e:
+        logging.error(f"Data cleaning process failed: {e}")
+        raise
+
+
 if __name__ == '__main__':
     input_file = './plants_data/plants_data.csv'
     output_file = './plants_data/plants_data_cleaned.csv'
@@ -0,0 +1,108 @@
+"""Tracks the latest stored recording_taken for each plant.
+
+The watermarks are kept in alpha.plant_watermark, which load_sensor_data.py
+advances in the same transaction as the readings it inserts, so reading them
+costs one row per plant however large alpha.sensor_data grows. Readings at or
+before a plant's watermark are dropped before transform, so each run only does
+work for new readings. WATERMARK_STORE=file keeps them in WATERMARK_FILE
+instead, which only lasts between local runs since each ETL task starts with
+an empty filesystem; the table is read when there is no file yet."""
+import json
+import logging
+import os
+import pandas as pd
+import pymssql
+from connect_to_database import get_connection
+from transform import parse_datetimes
+
+WATERMARK_STORE = os.getenv("WATERMARK_STORE", "database")
+WATERMARK_FILE = os.getenv("WATERMARK_FILE", "./plants_data/watermarks.json")
+
+
+def get_watermark_merge(source: str) -> str:
+    """Returns a MERGE moving each plant's watermark up to its latest reading in source.
+
+    source, a table or table variable, needs plant_id and recording_taken columns."""
+    return f"""
+        MERGE alpha.plant_watermark AS t
+        USING (
+            SELECT plant_id, MAX(recording_taken) FROM {source} GROUP BY plant_id
+        ) AS s (plant_id, recording_taken)
+        ON t.plant_id = s.plant_id
+        WHEN MATCHED AND s.recording_taken > t.recording_taken THEN
+            UPDATE SET recording_taken = s.recording_taken
+        WHEN NOT MATCHED THEN
+            INSERT (plant_id, recording_taken) VALUES (s.plant_id, s.recording_taken);
+        """
+
+
+def fetch_watermarks(conn: pymssql.Connection) -> dict:
+    """Fetch the latest recording_taken per plant from the alpha.plant_watermark table."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT plant_id, recording_taken FROM alpha.plant_watermark;")
+        return {plant_id: pd.Timestamp(latest) for plant_id, latest in cur.fetchall()}
+
+
+def load_watermarks(state_file: str = WATERMARK_FILE) -> dict:
+    """Loads the watermark state file, or None if there is no usable state."""
+    try:
+        with open(state_file, "r") as f:
+            state = json.load(f)
+        return {int(plant_id): pd.Timestamp(latest) for plant_id, latest in state.items()}
+    except (OSError, ValueError, TypeError, AttributeError):
+        return None
+
+
+def save_watermarks(watermarks: dict, state_file: str = WATERMARK_FILE) -> None:
+    """Writes the watermark state file."""
+    os.makedirs(os.path.dirname(state_file) or ".", exist_ok=True)
+    with open(state_file, "w") as f:
+        json.dump({str(plant_id): latest.isoformat()
+                   for plant_id, latest in watermarks.items()}, f)
+
+
+def get_watermarks(store: str = WATERMARK_STORE, state_file: str = WATERMARK_FILE) -> dict:
+    """Returns the stored watermarks, from the state file if store is file and it exists."""
+    if store == "file":
+        watermarks = load_watermarks(state_file)
+        if watermarks is not None:
+            return watermarks
+
+    conn = get_connection()
+    if conn is None:
+        logging.error("Could not read watermarks from the database; loading every reading.")
+        return {}
+    try:
+        return fetch_watermarks(conn)
+    except Exception as e:
+        logging.error(f"Failed to fetch watermarks: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def filter_new_readings(plant_data: list[dict], watermarks: dict) -> list[dict]:
+    """Drop readings at or before their plant's watermark.
+
+    Readings without a parseable plant_id or recording_taken are kept for
+    transform to deal with."""
+    if not plant_data or not watermarks:
+        return plant_data
+
+    recorded = parse_datetimes(pd.Series([plant.get("recording_taken") for plant in plant_data]))
+    latest = pd.Series([watermarks.get(plant.get("plant_id")) for plant in plant_data],
+                       dtype="datetime64[ns]")
+    is_new = ~(recorded <= latest)
+    logging.info(f"Skipping {(~is_new).sum()} readings at or before their watermark.")
+    return [plant for plant, new in zip(plant_data, is_new) if new]
+
+
+def advance_watermarks(watermarks: dict, loaded_data: pd.DataFrame) -> dict:
+    """Moves each plant's watermark up to the latest reading that was loaded."""
+    if loaded_data is None or loaded_data.empty:
+        return watermarks
+    for plant_id, latest in loaded_data.groupby("plant_id")["recording_taken"].max().items():
+        plant_id = int(plant_id)
+        if plant_id not in watermarks or latest > watermarks[plant_id]:
+            watermarks[plant_id] = pd.Timestamp(latest)
+    return watermarks
@@ -1,20 +1,21 @@
-IF OBJECT_ID('alpha.sensor_data', 'U') IS NOT NULL DROP TABLE alpha.sensor_data;
-IF OBJECT_ID('alpha.plant', 'U') IS NOT NULL DROP TABLE alpha.plant;
-IF OBJECT_ID('alpha.plant_species', 'U') IS NOT NULL DROP TABLE alpha.plant_species;
-IF OBJECT_ID('alpha.country', 'U') IS NOT NULL DROP TABLE alpha.country;
-IF OBJECT_ID('alpha.botanist', 'U') IS NOT NULL DROP TABLE alpha.botanist;
+-- Baseline schema: the tables of the old drop-and-recreate schema.sql. Every
+-- statement is guarded, so databases it created adopt this migration without
+-- losing data.
 
+IF OBJECT_ID('alpha.plant_species', 'U') IS NULL
 CREATE TABLE alpha.plant_species (
     scientific_name_id INT IDENTITY(1,1) PRIMARY KEY,
     plant_name VARCHAR(100) NOT NULL,
     scientific_name VARCHAR(100) NOT NULL
 );
 
+IF OBJECT_ID('alpha.country', 'U') IS NULL
 CREATE TABLE alpha.country (
     country_id INT IDENTITY(1,1) PRIMARY KEY,
     country_name VARCHAR(100) NOT NULL
 );
 
+IF OBJECT_ID('alpha.botanist', 'U') IS NULL
 CREATE TABLE alpha.botanist (
     botanist_id INT IDENTITY(1,1) PRIMARY KEY,
     botanist_email VARCHAR(100) NOT NULL,
@@ -23,6 +24,7 @@ CREATE TABLE alpha.botanist (
     botanist_phone VARCHAR(20) NOT NULL
 );
 
+IF OBJECT_ID('alpha.plant', 'U') IS NULL
 CREATE TABLE alpha.plant (
     plant_id INT NOT NULL PRIMARY KEY,
     scientific_name_id INT,
@@ -33,6 +35,7 @@ CREATE TABLE alpha.plant (
     FOREIGN KEY (botanist_id) REFERENCES alpha.botanist(botanist_id)
 );
 
+IF OBJECT_ID('alpha.sensor_data', 'U') IS NULL
 CREATE TABLE alpha.sensor_data (
     sensor_data_id INT IDENTITY(1,1) PRIMARY KEY,
     plant_id INT,
@@ -41,4 +44,4 @@ CREATE TABLE alpha.sensor_data (
     soil_moisture FLOAT,
     temperature FLOAT,
     FOREIGN KEY (plant_id) REFERENCES alpha.plant(plant_id)
-);
\ No newline at end of file
+);
@@ -0,0 +1,16 @@
+-- Readings are keyed on (plant_id, recording_taken). Databases loaded before
+-- ingestion was idempotent can hold the same reading more than once, which
+-- would make the unique index fail, so every copy but the first is deleted.
+WITH numbered AS (
+    SELECT ROW_NUMBER() OVER (
+        PARTITION BY plant_id, recording_taken ORDER BY sensor_data_id) AS copy_number
+    FROM alpha.sensor_data
+)
+DELETE FROM numbered WHERE copy_number > 1;
+
+-- IGNORE_DUP_KEY skips a repeated reading instead of failing its whole chunk.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ux_sensor_data_plant_recording'
+               AND object_id = OBJECT_ID('alpha.sensor_data'))
+CREATE UNIQUE INDEX ux_sensor_data_plant_recording
+    ON alpha.sensor_data (plant_id, recording_taken)
+    WITH (IGNORE_DUP_KEY = ON);
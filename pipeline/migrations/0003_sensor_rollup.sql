@@ -0,0 +1,20 @@
+-- Per plant reading counts and the min, max and sum of soil moisture and
+-- temperature per 5 minute, hourly and daily bucket, kept up to date by
+-- load_sensor_data.py for the dashboard's history charts (see rollups.py).
+-- Buckets for readings stored before this table existed can be filled with
+-- python rollups.py --since <date of the oldest stored reading>.
+IF OBJECT_ID('alpha.sensor_rollup', 'U') IS NULL
+CREATE TABLE alpha.sensor_rollup (
+    plant_id INT NOT NULL,
+    granularity VARCHAR(10) NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    reading_count INT NOT NULL,
+    soil_moisture_min FLOAT,
+    soil_moisture_max FLOAT,
+    soil_moisture_sum FLOAT,
+    temperature_min FLOAT,
+    temperature_max FLOAT,
+    temperature_sum FLOAT,
+    PRIMARY KEY (plant_id, granularity, bucket_start),
+    FOREIGN KEY (plant_id) REFERENCES alpha.plant(plant_id)
+);
@@ -0,0 +1,36 @@
+-- Indexes for the hot lookups, which otherwise scan their tables.
+
+-- invariable_load.py inserts and looks up dimensions by their natural keys.
+-- The loader already keeps these unique; the indexes enforce it and turn the
+-- WHERE NOT EXISTS and IN lookups into seeks. The surrogate ID is the
+-- clustered key, so each index covers its SELECT key, id lookup.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ux_plant_species_scientific_name'
+               AND object_id = OBJECT_ID('alpha.plant_species'))
+CREATE UNIQUE INDEX ux_plant_species_scientific_name
+    ON alpha.plant_species (scientific_name);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ux_country_country_name'
+               AND object_id = OBJECT_ID('alpha.country'))
+CREATE UNIQUE INDEX ux_country_country_name
+    ON alpha.country (country_name);
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ux_botanist_botanist_email'
+               AND object_id = OBJECT_ID('alpha.botanist'))
+CREATE UNIQUE INDEX ux_botanist_botanist_email
+    ON alpha.botanist (botanist_email);
+
+-- The dashboard's readings by minute and load_sensor_data.py's already
+-- loaded keys filter sensor_data on a recording_taken range. Including every
+-- column they read answers both from the index without key lookups.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ix_sensor_data_recording_taken'
+               AND object_id = OBJECT_ID('alpha.sensor_data'))
+CREATE INDEX ix_sensor_data_recording_taken
+    ON alpha.sensor_data (recording_taken)
+    INCLUDE (plant_id, last_watered, soil_moisture, temperature);
+
+-- The dashboard filters plants by botanist before joining their readings.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ix_plant_botanist_id'
+               AND object_id = OBJECT_ID('alpha.plant'))
+CREATE INDEX ix_plant_botanist_id
+    ON alpha.plant (botanist_id)
+    INCLUDE (scientific_name_id);
@@ -0,0 +1,11 @@
+-- Open plant health alerts, one per (plant_id, rule), kept between ETL runs
+-- so the alert cooldown survives each short-lived task (see alert_state.py).
+-- Resolved alerts are deleted.
+IF OBJECT_ID('alpha.alert_state', 'U') IS NULL
+CREATE TABLE alpha.alert_state (
+    plant_id INT NOT NULL,
+    rule VARCHAR(100) NOT NULL,
+    opened_at DATETIME NOT NULL,
+    last_notified DATETIME NULL,
+    PRIMARY KEY (plant_id, rule)
+);
@@ -0,0 +1,8 @@
+-- The plant IDs last found live by extract.py's discovery scan, kept between
+-- ETL runs so each short-lived task fetches only these IDs instead of probing
+-- for them again. discovered_at is when the set was last rescanned.
+IF OBJECT_ID('alpha.known_plant', 'U') IS NULL
+CREATE TABLE alpha.known_plant (
+    plant_id INT NOT NULL PRIMARY KEY,
+    discovered_at DATETIME NOT NULL
+);
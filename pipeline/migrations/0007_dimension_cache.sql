@@ -0,0 +1,9 @@
+-- The natural key to surrogate ID mapping of each dimension table, as JSON,
+-- kept between ETL runs so each short-lived task can skip warming the
+-- dimension cache from the tables themselves (see dimension_cache.py).
+IF OBJECT_ID('alpha.dimension_cache', 'U') IS NULL
+CREATE TABLE alpha.dimension_cache (
+    dimension VARCHAR(50) NOT NULL PRIMARY KEY,
+    snapshot NVARCHAR(MAX) NOT NULL,
+    saved_at DATETIME NOT NULL
+);
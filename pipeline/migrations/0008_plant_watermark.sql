@@ -0,0 +1,15 @@
+-- The latest stored recording_taken of each plant, advanced by
+-- load_sensor_data.py in the same transaction as the readings it inserts,
+-- so each ETL run reads one row per plant instead of grouping all of
+-- alpha.sensor_data (see watermarks.py). Seeded from the readings already stored.
+IF OBJECT_ID('alpha.plant_watermark', 'U') IS NULL
+CREATE TABLE alpha.plant_watermark (
+    plant_id INT NOT NULL PRIMARY KEY,
+    recording_taken DATETIME NOT NULL
+);
+
+INSERT INTO alpha.plant_watermark (plant_id, recording_taken)
+SELECT sd.plant_id, MAX(sd.recording_taken)
+FROM alpha.sensor_data sd
+WHERE NOT EXISTS (SELECT 1 FROM alpha.plant_watermark pw WHERE pw.plant_id = sd.plant_id)
+GROUP BY sd.plant_id;
@@ -0,0 +1,114 @@
+"""
+
+Reads archived plant readings back out of the long-term Parquet archive that
+transfer_to_s3.py writes, from either the s3 bucket or a local directory.
+
+Only the year=/month=/day= partitions inside the requested time range are
+opened, only the requested columns are read, and the time range and plant IDs
+are pushed down to the Parquet row groups, so a one-week, one-plant query
+reads a small fraction of the archive.
+
+"""
+
+from os import environ
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+from dotenv import load_dotenv
+
+
+ARCHIVE_PREFIX = "historical_plants_data"
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("year", pa.int16()), ("month", pa.int8()), ("day", pa.int8())]),
+    flavor="hive")
+
+ARCHIVE_COLUMNS = ["recording_taken", "last_watered", "plant_id", "plant_name",
+                   "scientific_name", "soil_moisture", "temperature",
+                   "country_name", "botanist_forename", "botanist_surname"]
+
+
+def get_archive_dataset(archive_dir: str = None, bucket_name: str = None,
+                        prefix: str = ARCHIVE_PREFIX) -> ds.Dataset:
+    """ Opens the archive in archive_dir if given, otherwise under the prefix in the s3 bucket. """
+    if archive_dir:
+        return ds.dataset(archive_dir, filesystem=fs.LocalFileSystem(),
+                          format="parquet", partitioning=PARTITIONING)
+    filesystem = fs.S3FileSystem(region=environ.get("AWS_REGION", "eu-west-2"))
+    return ds.dataset(f"{bucket_name}/{prefix}", filesystem=filesystem,
+                      format="parquet", partitioning=PARTITIONING)
+
+
+def get_partition_filter(start: datetime, end: datetime) -> ds.Expression:
+    """ Returns a filter on the partition fields matching every day from start to end. """
+    partition_filter = None
+    day = start.date()
+    while day <= end.date():
+        day_filter = ((ds.field("year") == day.year) & (ds.field("month") == day.month)
+                      & (ds.field("day") == day.day))
+        partition_filter = day_filter if partition_filter is None else partition_filter | day_filter
+        day += timedelta(days=1)
+    return partition_filter
+
+
+def get_row_filter(start: datetime, end: datetime, plant_ids: list[int] = None) -> ds.Expression:
+    """ Returns the time range and plant ID filter pushed down to the Parquet row groups. """
+    row_filter = ((ds.field("recording_taken") >= pa.scalar(start, pa.timestamp("ms")))
+                  & (ds.field("recording_taken") < pa.scalar(end, pa.timestamp("ms"))))
+    if plant_ids:
+        row_filter = row_filter & ds.field("plant_id").isin(plant_ids)
+    return row_filter
+
+
+def query_history(start: datetime, end: datetime, plant_ids: list[int] = None,
+                  columns: list[str] = None, archive_dir: str = None,
+                  bucket_name: str = None) -> pd.DataFrame:
+    """ Returns archived readings taken from start up to end, optionally for some plants only. """
+    if start >= end:
+        return pd.DataFrame(columns=columns or ARCHIVE_COLUMNS)
+    try:
+        dataset = get_archive_dataset(archive_dir, bucket_name)
+    except FileNotFoundError:
+        logging.error("No archive found.")
+        return pd.DataFrame(columns=columns or ARCHIVE_COLUMNS)
+
+    table = dataset.to_table(
+        columns=columns or ARCHIVE_COLUMNS,
+        filter=get_partition_filter(start, end) & get_row_filter(start, end, plant_ids))
+    history = table.to_pandas()
+    if "recording_taken" in history.columns:
+        history = history.sort_values("recording_taken", ignore_index=True)
+    return history
+
+
+def get_arguments() -> argparse.Namespace:
+    """Parse and return command-line arguments."""
+    parser = argparse.ArgumentParser(description="Query the long-term plant readings archive.")
+    parser.add_argument("--start", type=datetime.fromisoformat, required=True,
+                        help="Start of the time range (inclusive), e.g. 2024-01-01T00:00.")
+    parser.add_argument("--end", type=datetime.fromisoformat, required=True,
+                        help="End of the time range (exclusive).")
+    parser.add_argument("--plant-id", type=int, action="append", dest="plant_ids",
+                        help="Plant ID to include. Can be given more than once.")
+    parser.add_argument("--columns", nargs="+", choices=ARCHIVE_COLUMNS,
+                        help="Columns to read. Default is every column.")
+    parser.add_argument("--output", help="CSV file to write the results to.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    args = get_arguments()
+    history = query_history(args.start, args.end, args.plant_ids, args.columns,
+                            environ.get("ARCHIVE_DIR"), environ.get("BUCKET"))
+    if args.output:
+        history.to_csv(args.output, index=False)
+        print(f"Saved {len(history)} readings to '{args.output}'.")
+    else:
+        print(history.to_string())
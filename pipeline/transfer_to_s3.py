@@ -8,18 +8,28 @@ Steps:
 
 2. Use a cursor to query all data.
 
-3. Store data in rows in a csv
+3. Page through the rows with fetchmany, writing each batch into one
+   compressed Parquet file per day, partitioned as year=/month=/day=.
 
-4. Upload the csv onto and s3 instance
+4. Upload this run's files to the s3 bucket, or keep them in ARCHIVE_DIR when
+   archiving to the local filesystem.
 
-5. Use the cursor to drop all values in the sensor data table.
+5. Delete the archived rows from the sensor data table, one committed
+   sensor_data_id batch at a time, up to the ID captured at the start.
+
+Setting ARCHIVE_FORMAT=csv instead appends to the single historical csv in the
+bucket through a streamed multipart upload.
 
 """
 
 from os import environ
+import os
+import sys
 import logging
 import csv
-from datetime import date
+import io
+import tempfile
+from datetime import datetime
 
 import boto3
 from botocore.exceptions import ClientError
@@ -27,8 +37,18 @@ from botocore import client
 
 from dotenv import load_dotenv
 
-import pymssql
-from pymssql import Connection, Cursor
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pymssql import Cursor
+
+try:
+    from connect_to_database import get_connection
+    from metrics import start_run
+except ImportError:
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "etl_process"))
+    from connect_to_database import get_connection
+    from metrics import start_run
 
 
 JOIN_TABLES_QUERY = """
@@ -52,109 +72,281 @@ JOIN
 JOIN 
     alpha.botanist b ON b.botanist_id = p.botanist_id
 JOIN 
-    alpha.country c ON c.country_id = p.country_id;
+    alpha.country c ON c.country_id = p.country_id
+WHERE
+    s.sensor_data_id <= %s;
 
 """
 
-DROP_SENSOR_DATA_QUERY = """
+ARCHIVE_QUERY = """
 
-TRUNCATE TABLE alpha.sensor_data
+SELECT
+    s.recording_taken,
+    s.last_watered,
+    p.plant_id,
+    ps.plant_name,
+    ps.scientific_name,
+    s.soil_moisture,
+    s.temperature,
+    c.country_name,
+    b.botanist_forename,
+    b.botanist_surname
+FROM 
+    alpha.plant_species ps
+JOIN 
+    alpha.plant p ON ps.scientific_name_id = p.scientific_name_id
+JOIN 
+    alpha.sensor_data s ON s.plant_id = p.plant_id
+JOIN 
+    alpha.botanist b ON b.botanist_id = p.botanist_id
+JOIN 
+    alpha.country c ON c.country_id = p.country_id
+WHERE
+    s.sensor_data_id > %s AND s.sensor_data_id <= %s;
 
 """
 
-CSV_FILE_NAME = "data_for_long_term_storage.csv"
+SENSOR_DATA_ID_RANGE_QUERY = """
 
+SELECT MIN(sensor_data_id), MAX(sensor_data_id) FROM alpha.sensor_data;
 
-def get_connection() -> Connection:
-    """Connects to RDS database using credentials"""
-    try:
-        conn = pymssql.connect(
-            server=environ["DB_HOST"],
-            user=environ["DB_USER"],
-            password=environ["DB_PASSWORD"],
-            database=environ["DB_NAME"],
-            port=int(environ["DB_PORT"])
-        )
-        logging.info("Connected to the database successfully.")
-        return conn
-    except Exception as e:
-        logging.error(f"Error connecting to the database: {e}")
-        return None
+"""
 
+DELETE_SENSOR_DATA_BATCH_QUERY = """
 
-def execute_query(cursor: Cursor, query):
-    """ Returns a list of all outputs from a cursor """
-    cursor.execute(query)
-    return cursor.fetchall()
+DELETE FROM alpha.sensor_data
+WHERE sensor_data_id > %s AND sensor_data_id <= %s;
 
+"""
 
-def write_csv_from_query(db_cursor: Cursor, file_exists: bool) -> None:
-    """ Function that carries out writing csv steps. """
+CSV_HEADER = ["recording_taken", "last_watered", "plant_name",
+              "scientific_name", "soil_moisture", "temperature",
+              "country_name", "botanist_forename", "botanist_surname"]
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("recording_taken", pa.timestamp("ms")),
+    ("last_watered", pa.timestamp("ms")),
+    ("plant_id", pa.int32()),
+    ("plant_name", pa.string()),
+    ("scientific_name", pa.string()),
+    ("soil_moisture", pa.float32()),
+    ("temperature", pa.float32()),
+    ("country_name", pa.string()),
+    ("botanist_forename", pa.string()),
+    ("botanist_surname", pa.string()),
+])
+ARCHIVE_PREFIX = "historical_plants_data"
+PARQUET_COMPRESSION = "zstd"
+
+FETCH_BATCH_SIZE = 5000
+PURGE_BATCH_SIZE = int(environ.get("PURGE_BATCH_SIZE", "50000"))
+PART_SIZE = 8 * 1024 * 1024
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+def get_object_size(s3_client: client, bucket_name: str, object_key: str) -> int:
+    """ Returns the size of an object in the bucket, or None if it does not exist. """
+    try:
+        return s3_client.head_object(Bucket=bucket_name, Key=object_key)["ContentLength"]
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            print(f"Object '{object_key}' does not exist in the bucket '{bucket_name}'.")
+            return None
+        raise
+
+
+def upload_part(s3_client: client, bucket_name: str, object_key: str, upload_id: str,
+                parts: list, body: bytes) -> None:
+    """ Uploads the next part of a multipart upload and records its ETag. """
+    part_number = len(parts) + 1
+    response = s3_client.upload_part(Bucket=bucket_name, Key=object_key, UploadId=upload_id,
+                                     PartNumber=part_number, Body=body)
+    parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+
+def stream_query_to_s3(s3_client: client, cursor: Cursor, bucket_name: str, object_key: str,
+                       max_id: int, batch_size: int = FETCH_BATCH_SIZE,
+                       part_size: int = PART_SIZE) -> int:
+    """ Appends rows up to max_id to the csv object in the bucket without holding them in memory.
+
+    An existing object of at least MIN_PART_SIZE is copied server-side as the
+    first part; a smaller one is read back so it can lead the first part. Returns
+    the number of rows appended. """
+    existing_size = get_object_size(s3_client, bucket_name, object_key)
+    upload_id = s3_client.create_multipart_upload(
+        Bucket=bucket_name, Key=object_key)["UploadId"]
+    parts = []
+    buffer = io.StringIO()
+    file_writer = csv.writer(buffer)
+    row_count = 0
 
-    joined_database_data = execute_query(db_cursor, JOIN_TABLES_QUERY)
+    try:
+        if existing_size is None:
+            file_writer.writerow(CSV_HEADER)
+        elif existing_size >= MIN_PART_SIZE:
+            response = s3_client.upload_part_copy(
+                Bucket=bucket_name, Key=object_key, UploadId=upload_id, PartNumber=1,
+                CopySource={"Bucket": bucket_name, "Key": object_key})
+            parts.append({"PartNumber": 1, "ETag": response["CopyPartResult"]["ETag"]})
+        else:
+            existing = s3_client.get_object(Bucket=bucket_name, Key=object_key)["Body"].read()
+            buffer.write(existing.decode("utf-8"))
+
+        cursor.execute(JOIN_TABLES_QUERY, (max_id,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            file_writer.writerows(rows)
+            row_count += len(rows)
+            if buffer.tell() >= part_size:
+                upload_part(s3_client, bucket_name, object_key, upload_id, parts,
+                            buffer.getvalue().encode("utf-8"))
+                buffer.seek(0)
+                buffer.truncate()
+
+        if row_count == 0 and existing_size is not None:
+            s3_client.abort_multipart_upload(
+                Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+            print("No new rows to append.")
+            return 0
+
+        if buffer.tell() or not parts:
+            upload_part(s3_client, bucket_name, object_key, upload_id, parts,
+                        buffer.getvalue().encode("utf-8"))
+        s3_client.complete_multipart_upload(
+            Bucket=bucket_name, Key=object_key, UploadId=upload_id,
+            MultipartUpload={"Parts": parts})
+        print(f"Appended {row_count} rows to {bucket_name}/{object_key}")
+        return row_count
 
-    with open(CSV_FILE_NAME, 'a+') as csv_file:
-        file_writer = csv.writer(csv_file)
-        if not file_exists:
-            file_writer.writerow(["recording_taken", "last_watered", "plant_name",
-                                  "scientific_name", "soil_moisture", "temperature",
-                                  "country_name", "botanist_forename", "botanist_surname"])
-        file_writer.writerows(joined_database_data)
+    except Exception as e:
+        logging.error(f"Error streaming data to S3: {e}")
+        s3_client.abort_multipart_upload(
+            Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+        raise
 
 
-def downloads_csv_file(s3_client: client, bucket_name: str, object_key: str) -> bool:
-    """ If a historical_plants_data.csv exists in the S3 bucket, download it, otherwise create it locally. """
-    try:
-        s3_client.head_object(Bucket=bucket_name, Key=object_key)
-        s3_client.download_file(bucket_name, object_key, object_key)
-        print(f"File {object_key} downloaded successfully to this directory.")
-        return True
+def get_partition_path(day: datetime) -> str:
+    """ Returns the year=/month=/day= partition directory for a date. """
+    return f"year={day.year}/month={day.month:02d}/day={day.day:02d}"
 
-    except ClientError as e:
-        if e.response['Error']['Code'] == 'NoSuchKey':
-            print(
-                f"Object '{object_key}' does not exist in the bucket '{bucket_name}'.")
-        else:
-            print(f"Error checking object: {e}")
-        print("Creating a new historical_plants_data.csv file.")
-        return False
 
+def rows_to_table(rows: list) -> pa.Table:
+    """ Converts query rows into an Arrow table with the compact archive schema. """
+    columns = list(zip(*rows))
+    return pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, ARCHIVE_SCHEMA)],
+        schema=ARCHIVE_SCHEMA)
 
-def send_to_bucket(s3_client: client, bucket_name: str, file_key: str) -> None:
-    """ Sends a csv file to an s3 resource """
-    try:
-        s3_client.upload_file(CSV_FILE_NAME, bucket_name, file_key)
-        print(f"CSV file uploaded successfully to {bucket_name}/{file_key}")
-    except ClientError as e:
-        logging.error(f"Error uploading file to S3: {e}")
 
+def write_parquet_partitions(cursor: Cursor, output_dir: str, run_id: str, id_range: tuple,
+                             batch_size: int = FETCH_BATCH_SIZE) -> list[str]:
+    """ Writes the rows in the sensor_data_id range as one Parquet file per day under output_dir.
 
-def clear_sensor_data(cursor: Cursor):
-    """Clears sensor data in database table."""
+    Rows are paged through with fetchmany and each batch is appended to its
+    day's file as a row group, so only one batch is held in memory. Returns
+    the written file paths relative to output_dir. """
+    writers = {}
+    cursor.execute(ARCHIVE_QUERY, id_range)
     try:
-        cursor.execute(DROP_SENSOR_DATA_QUERY)
-    except Exception as e:
-        raise e
-
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            rows_by_day = {}
+            for row in rows:
+                rows_by_day.setdefault(row[0].date(), []).append(row)
+            for day, day_rows in rows_by_day.items():
+                if day not in writers:
+                    relative_path = f"{get_partition_path(day)}/part-{run_id}.parquet"
+                    os.makedirs(os.path.join(output_dir, get_partition_path(day)), exist_ok=True)
+                    writers[day] = (relative_path, pq.ParquetWriter(
+                        os.path.join(output_dir, relative_path), ARCHIVE_SCHEMA,
+                        compression=PARQUET_COMPRESSION))
+                writers[day][1].write_table(rows_to_table(day_rows))
+    finally:
+        for _, writer in writers.values():
+            writer.close()
+    return [relative_path for relative_path, _ in writers.values()]
+
+
+def upload_partitions(s3_client: client, bucket_name: str, local_dir: str,
+                      relative_paths: list[str], prefix: str = ARCHIVE_PREFIX) -> None:
+    """ Uploads this run's Parquet files to the bucket under the archive prefix. """
+    for relative_path in relative_paths:
+        s3_client.upload_file(os.path.join(local_dir, relative_path),
+                              bucket_name, f"{prefix}/{relative_path}")
+        print(f"Parquet file uploaded successfully to {bucket_name}/{prefix}/{relative_path}")
+
+
+def archive_to_parquet(cursor: Cursor, run_id: str, id_range: tuple) -> list[str]:
+    """ Archives the id range to ARCHIVE_DIR if set, otherwise to the s3 bucket. """
+    archive_dir = environ.get("ARCHIVE_DIR")
+    if archive_dir:
+        return write_parquet_partitions(cursor, archive_dir, run_id, id_range)
 
-def main_transfer():
-    """ Main transfer function that executes the whole process """
     s3_client = boto3.client('s3')
-    bucket_name = environ["BUCKET"]
-    file_key = f"historical_plants_data.csv"
+    with tempfile.TemporaryDirectory() as local_dir:
+        relative_paths = write_parquet_partitions(cursor, local_dir, run_id, id_range)
+        upload_partitions(s3_client, environ["BUCKET"], local_dir, relative_paths)
+    return relative_paths
 
-    file_existed = downloads_csv_file(s3_client, bucket_name, file_key)
 
-    conn = get_connection()
-    with conn.cursor() as cursor:
-        write_csv_from_query(cursor, file_existed)
+def get_id_batches(cursor: Cursor, batch_size: int = PURGE_BATCH_SIZE) -> list[tuple]:
+    """ Captures the current sensor_data_id range and splits it into (low, high] batches.
+
+    Rows inserted after this point have higher IDs and are left for the next run. """
+    cursor.execute(SENSOR_DATA_ID_RANGE_QUERY)
+    min_id, max_id = cursor.fetchone()
+    if max_id is None:
+        return []
+    return [(low, min(low + batch_size, max_id))
+            for low in range(min_id - 1, max_id, batch_size)]
 
-        send_to_bucket(s3_client, bucket_name, file_key)
 
-        clear_sensor_data(cursor)
+def delete_sensor_data_batch(cursor: Cursor, id_range: tuple) -> None:
+    """Deletes one archived (low, high] batch of sensor data."""
+    cursor.execute(DELETE_SENSOR_DATA_BATCH_QUERY, id_range)
 
-    conn.commit()
-    conn.close()
+
+def main_transfer():
+    """ Main transfer function that executes the whole process
+
+    Only rows up to the sensor_data_id captured at the start are archived and
+    deleted, one committed batch at a time, so the ETL can keep inserting. """
+    metrics = start_run("transfer_to_s3")
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            id_batches = get_id_batches(cursor)
+            conn.commit()
+            if not id_batches:
+                print("No sensor data to archive.")
+                return
+
+            if environ.get("ARCHIVE_FORMAT", "parquet") == "csv":
+                with metrics.stage("archive") as stage:
+                    stage["rows_out"] = stream_query_to_s3(
+                        boto3.client('s3'), cursor, environ["BUCKET"],
+                        "historical_plants_data.csv", id_batches[-1][1])
+                for id_range in id_batches:
+                    with metrics.stage("purge"):
+                        delete_sensor_data_batch(cursor, id_range)
+                        conn.commit()
+            else:
+                run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+                for batch_number, id_range in enumerate(id_batches):
+                    with metrics.stage("archive"):
+                        paths = archive_to_parquet(cursor, f"{run_id}-{batch_number}", id_range)
+                    metrics.count("archive_files", len(paths))
+                    with metrics.stage("purge"):
+                        delete_sensor_data_batch(cursor, id_range)
+                        conn.commit()
+                    print(f"Archived and deleted sensor_data_id {id_range[0] + 1}-{id_range[1]}.")
+    finally:
+        conn.close()
+        metrics.write()
 
 
 if __name__ == "__main__":
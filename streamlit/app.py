@@ -2,81 +2,20 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 from datetime import datetime, timedelta
-import pymssql
-import os
 
-def get_connection() -> pymssql.Connection:
-    """
-    Connects to RDS database using credentials.
-    """
-    try:
-        conn = pymssql.connect(
-            server=os.getenv("DB_HOST"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME"),
-            port=int(os.getenv("DB_PORT"))
-        )
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to the database: {e}")
-        return None
+from dashboard_data import (
+    LIVE_WINDOW, get_botanist_options, get_botanists, get_readings_by_minute, get_rollups,
+    update_live_window
+)
 
-def fetch_botanists() -> pd.DataFrame:
-    """
-    Fetch all botanists for populating the dropdown filter.
-    """
-    query = """
-    SELECT DISTINCT 
-        CONCAT(TRIM(botanist_forename), ' ', TRIM(botanist_surname)) AS botanist_name
-    FROM alpha.botanist
-    """
-    conn = get_connection()
-    if conn:
-        try:
-            botanists = pd.read_sql(query, conn)
-            conn.close()
-            return botanists
-        except Exception:
-            st.error("Error fetching botanists.")
-            return pd.DataFrame()
-    else:
-        st.error("Unable to connect to the database.")
-        return pd.DataFrame()
+LIVE_REFRESH_SECONDS = 30
 
-def fetch_data_by_minute(selected_minute: datetime) -> pd.DataFrame:
-    """
-    Fetch soil moisture and temperature data for the selected minute.
-    """
-    query = f"""
-    SELECT 
-        sd.recording_taken, 
-        sd.last_watered,
-        sd.soil_moisture, 
-        sd.temperature, 
-        p.plant_id, 
-        ps.plant_name, 
-        b.botanist_forename, 
-        b.botanist_surname
-    FROM alpha.sensor_data sd
-    INNER JOIN alpha.plant p ON sd.plant_id = p.plant_id
-    INNER JOIN alpha.plant_species ps ON p.scientific_name_id = ps.scientific_name_id
-    INNER JOIN alpha.botanist b ON p.botanist_id = b.botanist_id
-    WHERE sd.recording_taken BETWEEN '{selected_minute.strftime('%Y-%m-%d %H:%M:00')}' 
-                                 AND DATEADD(SECOND, 59, '{selected_minute.strftime('%Y-%m-%d %H:%M:00')}')
-    """
-    conn = get_connection()
-    if conn:
-        try:
-            data = pd.read_sql(query, conn)
-            conn.close()
-            return data
-        except Exception as e:
-            st.error(f"Error fetching data for the selected minute: {e}")
-            return pd.DataFrame()
-    else:
-        st.error("Unable to connect to the database.")
-        return pd.DataFrame()
+HISTORY_RANGES = {
+    "Last 6 hours": ("5min", timedelta(hours=6)),
+    "Last 24 hours": ("hour", timedelta(hours=24)),
+    "Last 7 days": ("hour", timedelta(days=7)),
+    "Last 30 days": ("day", timedelta(days=30)),
+}
 
 def create_chart(data: pd.DataFrame) -> alt.Chart:
     """
@@ -110,40 +49,137 @@ def create_chart(data: pd.DataFrame) -> alt.Chart:
         height=400
     )
 
-def main():
-    st.title("Plant Monitoring by Minute")
-    st.sidebar.header("Filter Options")
+def create_history_chart(data: pd.DataFrame, measure: str, title: str) -> alt.Chart:
+    """
+    Create an Altair line chart of a measure's mean per plant over time, shading its min to max range.
+    """
+    base = alt.Chart(data).encode(
+        x=alt.X('bucket_start:T', title="Time"),
+        color=alt.Color('plant_name:N', title="Plant"),
+    )
+    band = base.mark_area(opacity=0.15).encode(
+        y=alt.Y(f'{measure}_min:Q', title=title),
+        y2=f'{measure}_max:Q',
+    )
+    line = base.mark_line().encode(
+        y=f'{measure}_mean:Q',
+        tooltip=[
+            alt.Tooltip('plant_name:N', title="Plant"),
+            alt.Tooltip('bucket_start:T', title="From"),
+            alt.Tooltip(f'{measure}_mean:Q', title="Mean", format=".1f"),
+            alt.Tooltip(f'{measure}_min:Q', title="Min", format=".1f"),
+            alt.Tooltip(f'{measure}_max:Q', title="Max", format=".1f"),
+        ]
+    )
+    return alt.layer(band, line).properties(width=800, height=300)
 
-    botanists_df = fetch_botanists()
-    if botanists_df.empty:
-        st.warning("No botanists available.")
+def show_history(botanist_id: int, selected_botanist: str) -> None:
+    """
+    Chart the selected botanist's plants over a longer range, from the pre-aggregated rollups.
+    """
+    selected_range = st.sidebar.selectbox("History Range", options=list(HISTORY_RANGES))
+    granularity, length = HISTORY_RANGES[selected_range]
+    try:
+        history = get_rollups(botanist_id, granularity,
+                              datetime.now().replace(second=0, microsecond=0) - length)
+    except Exception as e:
+        st.error(f"Error fetching history: {e}")
+        return
+
+    st.subheader(f"History for {selected_botanist}: {selected_range.lower()}")
+    if history.empty:
+        st.warning("No history available for the selected range.")
         return
+    st.altair_chart(create_history_chart(history, 'soil_moisture', "Soil Moisture (%)"),
+                    use_container_width=True)
+    st.altair_chart(create_history_chart(history, 'temperature', "Temperature (°C)"),
+                    use_container_width=True)
 
-    botanists = botanists_df['botanist_name'].tolist()
-    selected_botanist = st.sidebar.selectbox("Select Botanist", options=botanists)
+def show_readings(data: pd.DataFrame, heading: str) -> None:
+    """
+    Show a table and chart of plant readings.
+    """
+    data['botanist_name'] = data['botanist_forename'] + ' ' + data['botanist_surname']
+    table_data = data[['plant_name', 'temperature', 'soil_moisture', 'recording_taken', 'last_watered', 'botanist_name']]
 
+    st.subheader(heading)
+    st.write(table_data)
+
+    st.subheader("Soil Moisture and Temperature")
+    chart = create_chart(data)
+    st.altair_chart(chart, use_container_width=True)
+
+def show_selected_minute(botanist_id: int, selected_botanist: str) -> None:
+    """
+    Show the selected botanist's readings for a minute picked from the past 10.
+    """
     now = datetime.now()
     past_10_minutes = [(now - timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:00') for i in range(10)]
     selected_minute = st.sidebar.selectbox("Select Minute", options=past_10_minutes)
 
     selected_minute_dt = datetime.strptime(selected_minute, '%Y-%m-%d %H:%M:00')
-    data = fetch_data_by_minute(selected_minute_dt)
+    try:
+        filtered_data = get_readings_by_minute(selected_minute_dt, botanist_id)
+    except Exception as e:
+        st.error(f"Error fetching data for the selected minute: {e}")
+        return
 
-    if data.empty:
+    if filtered_data.empty:
         st.warning("No data available for the selected botanist or minute.")
         return
+    show_readings(filtered_data, f"Data for {selected_botanist} at {selected_minute}")
 
-    data['botanist_name'] = data['botanist_forename'] + ' ' + data['botanist_surname']
-    filtered_data = data[data['botanist_name'] == selected_botanist]
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def show_live_readings(botanist_id: int, selected_botanist: str) -> None:
+    """
+    Show each plant's latest reading, polling for new readings every LIVE_REFRESH_SECONDS.
 
-    table_data = filtered_data[['plant_name', 'temperature', 'soil_moisture', 'recording_taken', 'last_watered', 'botanist_name']]
+    The last LIVE_WINDOW of readings is kept in session state, so each poll only
+    fetches the readings newer than those already held.
+    """
+    if st.session_state.get('live_botanist_id') != botanist_id:
+        st.session_state['live_botanist_id'] = botanist_id
+        st.session_state['live_readings'] = None
+    try:
+        readings = update_live_window(st.session_state['live_readings'], botanist_id, datetime.now())
+    except Exception as e:
+        st.error(f"Error refreshing live data: {e}")
+        return
+    st.session_state['live_readings'] = readings
 
-    st.subheader(f"Data for {selected_botanist} at {selected_minute}")
-    st.write(table_data)
+    window_minutes = int(LIVE_WINDOW.total_seconds() // 60)
+    if readings.empty:
+        st.warning(f"No data available for the selected botanist in the last {window_minutes} minutes.")
+        return
+    latest = readings.sort_values('recording_taken').groupby('plant_id').tail(1)
+    show_readings(latest.copy(), f"Latest data for {selected_botanist}")
+    st.caption(f"{len(readings)} readings from the last {window_minutes} minutes, "
+               f"updated at {datetime.now().strftime('%H:%M:%S')}.")
 
-    st.subheader("Soil Moisture and Temperature")
-    chart = create_chart(filtered_data)
-    st.altair_chart(chart, use_container_width=True)
+def main():
+    st.title("Plant Monitoring by Minute")
+    st.sidebar.header("Filter Options")
+
+    try:
+        botanists_df = get_botanists()
+    except Exception as e:
+        st.error(f"Error fetching botanists: {e}")
+        return
+    if botanists_df.empty:
+        st.warning("No botanists available.")
+        return
+
+    botanists = get_botanist_options(botanists_df)
+    selected_botanist_id = st.sidebar.selectbox("Select Botanist", options=list(botanists),
+                                                format_func=botanists.get)
+    selected_botanist = botanists[selected_botanist_id]
+
+    if st.sidebar.toggle("Auto-refresh", help=f"Poll for new readings every {LIVE_REFRESH_SECONDS} seconds."):
+        show_live_readings(selected_botanist_id, selected_botanist)
+    else:
+        show_selected_minute(selected_botanist_id, selected_botanist)
+
+    show_history(selected_botanist_id, selected_botanist)
 
 if __name__ == "__main__":
     main()
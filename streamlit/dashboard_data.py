@@ -0,0 +1,190 @@
+"""
+Data layer for the dashboard.
+
+Queries are parameterized and filter by botanist in SQL, so only the selected
+botanist's plants are read. Results are cached with a TTL, so revisiting a
+botanist or minute is answered without going back to the database. The live
+view is not cached: it polls for readings newer than the ones it holds and
+merges them into its window with update_live_window.
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pandas as pd
+import streamlit as st
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "pipeline", "etl_process"))
+from connect_to_database import get_connection
+
+BOTANISTS_TTL = 600
+READINGS_TTL = 60
+ROLLUPS_TTL = 300
+MAX_CACHED_READINGS = 256
+LIVE_WINDOW = timedelta(minutes=10)
+LIVE_KEY = ["plant_id", "recording_taken"]
+
+BOTANISTS_QUERY = """
+SELECT
+    botanist_id,
+    CONCAT(TRIM(botanist_forename), ' ', TRIM(botanist_surname)) AS botanist_name
+FROM alpha.botanist
+ORDER BY botanist_name
+"""
+
+READINGS_SELECT = """
+SELECT
+    sd.recording_taken,
+    sd.last_watered,
+    sd.soil_moisture,
+    sd.temperature,
+    p.plant_id,
+    ps.plant_name,
+    b.botanist_forename,
+    b.botanist_surname
+FROM alpha.sensor_data sd
+INNER JOIN alpha.plant p ON sd.plant_id = p.plant_id
+INNER JOIN alpha.plant_species ps ON p.scientific_name_id = ps.scientific_name_id
+INNER JOIN alpha.botanist b ON p.botanist_id = b.botanist_id
+"""
+
+READINGS_BY_MINUTE_QUERY = READINGS_SELECT + """
+WHERE p.botanist_id = %s
+  AND sd.recording_taken >= %s
+  AND sd.recording_taken < %s
+"""
+
+READINGS_SINCE_QUERY = READINGS_SELECT + """
+WHERE p.botanist_id = %s
+  AND sd.recording_taken >= %s
+"""
+
+
+ROLLUPS_QUERY = """
+SELECT
+    r.bucket_start,
+    r.plant_id,
+    ps.plant_name,
+    r.reading_count,
+    r.soil_moisture_min,
+    r.soil_moisture_max,
+    r.soil_moisture_sum / r.reading_count AS soil_moisture_mean,
+    r.temperature_min,
+    r.temperature_max,
+    r.temperature_sum / r.reading_count AS temperature_mean
+FROM alpha.sensor_rollup r
+INNER JOIN alpha.plant p ON r.plant_id = p.plant_id
+INNER JOIN alpha.plant_species ps ON p.scientific_name_id = ps.scientific_name_id
+WHERE p.botanist_id = %s
+  AND r.granularity = %s
+  AND r.bucket_start >= %s
+ORDER BY r.bucket_start
+"""
+
+
+def run_query(query: str, params: tuple = None) -> pd.DataFrame:
+    """
+    Runs a query on a pooled connection and returns the rows as a DataFrame.
+    """
+    conn = get_connection()
+    if conn is None:
+        raise ConnectionError("Unable to connect to the database.")
+    try:
+        return pd.read_sql(query, conn, params=params)
+    finally:
+        conn.close()
+
+
+def query_botanists() -> pd.DataFrame:
+    """
+    Fetch every botanist's ID and name.
+    """
+    return run_query(BOTANISTS_QUERY)
+
+
+def query_readings_by_minute(selected_minute: datetime, botanist_id: int) -> pd.DataFrame:
+    """
+    Fetch one botanist's plant readings taken within the selected minute.
+    """
+    start = selected_minute.replace(second=0, microsecond=0)
+    return run_query(READINGS_BY_MINUTE_QUERY,
+                     (int(botanist_id), start, start + timedelta(minutes=1)))
+
+
+def query_readings_since(botanist_id: int, since: datetime) -> pd.DataFrame:
+    """
+    Fetch one botanist's plant readings taken at or after a time.
+    """
+    return run_query(READINGS_SINCE_QUERY, (int(botanist_id), since))
+
+
+def query_rollups(botanist_id: int, granularity: str, since: datetime) -> pd.DataFrame:
+    """
+    Fetch one botanist's per-plant rollups at a granularity ('5min', 'hour' or 'day') since a time.
+    """
+    return run_query(ROLLUPS_QUERY, (int(botanist_id), granularity, since))
+
+
+@st.cache_data(ttl=BOTANISTS_TTL, show_spinner=False)
+def get_botanists() -> pd.DataFrame:
+    """
+    Botanists for the dropdown filter, cached for BOTANISTS_TTL seconds.
+    """
+    return query_botanists()
+
+
+@st.cache_data(ttl=READINGS_TTL, max_entries=MAX_CACHED_READINGS, show_spinner=False)
+def get_readings_by_minute(selected_minute: datetime, botanist_id: int) -> pd.DataFrame:
+    """
+    One botanist's readings for a minute, cached for READINGS_TTL seconds.
+    """
+    return query_readings_by_minute(selected_minute, botanist_id)
+
+
+@st.cache_data(ttl=ROLLUPS_TTL, max_entries=MAX_CACHED_READINGS, show_spinner=False)
+def get_rollups(botanist_id: int, granularity: str, since: datetime) -> pd.DataFrame:
+    """
+    One botanist's rollups since a time, cached for ROLLUPS_TTL seconds.
+    """
+    return query_rollups(botanist_id, granularity, since)
+
+
+def get_botanist_options(botanists: pd.DataFrame) -> dict[int, str]:
+    """
+    Maps each botanist's ID to their name, for a selectbox keyed on the ID.
+
+    Selecting by ID keeps botanists who share a name apart.
+    """
+    return {int(botanist_id): name
+            for botanist_id, name in zip(botanists['botanist_id'], botanists['botanist_name'])}
+
+
+def get_newest_reading(window: pd.DataFrame) -> datetime:
+    """
+    The latest recording_taken held in a live window, or None if it is empty.
+    """
+    if window is None or window.empty:
+        return None
+    return pd.Timestamp(window["recording_taken"].max()).to_pydatetime()
+
+
+def update_live_window(window: pd.DataFrame, botanist_id: int, now: datetime,
+                       length: timedelta = LIVE_WINDOW) -> pd.DataFrame:
+    """
+    Brings a live window of one botanist's readings up to date, fetching only what it lacks.
+
+    An empty window loads every reading in the last length. Otherwise only the readings
+    at or after the newest one held are fetched; the newest instant is fetched again because
+    a load still committing may have added more readings at it, and the repeats are dropped.
+    Readings older than the window are then evicted.
+    """
+    window_start = now - length
+    newest = get_newest_reading(window)
+    if newest is None:
+        return query_readings_since(botanist_id, window_start)
+
+    new_readings = query_readings_since(botanist_id, newest)
+    if not new_readings.empty:
+        window = pd.concat([window, new_readings], ignore_index=True).drop_duplicates(
+            subset=LIVE_KEY, keep="last")
+    return window[window["recording_taken"] >= window_start].reset_index(drop=True)
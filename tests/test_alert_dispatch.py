@@ -0,0 +1,40 @@
+"""Testing file for the alert_dispatch.py script."""
+import time
+from unittest.mock import MagicMock, patch
+from botocore.exceptions import ClientError
+from pipeline.etl_process.alert_dispatch import (
+    TokenBucket, SESTransport, FileTransport, AlertDispatcher
+)
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_dispatch_writes_every_email_to_file_sink(tmp_path):
+    transport = FileTransport(str(tmp_path), latency=0.05)
+    dispatcher = AlertDispatcher(transport, "sender@example.com", max_workers=4, rate=1000)
+    emails = [(f"botanist{i}@example.com", "Alert", "Body") for i in range(8)]
+    start = time.monotonic()
+    assert dispatcher.dispatch(emails) == [True] * 8
+    assert time.monotonic() - start < 0.05 * 8
+    assert len(list(tmp_path.glob("*.eml"))) == 8
+
+
+@patch("pipeline.etl_process.alert_dispatch.time.sleep")
+def test_throttled_sends_are_retried(mock_sleep):
+    ses = MagicMock()
+    throttled = ClientError({"Error": {"Code": "Throttling", "Message": "Maximum sending rate exceeded."}},
+                            "SendEmail")
+    ses.send_email.side_effect = [throttled, None]
+    dispatcher = AlertDispatcher(SESTransport(ses), "sender@example.com", rate=1000)
+    assert dispatcher.send("botanist@example.com", "Alert", "Body")
+    assert ses.send_email.call_count == 2
+
+    ses.send_email.side_effect = ClientError({"Error": {"Code": "MessageRejected", "Message": ""}},
+                                             "SendEmail")
+    assert not dispatcher.send("botanist@example.com", "Alert", "Body")
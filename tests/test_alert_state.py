@@ -0,0 +1,94 @@
+"""Testing file for the alert_state.py script."""
+import pandas as pd
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from pipeline.etl_process import alert_state
+from pipeline.etl_process.alert_state import (
+    load_alert_state, save_alert_state, update_alert_state, mark_notified,
+    fetch_alert_state, store_alert_state, read_alert_state, write_alert_state
+)
+
+NOW = datetime(2024, 1, 1, 12, 0)
+
+
+def get_violations(pairs: list[tuple]) -> pd.DataFrame:
+    return pd.DataFrame(pairs, columns=["plant_id", "rule"])
+
+
+def test_new_alerts_are_due_and_open_alerts_wait_for_cooldown():
+    state = {}
+    due, _ = update_alert_state(state, get_violations([(1, "temperature")]), {1}, NOW)
+    assert due == ["1:temperature"]
+    mark_notified(state, due, NOW)
+
+    later = NOW + timedelta(hours=1)
+    due, _ = update_alert_state(state, get_violations([(1, "temperature")]), {1}, later,
+                                cooldown=timedelta(hours=6))
+    assert due == []
+    due, _ = update_alert_state(state, get_violations([(1, "temperature")]), {1},
+                                NOW + timedelta(hours=6), cooldown=timedelta(hours=6))
+    assert due == ["1:temperature"]
+
+
+def test_alerts_resolve_only_for_evaluated_plants():
+    state = {}
+    update_alert_state(state, get_violations([(1, "temperature"), (2, "temperature")]), {1, 2}, NOW)
+    due, resolved = update_alert_state(state, get_violations([]), {1}, NOW)
+    assert (due, resolved) == ([], ["1:temperature"])
+    assert state["2:temperature"]["status"] == "open"
+
+    due, _ = update_alert_state(state, get_violations([(1, "temperature")]), {1}, NOW)
+    assert due == ["1:temperature"]
+
+
+def test_save_and_load_alert_state_drops_resolved(tmp_path):
+    state_file = str(tmp_path / "alert_state.json")
+    state = {}
+    update_alert_state(state, get_violations([(1, "temperature"), (2, "soil_moisture")]), {1, 2}, NOW)
+    mark_notified(state, ["1:temperature"], NOW)
+    state["2:soil_moisture"]["status"] = "resolved"
+    save_alert_state(state, state_file)
+    assert load_alert_state(state_file) == {
+        "1:temperature": {"status": "open", "opened_at": NOW, "last_notified": NOW}}
+    assert load_alert_state(str(tmp_path / "missing.json")) == {}
+
+
+def test_fetch_alert_state_reads_open_alerts():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [(1, "temperature", NOW, None)]
+    assert fetch_alert_state(conn) == {
+        "1:temperature": {"status": "open", "opened_at": NOW, "last_notified": None}}
+
+
+def test_store_alert_state_upserts_open_and_deletes_resolved():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    state = {"1:temperature": {"status": "open", "opened_at": NOW, "last_notified": NOW},
+             "2:soil:moisture": {"status": "resolved", "opened_at": NOW, "last_notified": None}}
+    store_alert_state(conn, state)
+
+    (merge, merge_params), (delete, delete_params) = [call.args for call in cursor.execute.call_args_list]
+    assert "MERGE alpha.alert_state" in merge
+    assert merge_params == (1, "temperature", NOW, NOW)
+    assert delete.startswith("DELETE FROM alpha.alert_state")
+    assert delete_params == (2, "soil:moisture")
+    conn.commit.assert_called_once()
+
+
+def test_file_store_round_trips_without_the_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(alert_state, "get_connection", MagicMock(side_effect=AssertionError))
+    state_file = str(tmp_path / "alert_state.json")
+    state = {}
+    update_alert_state(state, get_violations([(1, "temperature")]), {1}, NOW)
+    write_alert_state(state, "file", state_file)
+    assert read_alert_state("file", state_file) == {
+        "1:temperature": {"status": "open", "opened_at": NOW, "last_notified": None}}
+
+
+def test_database_store_closes_its_connection(monkeypatch):
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value.fetchall.return_value = []
+    monkeypatch.setattr(alert_state, "get_connection", lambda: conn)
+    assert read_alert_state("database") == {}
+    conn.close.assert_called_once()
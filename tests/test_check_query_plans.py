@@ -0,0 +1,49 @@
+"""Testing file for the check_query_plans.py script."""
+from unittest.mock import MagicMock
+from pipeline.check_query_plans import get_table_accesses, get_scans, check_query_plans
+
+PLAN = """<ShowPlanXML xmlns="http://schemas.microsoft.com/sqlserver/2004/07/showplan">
+<BatchSequence><Batch><Statements><StmtSimple><QueryPlan>
+<RelOp PhysicalOp="Nested Loops">
+  <NestedLoops>
+    <RelOp PhysicalOp="Index Seek">
+      <IndexScan><Object Database="[plants]" Schema="[alpha]" Table="[sensor_data]"
+                         Index="[ix_sensor_data_recording_taken]"/></IndexScan>
+    </RelOp>
+    <RelOp PhysicalOp="Clustered Index Scan">
+      <IndexScan><Object Database="[plants]" Schema="[alpha]" Table="[plant]"
+                         Index="[PK__plant]"/></IndexScan>
+    </RelOp>
+  </NestedLoops>
+</RelOp>
+</QueryPlan></StmtSimple></Statements></Batch></BatchSequence></ShowPlanXML>"""
+
+
+def test_get_table_accesses():
+    assert get_table_accesses(PLAN) == [
+        ("Index Seek", "sensor_data", "ix_sensor_data_recording_taken"),
+        ("Clustered Index Scan", "plant", "PK__plant"),
+    ]
+
+
+def test_get_scans_only_checks_given_tables():
+    accesses = get_table_accesses(PLAN)
+    assert get_scans(accesses, {"sensor_data"}) == []
+    assert get_scans(accesses, {"plant"}) == [("Clustered Index Scan", "plant", "PK__plant")]
+
+
+def test_check_query_plans_reports_scans():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchone.return_value = (PLAN,)
+    queries = {
+        "seeks": ("SELECT 1;", lambda now: (), {"sensor_data"}),
+        "scans": ("SELECT 2;", lambda now: (), {"plant"}),
+    }
+
+    failures = check_query_plans(conn, queries)
+
+    assert list(failures) == ["scans"]
+    statements = [call.args[0] for call in cursor.execute.call_args_list]
+    assert statements.count("SET SHOWPLAN_XML ON;") == 2
+    assert statements.count("SET SHOWPLAN_XML OFF;") == 2
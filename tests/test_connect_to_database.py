@@ -0,0 +1,48 @@
+"""Testing file for the connect_to_database.py script."""
+import pytest
+from unittest.mock import MagicMock
+from pipeline.etl_process.connect_to_database import ConnectionPool, PooledConnection, get_chunks
+
+
+def test_pool_reuses_released_connection():
+    connect = MagicMock(side_effect=lambda: MagicMock())
+    pool = ConnectionPool(connect, max_size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert connect.call_count == 1
+
+
+def test_pool_times_out_when_full():
+    pool = ConnectionPool(MagicMock(side_effect=lambda: MagicMock()), max_size=1)
+    pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.01)
+
+
+def test_pool_evicts_idle_and_unhealthy_connections():
+    connect = MagicMock(side_effect=lambda: MagicMock())
+    pool = ConnectionPool(connect, max_size=2, idle_timeout=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.idle == []
+    conn.close.assert_called_once()
+
+    pool = ConnectionPool(connect, max_size=2, health_check_after=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.cursor.return_value.execute.side_effect = Exception("connection reset")
+    assert pool.acquire() is not conn
+    assert pool.size == 1
+
+
+def test_pooled_connection_close_returns_to_pool():
+    pool = ConnectionPool(MagicMock(side_effect=lambda: MagicMock()), max_size=1)
+    conn = PooledConnection(pool, pool.acquire())
+    conn.commit()
+    conn.close()
+    assert len(pool.idle) == 1
+
+
+def test_get_chunks_caps_batch_size():
+    assert [len(chunk) for chunk in get_chunks(list(range(10)), 5, 4)] == [4, 4, 2]
@@ -0,0 +1,70 @@
+"""Testing file for the create_schemas.py script."""
+import pytest
+from unittest.mock import MagicMock
+from pipeline.create_schemas import (
+    get_checksum, get_migrations, get_pending_migrations, run_migrations
+)
+
+
+def write_migrations(directory, migrations):
+    for file_name, sql in migrations.items():
+        (directory / file_name).write_text(sql)
+
+
+def create_connection(applied):
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = list(applied.items())
+    return conn, cursor
+
+
+def test_get_migrations_orders_by_version(tmp_path):
+    write_migrations(tmp_path, {"0010_later.sql": "SELECT 10;", "0002_first.sql": "SELECT 2;",
+                                "notes.txt": "ignored"})
+    migrations = get_migrations(str(tmp_path))
+    assert [(m["version"], m["name"]) for m in migrations] == [(2, "first"), (10, "later")]
+    assert migrations[0]["checksum"] == get_checksum("SELECT 2;")
+
+
+def test_get_migrations_rejects_duplicate_versions(tmp_path):
+    write_migrations(tmp_path, {"0001_a.sql": "SELECT 1;", "001_b.sql": "SELECT 1;"})
+    with pytest.raises(ValueError):
+        get_migrations(str(tmp_path))
+
+
+def test_get_checksum_ignores_line_endings():
+    assert get_checksum("SELECT 1;\r\nSELECT 2;") == get_checksum("SELECT 1;\nSELECT 2;")
+
+
+def test_get_pending_migrations_rejects_edited_migrations(tmp_path):
+    write_migrations(tmp_path, {"0001_initial.sql": "SELECT 1;"})
+    with pytest.raises(ValueError):
+        get_pending_migrations(get_migrations(str(tmp_path)), {1: get_checksum("SELECT 0;")})
+
+
+def test_run_migrations_applies_only_pending(tmp_path):
+    write_migrations(tmp_path, {"0001_initial.sql": "SELECT 1;", "0002_indexes.sql": "SELECT 2;"})
+    conn, cursor = create_connection({1: get_checksum("SELECT 1;")})
+
+    assert run_migrations(conn, str(tmp_path)) == [2]
+    statements = [call.args[0] for call in cursor.execute.call_args_list]
+    assert "SELECT 2;" in statements
+    assert "SELECT 1;" not in statements
+    recorded = cursor.execute.call_args_list[-1].args
+    assert "INSERT INTO alpha.schema_migrations" in recorded[0]
+    assert recorded[1][:2] == (2, "indexes")
+
+
+def test_run_migrations_rolls_back_a_failed_migration(tmp_path):
+    write_migrations(tmp_path, {"0001_initial.sql": "SELECT 1;"})
+    conn, cursor = create_connection({})
+    cursor.execute.side_effect = [None, None, Exception("syntax error")]
+
+    with pytest.raises(Exception):
+        run_migrations(conn, str(tmp_path))
+    conn.rollback.assert_called_once()
+
+
+def test_repo_migrations_are_numbered():
+    versions = [migration["version"] for migration in get_migrations()]
+    assert versions == list(range(1, len(versions) + 1))
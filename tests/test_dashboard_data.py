@@ -0,0 +1,113 @@
+"""Testing file for the dashboard_data.py script."""
+import importlib.util
+import os
+import pandas as pd
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# The dashboard's folder is named streamlit, like the package it imports, so load the module by path.
+DASHBOARD_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                   "..", "streamlit", "dashboard_data.py")
+spec = importlib.util.spec_from_file_location("dashboard_data", DASHBOARD_DATA_PATH)
+dashboard_data = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(dashboard_data)
+
+NOW = datetime(2024, 1, 1, 10, 0)
+
+
+def readings(rows: list[tuple]) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["plant_id", "recording_taken", "soil_moisture"])
+
+
+@patch.object(dashboard_data, "run_query")
+def test_queries_pass_botanist_as_a_parameter(mock_run_query):
+    minute = datetime(2024, 1, 1, 9, 30, 45)
+    dashboard_data.query_readings_by_minute(minute, "4242")
+    dashboard_data.query_readings_since(4242, NOW)
+    dashboard_data.query_rollups(4242, "hour", NOW)
+
+    calls = [call.args for call in mock_run_query.call_args_list]
+    assert [params for _, params in calls] == [
+        (4242, datetime(2024, 1, 1, 9, 30), datetime(2024, 1, 1, 9, 31)),
+        (4242, NOW),
+        (4242, "hour", NOW),
+    ]
+    for query, _ in calls:
+        assert "p.botanist_id = %s" in query
+        assert "4242" not in query
+
+
+@patch.object(dashboard_data.pd, "read_sql")
+@patch.object(dashboard_data, "get_connection")
+def test_run_query_sends_params_to_the_driver(mock_get_connection, mock_read_sql):
+    conn = mock_get_connection.return_value
+    result = dashboard_data.run_query(dashboard_data.READINGS_SINCE_QUERY, (7, NOW))
+    mock_read_sql.assert_called_once_with(dashboard_data.READINGS_SINCE_QUERY, conn, params=(7, NOW))
+    assert result is mock_read_sql.return_value
+    conn.close.assert_called_once()
+
+
+def test_get_botanist_options_keys_on_id():
+    botanists = pd.DataFrame({"botanist_id": [3, 5], "botanist_name": ["Ann Lee", "Ann Lee"]})
+    options = dashboard_data.get_botanist_options(botanists)
+    assert options == {3: "Ann Lee", 5: "Ann Lee"}
+    assert all(type(botanist_id) is int for botanist_id in options)
+
+
+@patch.object(dashboard_data, "run_query")
+def test_cached_functions_return_query_results(mock_run_query):
+    for cached in [dashboard_data.get_botanists, dashboard_data.get_readings_by_minute,
+                   dashboard_data.get_rollups]:
+        cached.clear()
+    results = {dashboard_data.BOTANISTS_QUERY: pd.DataFrame({"botanist_id": [1]}),
+               dashboard_data.READINGS_BY_MINUTE_QUERY: readings([(1, NOW, 40.0)]),
+               dashboard_data.ROLLUPS_QUERY: pd.DataFrame({"reading_count": [3]})}
+    mock_run_query.side_effect = lambda query, params=None: results[query]
+
+    for _ in range(2):
+        pd.testing.assert_frame_equal(dashboard_data.get_botanists(),
+                                      results[dashboard_data.BOTANISTS_QUERY])
+        pd.testing.assert_frame_equal(dashboard_data.get_readings_by_minute(NOW, 7),
+                                      results[dashboard_data.READINGS_BY_MINUTE_QUERY])
+        pd.testing.assert_frame_equal(dashboard_data.get_rollups(7, "day", NOW),
+                                      results[dashboard_data.ROLLUPS_QUERY])
+    assert mock_run_query.call_count == 3
+
+
+@patch.object(dashboard_data, "query_readings_since")
+def test_update_live_window_first_load(mock_query):
+    loaded = readings([(1, NOW - timedelta(minutes=5), 40.0)])
+    mock_query.return_value = loaded
+
+    window = dashboard_data.update_live_window(None, 7, NOW)
+    mock_query.assert_called_once_with(7, NOW - dashboard_data.LIVE_WINDOW)
+    assert window is loaded
+
+    mock_query.reset_mock()
+    dashboard_data.update_live_window(readings([]), 7, NOW)
+    mock_query.assert_called_once_with(7, NOW - dashboard_data.LIVE_WINDOW)
+
+
+@patch.object(dashboard_data, "query_readings_since")
+def test_update_live_window_merges_from_newest_reading(mock_query):
+    newest = NOW - timedelta(minutes=1)
+    window = readings([(1, NOW - timedelta(minutes=2), 40.0), (1, newest, 41.0)])
+    mock_query.return_value = readings([(1, newest, 41.0), (2, newest, 55.0),
+                                        (1, NOW, 42.0)])
+
+    window = dashboard_data.update_live_window(window, 7, NOW)
+    mock_query.assert_called_once_with(7, newest)
+    assert list(zip(window["plant_id"], window["recording_taken"])) == [
+        (1, NOW - timedelta(minutes=2)), (1, newest), (2, newest), (1, NOW)]
+
+
+@patch.object(dashboard_data, "query_readings_since")
+def test_update_live_window_evicts_readings_older_than_window(mock_query):
+    window_start = NOW - timedelta(minutes=10)
+    window = readings([(1, window_start - timedelta(seconds=1), 40.0),
+                       (1, window_start, 41.0), (1, NOW - timedelta(minutes=1), 42.0)])
+    mock_query.return_value = readings([])
+
+    window = dashboard_data.update_live_window(window, 7, NOW)
+    assert list(window["recording_taken"]) == [window_start, NOW - timedelta(minutes=1)]
+    assert list(window.index) == [0, 1]
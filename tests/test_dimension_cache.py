@@ -0,0 +1,84 @@
+"""Testing file for the dimension_cache.py script."""
+import json
+import pandas as pd
+from unittest.mock import MagicMock
+from pipeline.etl_process.dimension_cache import (
+    warm_dimension_cache, load_dimension_cache, save_dimension_cache, invalidate_dimension_cache,
+    fetch_dimension_cache, store_dimension_cache, get_dimension_cache
+)
+from pipeline.etl_process.invariable_load import load_plant_species, load_plants
+
+
+def test_warm_dimension_cache_one_query_per_table():
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [[('Rosa', 1)], [('India', 2)], [('a@b.com', 3)], [(7, 7)]]
+    cache = warm_dimension_cache(cursor)
+    assert cursor.execute.call_count == 4
+    assert cache == {'plant_species': {'Rosa': 1}, 'country': {'India': 2},
+                     'botanist': {'a@b.com': 3}, 'plant': {7: 7}}
+
+
+def test_save_and_load_dimension_cache(tmp_path):
+    cache_file = str(tmp_path / "cache" / "dimension_cache.json")
+    assert load_dimension_cache(cache_file) is None
+    cache = {'plant_species': {'Rosa': 1}, 'country': {}, 'botanist': {}, 'plant': {7: 7}}
+    save_dimension_cache(cache, cache_file)
+    assert load_dimension_cache(cache_file) == cache
+    invalidate_dimension_cache(cache_file, store="database")
+    assert load_dimension_cache(cache_file) == cache
+    invalidate_dimension_cache(cache_file, store="file")
+    assert load_dimension_cache(cache_file) is None
+
+
+def test_store_and_fetch_dimension_cache():
+    cache = {'plant_species': {'Rosa': 1}, 'country': {'India': 2}, 'botanist': {}, 'plant': {7: 7}}
+    cursor = MagicMock()
+    store_dimension_cache(cursor, cache)
+    query, params = cursor.execute.call_args.args
+    assert query.strip().startswith("MERGE alpha.dimension_cache")
+    stored = dict(zip(params[::2], params[1::2]))
+
+    cursor = MagicMock()
+    cursor.fetchall.return_value = list(stored.items())
+    assert fetch_dimension_cache(cursor) == cache
+    cursor.fetchall.return_value = [('plant', json.dumps({'7': 7}))]
+    assert fetch_dimension_cache(cursor) is None
+
+
+def test_get_dimension_cache_uses_database_snapshot():
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [('plant_species', '{"Rosa": 1}'), ('country', '{}'),
+                                    ('botanist', '{}'), ('plant', '{"7": 7}')]
+    cache = get_dimension_cache(cursor, store="database")
+    assert cache['plant'] == {7: 7}
+    assert cursor.execute.call_count == 1
+
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = [[], [('Rosa', 1)], [], [], [(7, 7)]]
+    cache = get_dimension_cache(cursor, store="database")
+    assert cache['plant_species'] == {'Rosa': 1}
+    assert cursor.execute.call_count == 5
+
+
+def test_cached_keys_skip_the_database():
+    cursor = MagicMock()
+    data = pd.DataFrame({
+        'plant_id': [7, 8],
+        'scientific_name': ['Rosa', 'Tulipa'],
+        'plant_name': ['Rose', 'Tulip'],
+        'country_name': ['India', 'India'],
+        'botanist_email': ['a@b.com', 'a@b.com'],
+    })
+    species_ids = load_plant_species(cursor, data, {'Rosa': 1, 'Tulipa': 2})
+    plant_ids = load_plants(cursor, data, species_ids, {'India': 2}, {'a@b.com': 3}, {7: 7, 8: 8})
+    cursor.execute.assert_not_called()
+    assert plant_ids == {7: 7, 8: 8}
+
+
+def test_cache_miss_only_loads_new_keys():
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [('Tulipa', 2)]
+    data = pd.DataFrame({'scientific_name': ['Rosa', 'Tulipa'], 'plant_name': ['Rose', 'Tulip']})
+    species_ids = load_plant_species(cursor, data, {'Rosa': 1})
+    assert species_ids == {'Rosa': 1, 'Tulipa': 2}
+    assert cursor.execute.call_args_list[0][0][1] == ('Tulipa', 'Tulip')
@@ -1,7 +1,8 @@
 import pytest
 import os
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 from pipeline.etl_process.email_sender import get_config, read_csv, check_and_alert_unhealthy_plants
+from pipeline.etl_process.alert_dispatch import AlertDispatcher, SESTransport
 
 
 @patch.dict('os.environ', {}, clear=True)
@@ -37,3 +38,37 @@ def test_read_csv(tmp_path):
     assert data[0]['plant_name'] == 'Rose'
     assert data[1]['botanist_surname'] == 'Smith'
     assert float(data[0]['soil_moisture']) == 60
+
+
+def get_plant(plant_id: str, botanist_email: str, soil_moisture: str, temperature: str) -> dict:
+    return {'plant_id': plant_id, 'plant_name': f'Plant {plant_id}', 'scientific_name': 'Rosa',
+            'country_name': 'UK', 'last_watered': '2024-01-01', 'botanist_email': botanist_email,
+            'botanist_forename': 'Jane', 'botanist_surname': 'Doe',
+            'soil_moisture': soil_moisture, 'temperature': temperature}
+
+
+def test_check_and_alert_unhealthy_plants_sends_one_digest_per_botanist():
+    plants = [
+        get_plant('1', 'a@example.com', '60', '20'),
+        get_plant('2', 'a@example.com', '40', '10'),
+        get_plant('3', 'b@example.com', '40', '25'),
+        get_plant('4', 'b@example.com', '60', '10'),
+    ]
+    config = {'ses_sender_email': 'sender@example.com', 'soil_moisture_threshold': 50,
+              'temperature_threshold': 15}
+    ses, state = MagicMock(), {}
+    dispatcher = AlertDispatcher(SESTransport(ses), config['ses_sender_email'], max_workers=1)
+    violations = check_and_alert_unhealthy_plants(plants, dispatcher, config, state=state)
+    assert list(violations['plant_id']) == [1, 2, 4, 4]
+    assert [call.kwargs['Destination']['ToAddresses'] for call in ses.send_email.call_args_list] == [
+        ['a@example.com'], ['b@example.com']]
+    assert all(alert['last_notified'] is not None for alert in state.values())
+
+    ses.reset_mock()
+    check_and_alert_unhealthy_plants(plants, dispatcher, config, state=state)
+    ses.send_email.assert_not_called()
+
+    plants[0]['soil_moisture'] = '40'
+    check_and_alert_unhealthy_plants(plants, dispatcher, config, state=state)
+    assert ses.send_email.call_count == 1
+    assert 'healthy again' in ses.send_email.call_args.kwargs['Message']['Body']['Text']['Data']
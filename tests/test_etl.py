@@ -0,0 +1,34 @@
+"""Testing file for the etl.py script."""
+import time
+import pytest
+from pipeline.etl_process.etl import run_stages, start_run, get_run
+
+
+def test_run_stages_runs_independent_stages_in_parallel():
+    order = []
+
+    def stage(name, seconds, result=None):
+        def run(*args):
+            time.sleep(seconds)
+            order.append(name)
+            return result if result is not None else args
+        return run
+
+    start_run("test")
+    start = time.perf_counter()
+    results = run_stages({
+        "load_dimensions": (stage("load_dimensions", 0.1, "ids"), []),
+        "alerts": (stage("alerts", 0.3, "sent"), []),
+        "load_sensor_data": (stage("load_sensor_data", 0.1), ["load_dimensions"]),
+    }, rows_in={"alerts": 3})
+    assert time.perf_counter() - start < 0.45
+    assert order == ["load_dimensions", "load_sensor_data", "alerts"]
+    assert results["load_sensor_data"] == ("ids",)
+    stages = get_run().stages
+    assert {"load_dimensions", "alerts", "load_sensor_data"} <= set(stages)
+    assert stages["alerts"]["rows_in"] == 3
+
+
+def test_run_stages_rejects_unmet_dependencies():
+    with pytest.raises(ValueError):
+        run_stages({"load_sensor_data": (lambda _: None, ["missing"])})
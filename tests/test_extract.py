@@ -1,6 +1,14 @@
 import pytest
 import os
-from pipeline.etl_process.extract import fetch_plant_data, get_all_keys, fetch_all_plants, export_to_csv
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+import requests
+from pipeline.etl_process.extract import (
+    fetch_plant_data, get_all_keys, fetch_all_plants, export_to_csv,
+    CircuitBreaker, CircuitOpenError, RetryBudget, BREAKER_THRESHOLD,
+    discover_plants, fetch_known_plants, load_known_plant_ids, save_known_plant_ids,
+    fetch_known_plant_ids, store_known_plant_ids
+)
 
 
 def test_plants_fetch_data():
@@ -35,3 +43,182 @@ def test_export_to_csv(tmp_path):
         content = f.read()
         assert "plant_id,plant_name" in content, "CSV headers are incorrect."
         assert len(content.splitlines()) > 1, "CSV content is missing."
+
+
+@patch("pipeline.etl_process.extract.get_session")
+def test_fetch_all_plants_concurrent_keeps_id_order(mock_get_session):
+    def fake_get(url, timeout):
+        plant_id = int(url.rsplit("/", 1)[-1])
+        response = MagicMock()
+        response.status_code = 404 if plant_id == 3 else 200
+        response.json.return_value = {"plant_id": plant_id, "name": f"Plant {plant_id}"}
+        return response
+
+    session = MagicMock()
+    session.get.side_effect = fake_get
+    mock_get_session.return_value.__enter__.return_value = session
+
+    result = fetch_all_plants(start_id=1, end_id=6, max_workers=4, timeout=2)
+    assert [plant["plant_id"] for plant in result] == [1, 2, 4, 5, 6]
+    assert result[0]["plant_name"] == "Plant 1"
+    session.get.assert_any_call("https://data-eng-plants-api.herokuapp.com/plants/1", timeout=2)
+
+
+def make_response(status_code, payload=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = payload or {}
+    return response
+
+
+@patch("pipeline.etl_process.extract.time.sleep")
+def test_fetch_plant_data_retries_server_errors(mock_sleep):
+    session = MagicMock()
+    session.get.side_effect = [
+        make_response(500),
+        requests.Timeout("timed out"),
+        make_response(200, {"plant_id": 7, "name": "Fern"}),
+    ]
+    result = fetch_plant_data(7, session, max_retries=3, budget=RetryBudget(5))
+    assert result["plant_name"] == "Fern"
+    assert session.get.call_count == 3
+    assert mock_sleep.call_count == 2
+
+
+@patch("pipeline.etl_process.extract.time.sleep")
+def test_fetch_plant_data_does_not_retry_missing_plant(mock_sleep):
+    session = MagicMock()
+    session.get.return_value = make_response(404)
+    assert fetch_plant_data(51, session, max_retries=3) is None
+    assert session.get.call_count == 1
+    mock_sleep.assert_not_called()
+
+
+@patch("pipeline.etl_process.extract.time.sleep")
+def test_fetch_plant_data_stops_when_budget_spent(mock_sleep):
+    session = MagicMock()
+    session.get.return_value = make_response(503)
+    budget = RetryBudget(1)
+    assert fetch_plant_data(1, session, max_retries=3, budget=budget) is None
+    assert session.get.call_count == 2
+    assert budget.remaining == 0
+
+
+def test_circuit_breaker_opens_and_half_opens():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.is_open
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert not breaker.is_open
+
+
+@patch("pipeline.etl_process.extract.get_session")
+def test_fetch_all_plants_fails_fast_when_api_down(mock_get_session):
+    session = MagicMock()
+    session.get.return_value = make_response(503)
+    mock_get_session.return_value.__enter__.return_value = session
+
+    with pytest.raises(CircuitOpenError):
+        fetch_all_plants(start_id=1, end_id=50, max_workers=1, max_retries=0)
+    assert session.get.call_count == BREAKER_THRESHOLD
+
+
+def live_plant_session(live_ids, failing_ids=()):
+    def fake_get(url, timeout):
+        plant_id = int(url.rsplit("/", 1)[-1])
+        if plant_id in failing_ids:
+            return make_response(503)
+        if plant_id in live_ids:
+            return make_response(200, {"plant_id": plant_id, "name": f"Plant {plant_id}"})
+        return make_response(404)
+
+    session = MagicMock()
+    session.get.side_effect = fake_get
+    return session
+
+
+@patch("pipeline.etl_process.extract.get_session")
+def test_discover_plants_probes_past_gaps(mock_get_session):
+    mock_get_session.return_value.__enter__.return_value = live_plant_session({1, 2, 5, 12, 60})
+    result = discover_plants(start_id=1, miss_limit=10, max_workers=2)
+    assert [plant["plant_id"] for plant in result] == [1, 2, 5, 12]
+
+
+@patch("pipeline.etl_process.extract.get_session")
+def test_discover_plants_does_not_count_failures_as_misses(mock_get_session):
+    mock_get_session.return_value.__enter__.return_value = live_plant_session(
+        {1, 12}, failing_ids=set(range(2, 8)))
+    failed_ids = set()
+    result = discover_plants(start_id=1, miss_limit=5, max_workers=2, max_retries=0,
+                             failed_ids=failed_ids)
+    assert [plant["plant_id"] for plant in result] == [1, 12]
+    assert failed_ids == set(range(2, 8))
+
+
+@patch("pipeline.etl_process.extract.get_session")
+def test_fetch_known_plants_uses_cache_until_rescan(mock_get_session, tmp_path):
+    state_file = str(tmp_path / "known_plant_ids.json")
+    session = live_plant_session({1, 3, 55})
+    mock_get_session.return_value.__enter__.return_value = session
+
+    save_known_plant_ids([1, 3], datetime.now(), state_file)
+    result = fetch_known_plants(state_file=state_file, max_workers=2, store="file")
+    assert [plant["plant_id"] for plant in result] == [1, 3]
+    assert session.get.call_count == 2
+
+    save_known_plant_ids([1, 3], datetime.now() - timedelta(hours=2), state_file)
+    result = fetch_known_plants(state_file=state_file, miss_limit=60, max_workers=4,
+                                store="file")
+    assert [plant["plant_id"] for plant in result] == [1, 3, 55]
+    assert load_known_plant_ids(state_file)["plant_ids"] == [1, 3, 55]
+
+
+@patch("pipeline.etl_process.extract.get_session")
+def test_fetch_known_plants_keeps_failed_plants(mock_get_session, tmp_path):
+    state_file = str(tmp_path / "known_plant_ids.json")
+    mock_get_session.return_value.__enter__.return_value = live_plant_session(
+        {1, 3}, failing_ids={2})
+
+    result = fetch_known_plants(state_file=state_file, miss_limit=10, max_workers=2,
+                                max_retries=0, store="file")
+    assert [plant["plant_id"] for plant in result] == [1, 3]
+    assert load_known_plant_ids(state_file)["plant_ids"] == [1, 2, 3]
+
+
+def test_fetch_known_plant_ids():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [(3, datetime(2024, 1, 1, 9)), (1, datetime(2024, 1, 1, 10))]
+    assert fetch_known_plant_ids(conn) == {"plant_ids": [1, 3],
+                                           "last_scan": datetime(2024, 1, 1, 10)}
+
+    cursor.fetchall.return_value = []
+    assert fetch_known_plant_ids(conn) is None
+
+
+def test_store_known_plant_ids_replaces_the_set():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    scanned = datetime(2024, 1, 1, 10)
+    store_known_plant_ids(conn, {3, 1}, scanned)
+
+    assert cursor.execute.call_args_list[0].args[0] == "DELETE FROM alpha.known_plant;"
+    query, params = cursor.execute.call_args_list[1].args
+    assert query.startswith("INSERT INTO alpha.known_plant")
+    assert params == (1, scanned, 3, scanned)
+    conn.commit.assert_called_once()
+
+
+@patch("pipeline.etl_process.extract.get_connection")
+def test_fetch_known_plants_reads_the_database_by_default(mock_get_connection):
+    mock_get_connection.return_value = None
+    with pytest.raises(ConnectionError):
+        fetch_known_plants()
+
+
+def test_load_known_plant_ids_missing_file(tmp_path):
+    assert load_known_plant_ids(str(tmp_path / "missing.json")) is None
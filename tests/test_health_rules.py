@@ -0,0 +1,57 @@
+"""Testing file for the health_rules.py script."""
+import pandas as pd
+from pipeline.etl_process.health_rules import evaluate_health_rules, get_default_rules
+
+READINGS = pd.DataFrame({
+    'plant_id': ['1', '2', '3', '4'],
+    'scientific_name': ['Rosa', 'Rosa', 'Cactaceae', 'Tulipa'],
+    'soil_moisture': ['60', '40', '10', 'not a number'],
+    'temperature': ['20', '10', '30', '20'],
+    'recording_taken': ['2024-01-02 10:00:00'] * 4,
+    'last_watered': ['2024-01-02 08:00:00', '2024-01-01 08:00:00',
+                     '2024-01-02 08:00:00', '2024-01-02 08:00:00'],
+})
+
+
+def test_default_rules_match_thresholds():
+    rules = get_default_rules({'soil_moisture_threshold': 50, 'temperature_threshold': 15})
+    violations = evaluate_health_rules(READINGS, rules)
+    assert list(violations['plant_id']) == [1, 2]
+    assert list(violations['rule']) == ['soil_moisture', 'temperature']
+    assert list(violations['limit']) == [50, 15]
+
+
+def test_species_and_plant_rules_override_global_rules():
+    rules = [
+        {'rule': 'moisture', 'type': 'range', 'column': 'soil_moisture', 'min': 20, 'max': 50},
+        {'rule': 'moisture', 'type': 'range', 'column': 'soil_moisture',
+         'scientific_name': 'Cactaceae', 'min': 5},
+        {'rule': 'moisture', 'type': 'range', 'column': 'soil_moisture', 'plant_id': 1, 'max': 70},
+    ]
+    assert evaluate_health_rules(READINGS, rules).empty
+
+
+def test_rate_and_watering_rules():
+    rules = [
+        {'rule': 'temperature_jump', 'type': 'rate', 'column': 'temperature', 'max_change': 5},
+        {'rule': 'thirsty', 'type': 'watering', 'max_hours': 24},
+    ]
+    previous = pd.DataFrame({'plant_id': [1, 3], 'soil_moisture': [60, 10],
+                             'temperature': [19.0, 20.0]})
+    violations = evaluate_health_rules(READINGS, rules, previous)
+    assert violations[['plant_id', 'rule']].values.tolist() == [[2, 'thirsty'], [3, 'temperature_jump']]
+    assert violations.loc[1, 'value'] == 26
+
+
+def test_rate_rule_ignores_readings_already_loaded():
+    rules = [{'rule': 'temperature_jump', 'type': 'rate', 'column': 'temperature', 'max_change': 5}]
+    previous = pd.DataFrame({
+        'plant_id': [1, 1, 3],
+        'recording_taken': pd.to_datetime(['2024-01-02 10:00:00', '2024-01-02 09:59:00',
+                                           '2024-01-02 09:59:00']),
+        'soil_moisture': [60, 60, 10],
+        'temperature': [20.0, 10.0, 29.0],
+    })
+    violations = evaluate_health_rules(READINGS, rules, previous)
+    assert list(violations['plant_id']) == [1]
+    assert violations.loc[0, 'value'] == 10
@@ -1,7 +1,7 @@
 import pandas as pd
 import pytest
 from unittest.mock import MagicMock
-from pipeline.etl_process.invariable_load import load_plant_species, load_countries, load_botanists, load_plants
+from pipeline.etl_process.invariable_load import load_plant_species, load_countries, load_botanists, load_plants, get_chunks
 
 
 @pytest.fixture
@@ -37,3 +37,30 @@ def test_load_countries(mock_cursor, mock_data):
 def test_load_botanists(mock_cursor, mock_data):
     load_botanists(mock_cursor, mock_data)
     assert mock_cursor.execute.call_count == 2
+
+
+def test_load_plant_species_returns_surrogate_keys(mock_cursor, mock_data):
+    mock_cursor.fetchall.return_value = [('Plantus exampleus', 1), ('Plantus exampleuss', 2)]
+    species_ids = load_plant_species(mock_cursor, mock_data)
+    assert species_ids == {'Plantus exampleus': 1, 'Plantus exampleuss': 2}
+    insert_query, insert_params = mock_cursor.execute.call_args_list[0][0]
+    assert "WHERE NOT EXISTS" in insert_query
+    assert insert_params == ('Plantus exampleus', 'Example Plant', 'Plantus exampleuss', 'Example Plantt')
+
+
+def test_load_plants_single_insert(mock_cursor, mock_data):
+    mock_data['plant_id'] = [1, 2]
+    load_plants(
+        mock_cursor, mock_data,
+        {'Plantus exampleus': 10, 'Plantus exampleuss': 11},
+        {'Exampleland': 20},
+        {'example@botany.com': 30, 'another@botany.com': 31}
+    )
+    assert mock_cursor.execute.call_count == 1
+    assert mock_cursor.execute.call_args[0][1] == (1, 10, 20, 30)
+
+
+def test_get_chunks_respects_parameter_limit():
+    rows = [(i, i) for i in range(2500)]
+    chunks = get_chunks(rows, 2)
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
@@ -3,7 +3,12 @@ import pytest
 import pandas as pd
 from datetime import datetime
 from io import StringIO
-from pipeline.etl_process.load_sensor_data import clean_and_prepare_sensor_data, filter_valid_sensor_data
+from unittest.mock import MagicMock
+from pipeline.etl_process.connect_to_database import PooledConnection
+from pipeline.etl_process.load_sensor_data import (
+    clean_and_prepare_sensor_data, filter_valid_sensor_data, prepare_sensor_data, insert_sensor_data,
+    fetch_loaded_keys, drop_loaded_readings
+)
 
 CSV_CONTENT = """
 plant_id,recording_taken,soil_moisture,temperature,last_watered
@@ -33,3 +38,82 @@ def test_filter_valid_sensor_data():
     filtered_df = filter_valid_sensor_data(df, valid_plant_ids)
     assert len(filtered_df) == 2
     assert set(filtered_df["plant_id"]) == {1, 3}
+
+
+def test_insert_sensor_data_multi_row_chunks():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchone.side_effect = [(2,), (1,), (1,)]
+    df = prepare_sensor_data(create_sample_dataframe()).iloc[[0] * 5]
+    insert_sensor_data(conn, df, batch_size=2, method="values")
+    assert cursor.execute.call_count == 3
+    assert conn.commit.call_count == 3
+    query, params = cursor.execute.call_args_list[0][0]
+    assert query.count("(%s, %s, %s, %s, %s)") == 2
+    assert len(params) == 10
+
+
+def test_insert_sensor_data_rolls_up_only_inserted_rows_with_each_chunk():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchone.return_value = (2,)
+    df = prepare_sensor_data(create_sample_dataframe()).iloc[[0] * 2]
+    insert_sensor_data(conn, df, batch_size=2, method="values")
+    query = cursor.execute.call_args[0][0]
+    assert "OUTPUT inserted.plant_id" in query
+    assert query.index("INSERT INTO alpha.sensor_data") < query.index("MERGE alpha.sensor_rollup")
+    assert "FROM @inserted" in query
+    assert query.index("INSERT INTO alpha.sensor_data") < query.index("MERGE alpha.plant_watermark")
+    conn.commit.assert_called_once()
+
+
+def test_insert_sensor_data_bulk_copy_stages_each_chunk():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchone.return_value = (2,)
+    df = prepare_sensor_data(create_sample_dataframe()).iloc[[0] * 4]
+    insert_sensor_data(conn, df, batch_size=2, method="bulk_copy")
+    assert [call.args[0] for call in conn.bulk_copy.call_args_list] == ["#sensor_data_batch"] * 2
+    assert conn.commit.call_count == 2
+    assert "FROM #sensor_data_batch" in cursor.execute.call_args[0][0]
+
+
+def test_insert_sensor_data_falls_back_to_values_without_driver_bulk_copy():
+    driver = MagicMock(spec=["cursor", "commit", "rollback"])
+    cursor = driver.cursor.return_value
+    cursor.fetchone.return_value = (2,)
+    conn = PooledConnection(MagicMock(), driver)
+    assert not conn.supports_bulk_copy
+    df = prepare_sensor_data(create_sample_dataframe()).iloc[[0] * 4]
+    insert_sensor_data(conn, df, batch_size=2, method="bulk_copy")
+    assert all("#sensor_data_batch" not in call.args[0] for call in cursor.execute.call_args_list)
+    assert "VALUES" in cursor.execute.call_args[0][0]
+    assert driver.commit.call_count == 2
+
+
+def test_insert_sensor_data_rolls_back_failed_chunk():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.execute.side_effect = [None, Exception("deadlock")]
+    cursor.fetchone.return_value = (2,)
+    df = prepare_sensor_data(create_sample_dataframe()).iloc[[0] * 4]
+    with pytest.raises(Exception):
+        insert_sensor_data(conn, df, batch_size=2, method="values")
+    assert conn.commit.call_count == 1
+    conn.rollback.assert_called_once()
+
+
+def test_drop_loaded_readings_skips_stored_and_repeated_keys():
+    df = prepare_sensor_data(create_sample_dataframe()).iloc[[0, 0]]
+    assert len(drop_loaded_readings(df, set())) == 1
+    loaded_keys = {(1, pd.Timestamp("2023-11-01 08:00:00"))}
+    assert drop_loaded_readings(df, loaded_keys).empty
+
+
+def test_fetch_loaded_keys():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [(1, datetime(2023, 11, 1, 8))]
+    keys = fetch_loaded_keys(conn, datetime(2023, 11, 1))
+    assert keys == {(1, pd.Timestamp("2023-11-01 08:00:00"))}
+    assert cursor.execute.call_args[0][1] == (datetime(2023, 11, 1),)
@@ -0,0 +1,47 @@
+"""Testing file for the metrics.py script."""
+import json
+from unittest.mock import MagicMock
+from pipeline.etl_process.metrics import RunMetrics
+from pipeline.etl_process.connect_to_database import PooledConnection
+
+
+def test_run_metrics_record(tmp_path):
+    metrics = RunMetrics("etl")
+    for batch in [10, 5]:
+        with metrics.stage("transform", rows_in=batch) as stage:
+            stage["rows_out"] = batch - 1
+    metrics.count("db_round_trips", 3)
+    for seconds in [0.01, 0.3, 20]:
+        metrics.observe_latency("plants_api", seconds)
+
+    metrics_file = tmp_path / "metrics.jsonl"
+    metrics.write(str(metrics_file))
+    metrics.write(str(metrics_file))
+    lines = metrics_file.read_text().splitlines()
+    assert len(lines) == 2
+    record = json.loads(lines[0])
+    assert record["job"] == "etl"
+    assert record["stages"]["transform"]["calls"] == 2
+    assert record["stages"]["transform"]["rows_in"] == 15
+    assert record["stages"]["transform"]["rows_out"] == 13
+    assert record["counters"] == {"db_round_trips": 3}
+    assert record["latencies"]["plants_api"]["counts"] == [1, 0, 0, 1, 0, 0, 0, 0, 1]
+    assert record["peak_memory_mb"] > 0
+
+
+def test_pooled_connection_counts_round_trips(monkeypatch):
+    metrics = RunMetrics("test")
+    monkeypatch.setattr("pipeline.etl_process.connect_to_database.get_run", lambda: metrics)
+    conn = PooledConnection(MagicMock(), MagicMock())
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.executemany("INSERT", [(1,), (2,)])
+    conn.commit()
+    assert metrics.counters["db_round_trips"] == 4
+
+
+def test_run_metrics_reads_metrics_file_when_written(monkeypatch, tmp_path):
+    metrics_file = tmp_path / "metrics.jsonl"
+    monkeypatch.setenv("METRICS_FILE", str(metrics_file))
+    RunMetrics("transfer").write()
+    assert json.loads(metrics_file.read_text())["job"] == "transfer"
@@ -0,0 +1,28 @@
+"""Testing file for the benchmarks' mock plants API."""
+from benchmarks.mock_plants_api import MockPlantsAPI
+from benchmarks.run_benchmarks import compare_to_baseline
+from pipeline.etl_process import extract
+
+
+def test_extract_discovers_every_mock_plant(monkeypatch):
+    with MockPlantsAPI(plant_count=15) as api:
+        monkeypatch.setattr(extract, "BASE_URL", api.base_url)
+        plants = extract.discover_plants(miss_limit=5, max_workers=5, max_retries=0)
+    assert sorted(plant["plant_id"] for plant in plants) == list(range(1, 16))
+    assert plants[0]["botanist_email"].endswith("@lnhm.co.uk")
+    assert plants[0]["country_name"].startswith("Country")
+
+
+def test_mock_errors_are_served_as_500(monkeypatch):
+    with MockPlantsAPI(plant_count=5, error_rate=1) as api:
+        monkeypatch.setattr(extract, "BASE_URL", api.base_url)
+        assert extract.fetch_plant_data(1) is None
+        assert api.requests == 1
+
+
+def test_compare_to_baseline_flags_slowdowns():
+    baseline = {"sizes": {"50": {"etl_seconds": 1.0, "transfer_seconds": 1.0}}}
+    results = {"sizes": {"50": {"etl_seconds": 1.1, "transfer_seconds": 2.0},
+                         "500": {"etl_seconds": 9.0, "transfer_seconds": 9.0}}}
+    assert compare_to_baseline(results, baseline, 0.2) == [
+        "50 plants, transfer_seconds: 1.00s -> 2.00s (+100%)"]
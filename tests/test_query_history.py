@@ -0,0 +1,46 @@
+"""Testing file for the query_history.py script."""
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+import pyarrow.dataset as ds
+from pipeline.transfer_to_s3 import write_parquet_partitions
+from pipeline.query_history import (
+    query_history, get_archive_dataset, get_partition_filter, PARTITIONING
+)
+
+
+def write_archive(archive_dir):
+    rows = [
+        (datetime(2024, 1, day, hour), datetime(2024, 1, day, 6), plant_id, "Rose", "Rosa",
+         30.0 + plant_id, 20.0, "India", "Ann", "Lee")
+        for day in range(1, 15) for hour in (9, 21) for plant_id in (1, 2, 3)
+    ]
+    cursor = MagicMock()
+    cursor.fetchmany.side_effect = [rows, []]
+    write_parquet_partitions(cursor, str(archive_dir), "run1", (0, len(rows)))
+
+
+def test_query_history_filters_time_range_and_plants(tmp_path):
+    write_archive(tmp_path)
+    history = query_history(datetime(2024, 1, 3, 12), datetime(2024, 1, 5, 12), plant_ids=[2],
+                            columns=["recording_taken", "plant_id", "soil_moisture"],
+                            archive_dir=str(tmp_path))
+    assert list(history.columns) == ["recording_taken", "plant_id", "soil_moisture"]
+    assert set(history["plant_id"]) == {2}
+    assert history["recording_taken"].tolist() == [
+        datetime(2024, 1, 3, 21), datetime(2024, 1, 4, 9), datetime(2024, 1, 4, 21),
+        datetime(2024, 1, 5, 9)]
+
+
+def test_partition_filter_prunes_days(tmp_path):
+    write_archive(tmp_path)
+    dataset = get_archive_dataset(str(tmp_path))
+    start = datetime(2024, 1, 1)
+    fragments = list(dataset.get_fragments(
+        filter=get_partition_filter(start, start + timedelta(days=6))))
+    assert len(fragments) == 7
+
+
+def test_query_history_missing_archive(tmp_path):
+    history = query_history(datetime(2024, 1, 1), datetime(2024, 1, 2),
+                            archive_dir=str(tmp_path / "missing"))
+    assert history.empty
@@ -0,0 +1,62 @@
+"""Testing file for the rollups.py script."""
+import sqlite3
+from datetime import datetime
+from unittest.mock import MagicMock
+from pipeline.etl_process.rollups import ROLLUP_COLUMNS, MERGE_UPDATES, get_rollup_merge, rebuild_rollups
+
+AGGREGATE_COLUMNS = ROLLUP_COLUMNS[3:]
+
+
+def merge_bucket(existing: tuple, new: tuple) -> dict:
+    """Evaluates the MERGE's update expressions for one bucket, in SQLite."""
+    def side(values):
+        return ", ".join(f"{'NULL' if value is None else value} AS {column}"
+                         for column, value in zip(AGGREGATE_COLUMNS, values))
+    row = sqlite3.connect(":memory:").execute(
+        f"SELECT {', '.join(MERGE_UPDATES.values())} "
+        f"FROM (SELECT {side(existing)}) AS t, (SELECT {side(new)}) AS s").fetchone()
+    return dict(zip(MERGE_UPDATES, row))
+
+
+def test_get_rollup_merge_aggregates_every_granularity_from_the_source():
+    query = get_rollup_merge("@inserted")
+    assert "MERGE alpha.sensor_rollup" in query
+    assert "FROM @inserted" in query
+    for granularity in ["'5min'", "'hour'", "'day'"]:
+        assert granularity in query
+    assert "reading_count = t.reading_count + s.reading_count" in query
+    assert f"INSERT ({', '.join(ROLLUP_COLUMNS)})" in query
+    assert "%" not in query
+    for column, expression in MERGE_UPDATES.items():
+        assert f"{column} = {expression}" in query
+
+
+def test_merge_into_bucket_with_null_aggregates_keeps_the_other_side():
+    assert set(MERGE_UPDATES) == set(AGGREGATE_COLUMNS)
+    only_nulls = (2, None, None, None, None, None, None)
+    readings = (3, 10.0, 30.0, 60.0, 15.0, 20.0, 51.0)
+
+    assert merge_bucket(only_nulls, readings) == {
+        "reading_count": 5, "soil_moisture_min": 10.0, "soil_moisture_max": 30.0,
+        "soil_moisture_sum": 60.0, "temperature_min": 15.0, "temperature_max": 20.0,
+        "temperature_sum": 51.0}
+    assert merge_bucket(readings, only_nulls) == {
+        "reading_count": 5, "soil_moisture_min": 10.0, "soil_moisture_max": 30.0,
+        "soil_moisture_sum": 60.0, "temperature_min": 15.0, "temperature_max": 20.0,
+        "temperature_sum": 51.0}
+    assert merge_bucket(readings, (1, 5.0, 40.0, 5.0, 16.0, 16.0, 16.0)) == {
+        "reading_count": 4, "soil_moisture_min": 5.0, "soil_moisture_max": 40.0,
+        "soil_moisture_sum": 65.0, "temperature_min": 15.0, "temperature_max": 20.0,
+        "temperature_sum": 67.0}
+
+
+def test_rebuild_rollups_recomputes_each_granularity_from_the_day_start():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    rebuild_rollups(conn, datetime(2024, 1, 1, 15, 30))
+
+    calls = cursor.execute.call_args_list
+    assert calls[0].args == ("DELETE FROM alpha.sensor_rollup WHERE bucket_start >= %s;",
+                             (datetime(2024, 1, 1),))
+    assert [call.args[1][0] for call in calls[1:]] == ["5min", "hour", "day"]
+    conn.commit.assert_called_once()
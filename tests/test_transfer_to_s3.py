@@ -0,0 +1,106 @@
+"""Testing file for the transfer_to_s3.py script."""
+import pytest
+from unittest.mock import MagicMock, patch
+from datetime import datetime
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+from pipeline.transfer_to_s3 import (
+    stream_query_to_s3, write_parquet_partitions, get_id_batches, main_transfer, MIN_PART_SIZE
+)
+
+ROW = ("2024-01-01 10:00:00", "2024-01-01 08:00:00", "Rose", "Rosa", 30.0, 20.0,
+       "India", "Ann", "Lee")
+
+
+def make_s3_client(existing_size=None):
+    s3_client = MagicMock()
+    if existing_size is None:
+        s3_client.head_object.side_effect = ClientError(
+            {"Error": {"Code": "404"}}, "HeadObject")
+    else:
+        s3_client.head_object.return_value = {"ContentLength": existing_size}
+    s3_client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    s3_client.upload_part.side_effect = lambda **kwargs: {"ETag": f"etag-{kwargs['PartNumber']}"}
+    s3_client.upload_part_copy.return_value = {"CopyPartResult": {"ETag": "etag-copy"}}
+    return s3_client
+
+
+def make_cursor(batches):
+    cursor = MagicMock()
+    cursor.fetchmany.side_effect = batches + [[]]
+    return cursor
+
+
+def test_stream_query_to_s3_uploads_parts_per_batch():
+    s3_client = make_s3_client()
+    cursor = make_cursor([[ROW] * 3, [ROW] * 3])
+    assert stream_query_to_s3(s3_client, cursor, "bucket", "key", 99, batch_size=3, part_size=1) == 6
+    assert s3_client.upload_part.call_count == 2
+    first_part = s3_client.upload_part.call_args_list[0].kwargs["Body"].decode()
+    assert first_part.startswith("recording_taken,last_watered")
+    parts = s3_client.complete_multipart_upload.call_args.kwargs["MultipartUpload"]["Parts"]
+    assert [part["PartNumber"] for part in parts] == [1, 2]
+
+
+def test_stream_query_to_s3_copies_large_existing_object():
+    s3_client = make_s3_client(existing_size=MIN_PART_SIZE)
+    cursor = make_cursor([[ROW]])
+    stream_query_to_s3(s3_client, cursor, "bucket", "key", 99)
+    s3_client.get_object.assert_not_called()
+    parts = s3_client.complete_multipart_upload.call_args.kwargs["MultipartUpload"]["Parts"]
+    assert parts == [{"PartNumber": 1, "ETag": "etag-copy"}, {"PartNumber": 2, "ETag": "etag-2"}]
+    assert not s3_client.upload_part.call_args.kwargs["Body"].decode().startswith("recording_taken")
+
+
+def test_stream_query_to_s3_aborts_on_failure():
+    s3_client = make_s3_client()
+    cursor = MagicMock()
+    cursor.fetchmany.side_effect = Exception("connection lost")
+    with pytest.raises(Exception):
+        stream_query_to_s3(s3_client, cursor, "bucket", "key", 99)
+    s3_client.abort_multipart_upload.assert_called_once()
+    s3_client.complete_multipart_upload.assert_not_called()
+
+
+def test_write_parquet_partitions_one_file_per_day(tmp_path):
+    def archive_row(recorded, plant_id):
+        return (recorded, datetime(2024, 1, 1, 8), plant_id, "Rose", "Rosa", 30.5, 20.25,
+                "India", "Ann", "Lee")
+
+    cursor = make_cursor([
+        [archive_row(datetime(2024, 1, 1, 23, 59), 1), archive_row(datetime(2024, 1, 2, 0, 1), 2)],
+        [archive_row(datetime(2024, 1, 2, 0, 2), 3)],
+    ])
+    paths = write_parquet_partitions(cursor, str(tmp_path), "run1", (0, 3), batch_size=2)
+    assert paths == ["year=2024/month=01/day=01/part-run1.parquet",
+                     "year=2024/month=01/day=02/part-run1.parquet"]
+
+    day_two = pq.read_table(tmp_path / paths[1])
+    assert day_two.column("plant_id").to_pylist() == [2, 3]
+    assert str(day_two.schema.field("soil_moisture").type) == "float"
+    assert pq.ParquetFile(tmp_path / paths[1]).metadata.row_group(0).column(0).compression == "ZSTD"
+
+
+def test_get_id_batches_stops_at_captured_cutoff():
+    cursor = MagicMock()
+    cursor.fetchone.return_value = (11, 35)
+    assert get_id_batches(cursor, batch_size=10) == [(10, 20), (20, 30), (30, 35)]
+    cursor.fetchone.return_value = (None, None)
+    assert get_id_batches(cursor) == []
+
+
+@patch.dict("os.environ", {"ARCHIVE_FORMAT": "parquet"})
+@patch("pipeline.transfer_to_s3.archive_to_parquet")
+@patch("pipeline.transfer_to_s3.get_connection")
+def test_main_transfer_archives_then_deletes_each_batch(mock_get_connection, mock_archive,
+                                                        monkeypatch, tmp_path):
+    monkeypatch.setenv("METRICS_FILE", str(tmp_path / "metrics.jsonl"))
+    conn = mock_get_connection.return_value
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchone.return_value = (1, 75000)
+    main_transfer()
+    archived = [call.args[2] for call in mock_archive.call_args_list]
+    deleted = [call.args[1] for call in cursor.execute.call_args_list if "DELETE" in call.args[0]]
+    assert archived == deleted == [(0, 50000), (50000, 75000)]
+    assert conn.commit.call_count == 3
+    conn.close.assert_called_once()
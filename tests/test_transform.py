@@ -1,4 +1,5 @@
 """Test file for the transform.py pipeline script."""
+import logging
 import pytest
 import pandas as pd
 from io import StringIO
@@ -10,7 +11,10 @@ from pipeline.etl_process.transform import (
     clean_text_fields,
     convert_dates,
     filter_invalid_location,
-    save_data
+    validate_botanist_details,
+    save_data,
+    load_records,
+    transform_data
 )
 
 
@@ -110,3 +114,88 @@ def test_save_data(tmp_path):
     saved_data = pd.read_csv(output_file)
     assert saved_data.shape == (1, 6)
     assert saved_data.loc[0, 'name'] == 'Rose'
+
+
+def test_load_records_matches_csv_round_trip(tmp_path):
+    """Test if in-memory records clean to the same data as the CSV route."""
+    from pipeline.etl_process.extract import export_to_csv
+    records = [
+        {"plant_id": 1, "plant_name": " Rose ", "scientific_name": ["Rosa indica"],
+         "soil_moisture": 50.5, "temperature": 20.1, "last_watered": "2024-01-01T10:00:00.000Z",
+         "recording_taken": "2024-01-02 10:00:00", "botanist_email": "a@b.com",
+         "botanist_forename": "Ann", "botanist_surname": "Lee", "botanist_phone": "0151-123",
+         "country_name": "India"},
+        {"plant_id": 2, "plant_name": "Tulip", "scientific_name": ["Tulipa"],
+         "soil_moisture": 40.0, "temperature": 18.0, "last_watered": "2024-01-01T10:00:00.000Z",
+         "recording_taken": "2024-01-02 10:00:00", "botanist_email": "a@b.com",
+         "botanist_forename": "Ann", "botanist_surname": "", "botanist_phone": "0151-123",
+         "country_name": "Netherlands"},
+    ]
+    csv_file = tmp_path / "plants_data.csv"
+    export_to_csv(records, str(csv_file))
+
+    from_csv = transform_data(load_data(str(csv_file)))
+    from_memory = transform_data(load_records(records))
+    assert len(from_memory) == len(from_csv) == 1
+    assert from_memory['plant_name'].iloc[0] == from_csv['plant_name'].iloc[0] == 'Rose'
+    assert from_memory['scientific_name'].iloc[0] == from_csv['scientific_name'].iloc[0]
+    assert from_memory['recording_taken'].iloc[0] == from_csv['recording_taken'].iloc[0]
+
+
+FUSED_CSV = (
+    "plant_id,plant_name,scientific_name,country_name,botanist_email,botanist_forename,"
+    "botanist_surname,botanist_phone,soil_moisture,temperature,last_watered,recording_taken\n"
+    "1, Rose ,Rosa, India ,a@b.com , Ann,Lee ,0151-123,50,25,2024-01-01T10:00:00.000Z,2024-01-02 10:00:00\n"
+    "2,,Tulipa,Netherlands,a@b.com,Ann,Lee,0151-123,40,20,2024-01-01T10:00:00.000Z,2024-01-02 10:00:00\n"
+    "3,Cactus,Cactaceae,USA,a@b.com,Ann,Lee,0151-123,120,25,2024-01-01T10:00:00.000Z,2024-01-02 10:00:00\n"
+    "4,Fern,Polypodiopsida,Kenya,a@b.com,Ann,Lee,0151-123,30,-20,2024-01-01T10:00:00.000Z,2024-01-02 10:00:00\n"
+    "5,Ivy,Hedera,Peru,a@b.com,Ann,Lee,0151-123,30,20,invalid_date,2024-01-02 10:00:00\n"
+    "6,Palm,Arecaceae,Chile,a@b.com,Ann,Lee,0151-123,70,30,2024-01-01T12:00:00.000Z,2024-01-02 10:01:00\n"
+)
+
+
+def transform_step_by_step(df):
+    df = drop_missing_data(df)
+    df = set_numeric_limits(df)
+    df = clean_text_fields(df, text_fields=[
+        'plant_name', 'scientific_name', 'country_name',
+        'botanist_email', 'botanist_forename', 'botanist_surname', 'botanist_phone'
+    ])
+    df = convert_dates(df)
+    df = filter_invalid_location(df)
+    return validate_botanist_details(df)
+
+
+def test_transform_data_matches_each_step_in_turn():
+    """Test if the single-pass transform keeps the same rows and values as the separate steps."""
+    expected = transform_step_by_step(pd.read_csv(StringIO(FUSED_CSV)))
+    fused = transform_data(pd.read_csv(StringIO(FUSED_CSV)))
+    pd.testing.assert_frame_equal(fused, expected)
+    assert fused['plant_id'].tolist() == [1, 6]
+    assert fused['plant_name'].iloc[0] == 'Rose'
+    assert fused['country_name'].iloc[0] == 'India'
+
+
+def test_transform_data_logs_rows_dropped_by_each_rule(caplog):
+    """Test if the single-pass transform logs the row counts of each rule in turn."""
+    with caplog.at_level(logging.INFO):
+        transform_data(pd.read_csv(StringIO(FUSED_CSV)))
+    counts = [message.split("Rows before: ")[1] for message in caplog.messages
+              if "Rows before" in message]
+    assert counts == ["6, Rows after: 5", "5, Rows after: 3", "3, Rows after: 2", "2, Rows after: 2"]
+
+
+def test_transform_data_does_not_modify_its_input():
+    """Test if the single-pass transform leaves the raw data unchanged."""
+    raw = pd.read_csv(StringIO(FUSED_CSV))
+    transform_data(raw)
+    assert raw['plant_name'].iloc[0] == ' Rose '
+    assert raw['last_watered'].iloc[4] == 'invalid_date'
+
+
+def test_transform_data_does_not_assign_to_a_slice():
+    """Test if the single-pass transform builds a new frame rather than writing to a slice of its input."""
+    with pd.option_context("mode.chained_assignment", "raise"):
+        fused = transform_data(pd.read_csv(StringIO(FUSED_CSV)))
+        fused['plant_name'] = 'Changed'
+    assert fused['plant_name'].tolist() == ['Changed', 'Changed']
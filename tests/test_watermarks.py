@@ -0,0 +1,68 @@
+"""Testing file for the watermarks.py script."""
+import pandas as pd
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from pipeline.etl_process.watermarks import (
+    fetch_watermarks, load_watermarks, save_watermarks, filter_new_readings, advance_watermarks,
+    get_watermarks, get_watermark_merge
+)
+
+
+def test_filter_new_readings():
+    watermarks = {1: pd.Timestamp("2024-01-01 10:00:00"), 2: pd.Timestamp("2024-01-01 09:00:00")}
+    plant_data = [
+        {"plant_id": 1, "recording_taken": "2024-01-01T10:00:00Z"},
+        {"plant_id": 2, "recording_taken": "2024-01-01T10:00:00Z"},
+        {"plant_id": 3, "recording_taken": "2024-01-01T08:00:00Z"},
+        {"plant_id": 1, "recording_taken": "not a date"},
+    ]
+    result = filter_new_readings(plant_data, watermarks)
+    assert [plant["plant_id"] for plant in result] == [2, 3, 1]
+
+
+def test_advance_watermarks_only_moves_forward():
+    watermarks = {1: pd.Timestamp("2024-01-01 10:00:00")}
+    loaded = pd.DataFrame({
+        "plant_id": [1, 1, 2],
+        "recording_taken": pd.to_datetime(["2024-01-01 09:00:00", "2024-01-01 09:30:00",
+                                           "2024-01-01 11:00:00"]),
+    })
+    assert advance_watermarks(watermarks, loaded) == {
+        1: pd.Timestamp("2024-01-01 10:00:00"), 2: pd.Timestamp("2024-01-01 11:00:00")}
+
+
+def test_save_and_load_watermarks(tmp_path):
+    state_file = str(tmp_path / "watermarks.json")
+    assert load_watermarks(state_file) is None
+    watermarks = {1: pd.Timestamp("2024-01-01 10:00:00")}
+    save_watermarks(watermarks, state_file)
+    assert load_watermarks(state_file) == watermarks
+
+
+def test_fetch_watermarks():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [(1, datetime(2024, 1, 1, 10))]
+    assert fetch_watermarks(conn) == {1: pd.Timestamp("2024-01-01 10:00:00")}
+    assert "FROM alpha.plant_watermark" in cursor.execute.call_args[0][0]
+
+
+@patch("pipeline.etl_process.watermarks.get_connection")
+def test_get_watermarks_reads_the_file_only_when_asked(mock_get_connection, tmp_path):
+    state_file = str(tmp_path / "watermarks.json")
+    save_watermarks({1: pd.Timestamp("2024-01-01 10:00:00")}, state_file)
+    cursor = mock_get_connection.return_value.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [(2, datetime(2024, 1, 1, 11))]
+
+    assert get_watermarks("file", state_file) == {1: pd.Timestamp("2024-01-01 10:00:00")}
+    mock_get_connection.assert_not_called()
+    assert get_watermarks("database", state_file) == {2: pd.Timestamp("2024-01-01 11:00:00")}
+    assert get_watermarks("file", str(tmp_path / "missing.json")) == {
+        2: pd.Timestamp("2024-01-01 11:00:00")}
+
+
+def test_get_watermark_merge_only_moves_forward():
+    merge = get_watermark_merge("@inserted")
+    assert "MERGE alpha.plant_watermark" in merge
+    assert "FROM @inserted GROUP BY plant_id" in merge
+    assert "WHEN MATCHED AND s.recording_taken > t.recording_taken" in merge